@@ -0,0 +1,113 @@
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+# Cosine similarity between query embeddings above which a stored answer is reused
+ANSWER_SIMILARITY = 0.95
+# Answers kept per collection; the oldest are dropped beyond this
+ANSWER_CACHE_MAX_ROWS = 2000
+
+
+def normalize_query(query: str) -> str:
+    """Lower-cased words only, so case, punctuation and spacing don't matter."""
+    return " ".join(re.findall(r"\w+", query.lower()))
+
+
+class AnswerCache:
+    """
+    Persistent cache of final answers, keyed by (collection, indexed HEAD,
+    filters) and matched on the embedding of the standalone query. Callers
+that need an exact match also pass the normalized query text.
+
+    Entries recorded against another HEAD are deleted as soon as the
+    collection is seen at a new one, so re-indexing invalidates them.
+    """
+
+    def __init__(self, path: str, threshold: float = ANSWER_SIMILARITY, max_rows: int = ANSWER_CACHE_MAX_ROWS):
+        self.threshold = threshold
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS answers (
+                collection TEXT NOT NULL,
+                head TEXT NOT NULL,
+                filters TEXT NOT NULL,
+                query TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                created REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_key ON answers (collection, head, filters)")
+        self._conn.commit()
+
+    def _invalidate_stale(self, collection: str, head: str) -> None:
+        self._conn.execute("DELETE FROM answers WHERE collection = ? AND head != ?", (collection, head))
+
+    def lookup(self, collection: str, head: str, filters: str, vector, query: str = None) -> str | None:
+        """
+        Stored answer for the most similar query above the threshold, if any.
+        With `query`, only answers stored for exactly that query qualify, and
+        `vector` may be None to take the latest of them.
+        """
+        sql = "SELECT vector, answer FROM answers WHERE collection = ? AND head = ? AND filters = ?"
+        params = (collection, head, filters)
+        if query is not None:
+            sql += " AND query = ?"
+            params += (query,)
+        sql += " ORDER BY created DESC"
+
+        with self._lock:
+            self._invalidate_stale(collection, head)
+            self._conn.commit()
+            rows = self._conn.execute(sql, params).fetchall()
+
+            best, answer = -1.0, None
+            if rows and vector is None:
+                best, answer = 1.0, rows[0][1]
+            elif rows:
+                vector = np.asarray(vector, dtype=np.float32)
+                matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for blob, _ in rows])
+                norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+                similarity = matrix @ vector / np.maximum(norms, 1e-12)
+                i = int(np.argmax(similarity))
+                best, answer = float(similarity[i]), rows[i][1]
+
+            if best >= self.threshold:
+                self.hits += 1
+                return answer
+            self.misses += 1
+            return None
+
+    def store(self, collection: str, head: str, filters: str, query: str, vector, answer: str) -> None:
+        """Remember `answer`; with no `vector` it is only found by an exact `query` lookup."""
+        blob = np.asarray(vector if vector is not None else [], dtype=np.float32).tobytes()
+        with self._lock:
+            self._invalidate_stale(collection, head)
+            self._conn.execute(
+                "INSERT INTO answers (collection, head, filters, query, vector, answer, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (collection, head, filters, query, blob, answer, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM answers WHERE collection = ? AND rowid NOT IN ("
+                "SELECT rowid FROM answers WHERE collection = ? ORDER BY created DESC LIMIT ?)",
+                (collection, collection, self.max_rows),
+            )
+            self._conn.commit()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,11 +1,12 @@
 import os
 import atexit
+import threading
 import streamlit as st
 from dotenv import load_dotenv
 
-from indexer import run_indexing
-from qa import ask
-from utils import cleanup_temp_data, create_pdf
+from indexer import list_indexed_repos
+from jobs import ACTIVE_STATES, DONE, JobManager
+from utils import ReportBuilder, cleanup_temp_data
 
 # ── Setup ──────────────────────────────────────────────────────────────────────
 
@@ -13,12 +14,44 @@ load_dotenv()
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 atexit.register(cleanup_temp_data)
 
+
+def _warm_up() -> None:
+    # qa pulls in openai, pandas and the models; import it off the UI thread
+    from qa import warm_up
+
+    warm_up()
+
+
+@st.cache_resource
+def _start_warm_up() -> threading.Thread:
+    # Once per server process: load models and clients in the background so
+    # the first question doesn't pay for them
+    thread = threading.Thread(target=_warm_up, daemon=True, name="warm-up")
+    thread.start()
+    return thread
+
+
+def _warm_up_after_render() -> None:
+    # Called once the page has rendered, on every path through the script
+    # (including before st.stop()), so model loading doesn't compete with
+    # the first render. Set WARM_UP=0 to load models lazily on the first
+    # question instead
+    if os.getenv("WARM_UP", "1") != "0":
+        _start_warm_up()
+
+
 st.set_page_config(
     page_title="Legacy Code Archaeologist",
     page_icon="🏛️",
     layout="wide"
 )
 
+@st.cache_resource
+def _job_manager() -> JobManager:
+    # One worker pool per server process, shared by every session
+    return JobManager()
+
+
 # ── Session state defaults ─────────────────────────────────────────────────────
 
 if "repo_loaded" not in st.session_state:
@@ -27,12 +60,18 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 if "repo_url" not in st.session_state:
     st.session_state.repo_url = ""
+if "collection_name" not in st.session_state:
+    st.session_state.collection_name = None
 if "author_filter" not in st.session_state:
     st.session_state.author_filter = ""
 if "start_date" not in st.session_state:
     st.session_state.start_date = None
 if "end_date" not in st.session_state:
     st.session_state.end_date = None
+if "job_id" not in st.session_state:
+    st.session_state.job_id = None
+if "report" not in st.session_state:
+    st.session_state.report = None
 
 # ── Sidebar ────────────────────────────────────────────────────────────────────
 
@@ -48,10 +87,17 @@ with st.sidebar:
         placeholder="https://github.com/owner/repo.git"
     )
 
+    branch = st.text_input(
+        "Branch",
+        value="",
+        placeholder="default branch",
+        help="Optional. Each repository branch gets its own index."
+    )
+
     github_token = st.text_input(
         "GitHub PAT (Private Repos)",
         type="password",
-        help="Optional. Required for private repositories (needs 'repo' scope). \n\n🔒 **Security Note:** Your token is never saved to disk. It is strictly held in memory during the cloning process, and all temporary repository files are aggressively wiped from the server when you click Reset or close the app."
+        help="Optional. Required for private repositories (needs 'repo' scope). \n\n🔒 **Security Note:** Your token is never saved to disk. It is strictly held in memory while fetching, and cached copies of private repositories are aggressively wiped from the server when you click Reset or close the app."
     )
 
     st.markdown("### 🕰️ Excavation Depth")
@@ -68,6 +114,18 @@ with st.sidebar:
     }
     commit_limit = limit_map[depth_option]
 
+    incremental = st.toggle(
+        "⚡ Incremental refresh",
+        value=True,
+        help="Re-analyzing the same repo only fetches and embeds commits added since the last run."
+    )
+
+    hunks = st.toggle(
+        "🔬 Hunk-level index",
+        value=False,
+        help="Also embed every changed hunk on its own, so large commits are retrieved by the exact hunks that match. Slower to index."
+    )
+
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         api_key = st.text_input("Groq API Key", type="password", placeholder="gsk_...")
@@ -86,12 +144,73 @@ with st.sidebar:
         elif not repo_url.strip():
             st.error("Please enter a repository URL.")
         else:
-            with st.spinner("Initializing..."):
-                success = run_indexing(repo_url.strip(), commit_limit, token=github_token)
-                if success:
-                    st.session_state.repo_loaded = True
-                    st.session_state.repo_url = repo_url.strip()
-                    st.session_state.messages = []
+            # Indexing runs on the job pool; the fragment below polls it
+            st.session_state.job_id = _job_manager().submit(
+                repo_url.strip(),
+                commit_limit,
+                token=github_token,
+                incremental=incremental,
+                branch=branch.strip() or None,
+                hunks=hunks,
+            )
+
+    @st.fragment(run_every="1s")
+    def _job_progress():
+        job_id = st.session_state.job_id
+        if job_id is None:
+            # Outcome of the last job, kept after it stopped being polled
+            if st.session_state.get("last_job"):
+                last = st.session_state.last_job
+                getattr(st, last["level"])(last["message"])
+            return
+
+        job = _job_manager().get(job_id)
+        if job is None:
+            st.session_state.job_id = None
+            return
+
+        getattr(st, job["level"])(job["message"])
+        if job["state"] in ACTIVE_STATES:
+            st.progress(job["progress"])
+            if st.button("🛑 Cancel", use_container_width=True):
+                _job_manager().cancel(job_id)
+            return
+
+        # Finished: switch to the repository once, then stop polling
+        st.session_state.job_id = None
+        st.session_state.last_job = job
+        if job["state"] == DONE:
+            st.session_state.repo_loaded = True
+            st.session_state.repo_url = job["repo_url"]
+            st.session_state.collection_name = job["collection"]
+            st.session_state.messages = []
+        st.rerun()
+
+    _job_progress()
+
+    # Previously indexed repositories stay on disk, so switching is instant
+    indexed_repos = list_indexed_repos()
+    if indexed_repos:
+        repos_by_name = {r["name"]: r for r in indexed_repos}
+        labels = {
+            name: r["repo_url"] + (f" @ {r['branch']}" if r.get("branch") else "")
+            for name, r in repos_by_name.items()
+        }
+        names = list(labels)
+        current = st.session_state.collection_name
+        choice = st.selectbox(
+            "📚 Indexed repositories",
+            options=names,
+            index=names.index(current) if current in names else None,
+            format_func=labels.get,
+            placeholder="Switch to a previously indexed repo",
+        )
+        if choice and choice != current:
+            st.session_state.repo_loaded = True
+            st.session_state.repo_url = repos_by_name[choice]["repo_url"]
+            st.session_state.collection_name = choice
+            st.session_state.messages = []
+            st.rerun()
 
     st.divider()
 
@@ -141,6 +260,7 @@ with st.sidebar:
             if st.button("↺ Reset", use_container_width=True):
                 cleanup_temp_data()
                 st.session_state.repo_loaded = False
+                st.session_state.collection_name = None
                 st.session_state.messages = []
                 st.session_state.author_filter = ""
                 st.session_state.start_date = None
@@ -148,14 +268,23 @@ with st.sidebar:
                 st.rerun()
 
         if st.session_state.messages:
-            pdf_bytes = create_pdf(st.session_state.repo_url, st.session_state.messages)
-            st.download_button(
-                "📄 Download PDF Report",
-                data=pdf_bytes,
-                file_name="audit_report.pdf",
-                mime="application/pdf",
-                use_container_width=True
-            )
+            # Rendered on request only, then reused until the conversation changes
+            report = st.session_state.report
+            if report is None or report.repo_url != st.session_state.repo_url:
+                report = st.session_state.report = ReportBuilder(st.session_state.repo_url)
+
+            pdf_bytes = report.cached(st.session_state.messages)
+            if pdf_bytes is None and st.button("📄 Generate PDF Report", use_container_width=True):
+                with st.spinner("Rendering report..."):
+                    pdf_bytes = report.build(st.session_state.messages)
+            if pdf_bytes is not None:
+                st.download_button(
+                    "📄 Download PDF Report",
+                    data=pdf_bytes,
+                    file_name="audit_report.pdf",
+                    mime="application/pdf",
+                    use_container_width=True
+                )
 
 # ── Main chat area ─────────────────────────────────────────────────────────────
 
@@ -173,6 +302,7 @@ if st.session_state.get("repo_loaded"):
 
 if not st.session_state.repo_loaded:
     st.info("👈 Paste a GitHub URL in the sidebar and click **Analyze Repo** to get started.")
+    _warm_up_after_render()
     st.stop()
 
 # Render existing messages
@@ -188,17 +318,24 @@ if prompt := st.chat_input("Ask anything about the code history..."):
 
     with st.chat_message("assistant"):
         try:
+            from qa import ask
+
             history_so_far = st.session_state.messages[:-1]
             stream = ask(
                 prompt,
                 history_so_far,
+                collection_name=st.session_state.collection_name,
                 author=st.session_state.author_filter or None,
                 start_date=st.session_state.start_date,
                 end_date=st.session_state.end_date,
             )
             response = st.write_stream(stream)
+            if stream.ttft is not None:
+                st.caption(f"⏱️ First token in {stream.ttft * 1000:.0f} ms")
             st.session_state.messages.append({"role": "assistant", "content": response})
         except Exception as e:
             error_msg = f"⚠️ Error: {e}"
             st.error(error_msg)
-            st.session_state.messages.append({"role": "assistant", "content": error_msg})
\ No newline at end of file
+            st.session_state.messages.append({"role": "assistant", "content": error_msg})
+
+_warm_up_after_render()
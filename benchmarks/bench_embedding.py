@@ -0,0 +1,82 @@
+"""
+Embedding throughput benchmark.
+
+Embeds a fixed, seeded synthetic commit history with several batch sizes
+and with the indexer's adaptive token-budget batching, and reports
+commits/sec for each. Downloads the embedding model on first run.
+
+    python benchmarks/bench_embedding.py --commits 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeddings import EMBEDDING_MODEL, embed_documents, load_model, plan_batches, token_budget  # noqa: E402
+
+WORDS = (
+    "fix add remove refactor timeout retry cache config parser handler "
+    "request response session token auth user repo commit index query"
+).split()
+
+
+def synthetic_history(n: int, seed: int = 0) -> list[dict]:
+    """Commit dicts shaped like miner output: short messages, diffs of varied size."""
+    rng = random.Random(seed)
+    commits = []
+
+    for i in range(n):
+        message = " ".join(rng.choices(WORDS, k=rng.randint(3, 12)))
+        hunk_lines = rng.choice([2, 5, 10, 40])
+        diff = "\n".join(
+            f"{rng.choice('+-')} {' '.join(rng.choices(WORDS, k=rng.randint(2, 10)))}"
+            for _ in range(hunk_lines)
+        )
+        sha = f"{i:040x}"
+        commits.append({
+            "hash": sha,
+            "content": f"Commit: {sha}\nAuthor: Bench\nMessage: {message}\n\n--- CODE CHANGES ---\n"
+                       f"\nFile: src/module_{i % 50}.py\n@@ -1 +1 @@\n{diff}\n",
+        })
+
+    return commits
+
+
+def run(model, batches: list[list[dict]]) -> float:
+    start = time.perf_counter()
+    for batch in batches:
+        embed_documents(model, [commit["content"] for commit in batch])
+    elapsed = time.perf_counter() - start
+    return sum(len(b) for b in batches) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commits", type=int, default=1000)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 32, 64, 128, 256])
+    args = parser.parse_args()
+
+    commits = synthetic_history(args.commits)
+    model = load_model()
+    # Warm-up so the first measured run doesn't pay lazy initialisation
+    embed_documents(model, [c["content"] for c in commits[:16]])
+
+    print(f"Model: {EMBEDDING_MODEL} · {len(commits)} synthetic commits\n")
+    print(f"{'batching':<24}{'commits/sec':>12}")
+
+    for size in args.sizes:
+        batches = [commits[i:i + size] for i in range(0, len(commits), size)]
+        print(f"{f'fixed {size}':<24}{run(model, batches):>12.1f}")
+
+    budget = token_budget()
+    batches = list(plan_batches(commits, budget))
+    label = f"adaptive ({budget} tok)"
+    print(f"{label:<24}{run(model, batches):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
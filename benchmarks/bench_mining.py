@@ -0,0 +1,85 @@
+"""
+Mining throughput benchmark.
+
+Mines a repository with the GitPython backend on 1, 2, 4, ... worker
+processes and with the streaming `git log -p` backend, and reports
+commits/sec and the speed-up over a single worker. Without --repo a
+seeded synthetic history is generated with `git fast-import` first.
+
+    python benchmarks/bench_mining.py --commits 2000
+    python benchmarks/bench_mining.py --repo ~/.cache/mirrors/flask.git --limit 3000
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from miner import load_git_history  # noqa: E402
+
+WORDS = (
+    "fix add remove refactor timeout retry cache config parser handler "
+    "request response session token auth user repo commit index query"
+).split()
+
+
+def synthetic_repo(path: str, n: int, files: int = 50, seed: int = 0) -> str:
+    """A repository of `n` commits, each rewriting a few lines of 1-3 of `files` Python files."""
+    rng = random.Random(seed)
+    contents = {f"src/module_{i}.py": [f"line_{j} = {j}" for j in range(40)] for i in range(files)}
+    stream = []
+
+    for i in range(n):
+        stream.append(f"commit refs/heads/main\ncommitter Bench <bench@example.com> {1700000000 + i * 60} +0000\n")
+        message = " ".join(rng.choices(WORDS, k=rng.randint(3, 12)))
+        stream.append(f"data {len(message)}\n{message}\n")
+        for name in rng.sample(sorted(contents), rng.randint(1, 3)):
+            lines = contents[name]
+            for _ in range(rng.randint(1, 5)):
+                lines[rng.randrange(len(lines))] = " ".join(rng.choices(WORDS, k=rng.randint(2, 8)))
+            data = "\n".join(lines) + "\n"
+            stream.append(f"M 100644 inline {name}\ndata {len(data.encode())}\n{data}\n")
+
+    subprocess.run(["git", "init", "-q", "-b", "main", path], check=True)
+    subprocess.run(["git", "fast-import", "--quiet"], cwd=path, input="".join(stream).encode(), check=True)
+    subprocess.run(["git", "checkout", "-q", "main"], cwd=path, check=True)
+    return path
+
+
+def run(repo: str, limit: int, **kwargs) -> float:
+    start = time.perf_counter()
+    count = sum(1 for _ in load_git_history(repo, limit=limit, **kwargs))
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repo", help="repository to mine (default: a synthetic one)")
+    parser.add_argument("--commits", type=int, default=1000, help="synthetic commits to generate")
+    parser.add_argument("--limit", type=int, default=None, help="commits to mine")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = args.repo or synthetic_repo(os.path.join(tmp, "repo"), args.commits)
+        print(f"Repository: {repo} · {os.cpu_count()} cores\n")
+        print(f"{'backend':<24}{'commits/sec':>12}{'speed-up':>10}")
+
+        baseline = None
+        for workers in args.workers:
+            rate = run(repo, args.limit, workers=workers, backend="gitpython")
+            baseline = baseline or rate
+            print(f"{f'gitpython × {workers}':<24}{rate:>12.1f}{rate / baseline:>9.1f}×")
+
+        rate = run(repo, args.limit, backend="log")
+        print(f"{'log':<24}{rate:>12.1f}{rate / baseline:>9.1f}×")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Reranking latency and agreement benchmark.
+
+Scores RETRIEVAL_K synthetic commit documents (with large diffs) per query
+with the original path — the torch CrossEncoder on full documents — and
+with rerank.score() on each backend, reporting per-query latency and how
+closely each backend's ranking agrees with the original. Downloads the
+reranker (and its ONNX export) on first run.
+
+    python benchmarks/bench_rerank.py --queries 20
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rerank  # noqa: E402
+from qa import RERANK_TOP_N, RETRIEVAL_K  # noqa: E402
+
+WORDS = (
+    "fix add remove refactor timeout retry cache config parser handler "
+    "request response session token auth user repo commit index query"
+).split()
+
+
+def synthetic_candidates(rng: random.Random, k: int) -> tuple[str, list[str]]:
+    """A query and `k` commit documents, some with thousands of tokens of diff."""
+    docs = []
+    for i in range(k):
+        message = " ".join(rng.choices(WORDS, k=rng.randint(4, 10)))
+        files = []
+        for f in range(rng.choice([1, 3, 8])):
+            hunks = []
+            for _ in range(rng.randint(1, 4)):
+                lines = "\n".join(
+                    f"{rng.choice('+-')} {' '.join(rng.choices(WORDS, k=rng.randint(3, 12)))}"
+                    for _ in range(rng.choice([5, 20, 60]))
+                )
+                hunks.append(f"@@ -1 +1 @@\n{lines}")
+            files.append(f"\nFile: src/module_{i}_{f}.py\n" + "\n".join(hunks) + "\n")
+        sha = f"{rng.getrandbits(160):040x}"
+        docs.append(
+            f"Commit: {sha}\nAuthor: Bench\nDate: 2024-01-01 00:00:00\nMessage: {message}\n\n"
+            f"--- CODE CHANGES ---\n{''.join(files)}\n"
+        )
+
+    query = "why did the " + " ".join(rng.choices(WORDS, k=4)) + " change?"
+    return query, docs
+
+
+def _ranks(scores: np.ndarray) -> np.ndarray:
+    ranks = np.empty(len(scores))
+    ranks[np.argsort(-scores)] = np.arange(len(scores))
+    return ranks
+
+
+def spearman(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.corrcoef(_ranks(a), _ranks(b))[0, 1])
+
+
+def top_overlap(a: np.ndarray, b: np.ndarray, n: int) -> float:
+    return len(set(np.argsort(-a)[:n]) & set(np.argsort(-b)[:n])) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cases = [synthetic_candidates(rng, RETRIEVAL_K) for _ in range(args.queries)]
+
+    from sentence_transformers import CrossEncoder
+    baseline = CrossEncoder(rerank.RERANK_MODEL)
+
+    engines = {"baseline (torch, full docs)": lambda q, docs: np.asarray(baseline.predict([(q, d) for d in docs]))}
+    for backend in ("torch", "onnx"):
+        engines[f"{backend} · {rerank.RERANK_TOKEN_BUDGET} tok focus"] = (
+            lambda q, docs, backend=backend: rerank.score(q, docs, backend=backend, cache=None)
+        )
+
+    print(
+        f"Model: {rerank.RERANK_MODEL} · {args.queries} queries × {RETRIEVAL_K} docs · "
+        f"{rerank.cpu_threads()} threads\n"
+    )
+    print(f"{'engine':<32}{'p50 ms':>9}{'p95 ms':>9}{'spearman':>10}{f'top-{RERANK_TOP_N}':>8}")
+
+    reference = None
+    for name, engine in engines.items():
+        engine(*cases[0])  # warm-up
+        latencies, results = [], []
+        for query, docs in cases:
+            start = time.perf_counter()
+            results.append(engine(query, docs))
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        if reference is None:
+            reference = results
+        rho = statistics.mean(spearman(r, s) for r, s in zip(reference, results))
+        overlap = statistics.mean(top_overlap(r, s, RERANK_TOP_N) for r, s in zip(reference, results))
+        p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))]
+        print(f"{name:<32}{statistics.median(latencies):>9.1f}{p95:>9.1f}{rho:>10.3f}{overlap:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
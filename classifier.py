@@ -0,0 +1,73 @@
+import re
+
+# Below this confidence qa falls back to asking the LLM
+MIN_CONFIDENCE = 0.6
+# Winning score at which a clear margin counts in full; below it confidence
+# is scaled down, so a lone weight-1 cue stays under MIN_CONFIDENCE
+FULL_EVIDENCE = 6
+
+# (pattern, weight) cues for ordered/sequential questions
+_LISTING_CUES = [
+    # "last 10" but not a time window like "last 6 months"
+    (re.compile(r"\b(last|latest|recent|newest|first|earliest|oldest|initial)\s+\d+\b(?!\s*(days?|weeks?|months?|years?)\b)"), 3),
+    (re.compile(r"\b(last|first|latest|recent|newest|earliest|oldest|initial)\s+(few\s+|couple\s+(of\s+)?)?(commits?|changes|prs?)\b"), 3),
+    (re.compile(r"\b(most recent|latest|newest|earliest|oldest)\b"), 2),
+    (re.compile(r"\bchronological(ly)?\b|\bin order\b|\btimeline\b"), 2),
+    (re.compile(r"\b(list|show)( me)?( all| the)? (recent )?(commits|history|changes)\b"), 2),
+    (re.compile(r"\brecent(ly)?\b"), 1),
+]
+
+# (pattern, weight) cues for questions about specific changes
+_SEMANTIC_CUES = [
+    (re.compile(r"\bwhy\b|\bhow (does|did|do|was|is|were)\b|\breason\b|\bexplain\b"), 3),
+    # "who ... the most" asks for a ranking, not a specific change
+    (re.compile(r"\bwho\b(?!.*\b(most|least)\b)|\bwhich author\b"), 2),
+    (re.compile(r"\b(bug|fix(ed|es)?|feature|refactor(ed|ing)?|introduc\w*|remov\w*|add(ed|s)?|renam\w*|deprecat\w*|broke|regression)\b"), 2),
+    (re.compile(r"\bwhat (changed|happened|was changed)\b|\bwhen (did|was)\b"), 2),
+]
+
+# (pattern, weight) cues for counting / ranking questions over the whole history
+_AGGREGATE_CUES = [
+    (re.compile(r"\bhow many\b|\bnumber of\b|\bcount\b"), 4),
+    (re.compile(r"\b(per|each|by|every) (day|week|month|year|author|file|director(y|ies)|folder)\b|\b(daily|weekly|monthly|yearly)\b"), 4),
+    (re.compile(r"\bwho\b.*\b(most|least)\b"), 4),
+    (re.compile(r"\b(top|most active|biggest|largest)\b.*\b(authors?|contributors?|committers?|files?|director(y|ies)|folders?)\b"), 3),
+    (re.compile(r"\bchurn\b|\blines? (added|removed|deleted|changed)\b|\bstatistics\b|\bstats\b"), 3),
+]
+
+# Identifiers: `code`, snake_case, camelCase, file paths, ticket IDs, sha
+# prefixes. Matched case-sensitively, and always point at a specific change
+_IDENTIFIER_CUES = [
+    (re.compile(r"`[^`]+`|\b\w+_\w+\b|\b[a-z]+[A-Z]\w*\b|\b[\w-]+\.(py|js|ts|go|rs|java|md|json|ya?ml|toml)\b"), 2),
+    (re.compile(r"\b[A-Z][A-Z0-9]+-\d+\b|\b[0-9a-f]{7,40}\b"), 2),
+]
+
+
+def _score(cues: list, text: str) -> int:
+    return sum(weight for pattern, weight in cues if pattern.search(text))
+
+
+def classify(query: str) -> tuple[str, float]:
+    """
+    Rule-based "listing" / "semantic" / "aggregate" classification.
+
+    Returns (label, confidence in [0.5, 1.0]), where confidence compares
+    the winning label's score to the runner-up, scaled down while the
+    winning score is below FULL_EVIDENCE. Ties and
+    queries with no cues at all score 0.5, which callers should treat as
+    "unsure".
+    """
+    text = query.lower()
+    scores = {
+        "listing": _score(_LISTING_CUES, text),
+        "semantic": _score(_SEMANTIC_CUES, text) + _score(_IDENTIFIER_CUES, query),
+        "aggregate": _score(_AGGREGATE_CUES, text),
+    }
+
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    best, runner_up = scores[ranked[0]], scores[ranked[1]]
+    if best == runner_up:
+        return "semantic", 0.5
+
+    margin = (best - runner_up) / (best + runner_up)
+    return ranked[0], 0.5 + 0.5 * margin * min(best / FULL_EVIDENCE, 1.0)
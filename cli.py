@@ -0,0 +1,220 @@
+"""
+Index repositories and ask questions without the Streamlit UI, e.g. from
+cron to pre-warm indexes overnight.
+
+    python cli.py index https://github.com/pallets/flask.git --depth 500
+    python cli.py index --manifest repos.json --jobs 4
+    python cli.py query https://github.com/pallets/flask.git "Why was the JSON provider added?"
+    python cli.py query https://github.com/pallets/flask.git --questions questions.txt --json
+    python cli.py stats
+
+A manifest is either a JSON list of repository URLs or objects
+({"repo_url", "branch", "depth", "incremental", "hunks"}), or a text file
+with one "URL [branch]" per line; '#' starts a comment.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from indexer import HUNK_INDEX, collection_name, list_indexed_repos, run_indexing
+from jobs import ACTIVE_STATES, DONE, JobManager
+
+# Seconds between progress checks while waiting for indexing jobs
+POLL_INTERVAL = 0.5
+# Commits indexed per repository unless the manifest or --depth says otherwise (0 = all)
+DEFAULT_DEPTH = 500
+
+
+def load_manifest(path: str, defaults: dict) -> list[dict]:
+    """Index requests from a manifest file, with `defaults` filling missing fields."""
+    with open(path) as f:
+        text = f.read()
+
+    if path.endswith(".json"):
+        entries = [
+            {"repo_url": entry} if isinstance(entry, str) else dict(entry)
+            for entry in json.loads(text)
+        ]
+    else:
+        entries = []
+        for line in text.splitlines():
+            fields = line.split("#", 1)[0].split()
+            if fields:
+                entries.append({"repo_url": fields[0], "branch": fields[1] if len(fields) > 1 else None})
+
+    return [{**defaults, **{k: v for k, v in entry.items() if v is not None}} for entry in entries]
+
+
+def index_repos(entries: list[dict], workers: int, token: str = None, runner=None, out=None) -> list[dict]:
+    """
+    Index every manifest entry on a pool of `workers` jobs, printing
+    progress as it changes. Returns the finished job records, in order.
+    """
+    out = out or sys.stdout
+    manager = JobManager(workers=workers, runner=runner or run_indexing)
+    labels = {}
+    try:
+        for entry in entries:
+            job_id = manager.submit(
+                entry["repo_url"],
+                entry["depth"],
+                token=token,
+                incremental=entry["incremental"],
+                branch=entry.get("branch"),
+                hunks=entry["hunks"],
+            )
+            labels[job_id] = entry["repo_url"] + (f"@{entry['branch']}" if entry.get("branch") else "")
+
+        last = {}
+        while True:
+            jobs = {job_id: manager.get(job_id) for job_id in labels}
+            for job_id, job in jobs.items():
+                line = job["message"]
+                if job["state"] in ACTIVE_STATES and job["progress"]:
+                    line += f" ({job['progress']:.0%})"
+                if last.get(job_id) != line:
+                    print(f"[{labels[job_id]}] {line}", file=out, flush=True)
+                    last[job_id] = line
+            if all(job["state"] not in ACTIVE_STATES for job in jobs.values()):
+                return [jobs[job_id] for job_id in labels]
+            time.sleep(POLL_INTERVAL)
+
+    except KeyboardInterrupt:
+        for job_id in labels:
+            manager.cancel(job_id)
+        raise
+    finally:
+        manager.shutdown()
+
+
+def answer(question: str, collection: str, author: str = None, start_date: str = None, end_date: str = None) -> dict:
+    """Ask one standalone question; returns the full answer and timings."""
+    from qa import ask
+
+    stream = ask(question, [], collection_name=collection, author=author, start_date=start_date, end_date=end_date)
+    text = "".join(chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices)
+    return {"question": question, "answer": text, "ttft": stream.ttft}
+
+
+def _format_stats(repos: list[dict]) -> str:
+    rows = [("REPOSITORY", "COMMITS", "SIZE", "HEAD", "INDEXED")]
+    for repo in repos:
+        rows.append((
+            repo.get("repo_url", repo["name"]) + (f"@{repo['branch']}" if repo.get("branch") else ""),
+            str(repo.get("commits", 0)),
+            f"{repo.get('bytes', 0) / 1024 ** 2:.1f} MB",
+            (repo.get("head") or "")[:10],
+            datetime.fromtimestamp(repo["indexed_at"]).strftime("%Y-%m-%d %H:%M") if repo.get("indexed_at") else "",
+        ))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
+
+
+def _cmd_index(args) -> int:
+    defaults = {"depth": args.depth, "incremental": not args.full, "hunks": args.hunks, "branch": args.branch}
+    entries = [{**defaults, "repo_url": url} for url in args.repos]
+    if args.manifest:
+        entries += load_manifest(args.manifest, defaults)
+    if not entries:
+        print("Nothing to index: pass repository URLs or --manifest.", file=sys.stderr)
+        return 2
+
+    jobs = index_repos(entries, args.jobs, token=args.token)
+    failed = [job for job in jobs if job["state"] != DONE]
+    print(f"{len(jobs) - len(failed)}/{len(jobs)} repositories indexed.")
+    return 1 if failed else 0
+
+
+def _cmd_query(args) -> int:
+    collection = collection_name(args.repo, args.branch)
+    if collection not in {repo["name"] for repo in list_indexed_repos()}:
+        print(f"{args.repo} is not indexed yet; run `cli.py index {args.repo}` first.", file=sys.stderr)
+        return 1
+
+    questions = list(args.questions)
+    if args.questions_file:
+        with open(args.questions_file) as f:
+            questions += [line.strip() for line in f if line.strip()]
+    if not questions:
+        print("No questions given.", file=sys.stderr)
+        return 2
+
+    def run(question: str) -> dict:
+        return answer(question, collection, args.author, args.start_date, args.end_date)
+
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        for result in pool.map(run, questions):
+            if args.json:
+                print(json.dumps(result), flush=True)
+            else:
+                print(f"Q: {result['question']}\n\n{result['answer']}\n", flush=True)
+    return 0
+
+
+def _cmd_stats(args) -> int:
+    repos = list_indexed_repos()
+    if args.json:
+        print(json.dumps(repos, indent=2))
+    elif repos:
+        print(_format_stats(repos))
+    else:
+        print("No repositories indexed yet.")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="log timings and cache stats to stderr (-vv: also LLM call metrics)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index = commands.add_parser("index", help="index (or refresh) repositories")
+    index.add_argument("repos", nargs="*", help="repository URLs")
+    index.add_argument("--manifest", help="JSON or text file listing repositories")
+    index.add_argument("--branch", help="branch to index (default: the remote HEAD)")
+    index.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="commits to index, 0 for all")
+    index.add_argument("--full", action="store_true", help="rebuild instead of refreshing incrementally")
+    index.add_argument("--hunks", action="store_true", default=HUNK_INDEX, help="also build the hunk-level index")
+    index.add_argument("--jobs", type=int, default=2, help="repositories indexed in parallel")
+    index.add_argument("--token", default=os.getenv("GITHUB_TOKEN"), help="GitHub token for private repositories")
+    index.set_defaults(func=_cmd_index)
+
+    query = commands.add_parser("query", help="ask questions about an indexed repository")
+    query.add_argument("repo", help="repository URL")
+    query.add_argument("questions", nargs="*", help="questions to ask")
+    query.add_argument("--questions", dest="questions_file", help="file with one question per line")
+    query.add_argument("--branch")
+    query.add_argument("--author", help="only commits by this author")
+    query.add_argument("--since", dest="start_date", help="YYYY-MM-DD")
+    query.add_argument("--until", dest="end_date", help="YYYY-MM-DD")
+    query.add_argument("--jobs", type=int, default=1, help="questions answered in parallel")
+    query.add_argument("--json", action="store_true", help="one JSON object per answer")
+    query.set_defaults(func=_cmd_query)
+
+    stats = commands.add_parser("stats", help="list indexed repositories")
+    stats.add_argument("--json", action="store_true")
+    stats.set_defaults(func=_cmd_stats)
+
+    return parser
+
+
+def main(argv: list[str] = None) -> int:
+    load_dotenv()
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+    args = build_parser().parse_args(argv)
+    level = [logging.WARNING, logging.INFO, logging.DEBUG][min(args.verbose, 2)]
+    logging.basicConfig(format="%(message)s", stream=sys.stderr)
+    logging.getLogger().setLevel(level)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
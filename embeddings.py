@@ -0,0 +1,249 @@
+import sqlite3
+import hashlib
+import threading
+import time
+
+import numpy as np
+
+from registry import registry
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# all-MiniLM-L6-v2 truncates inputs to 256 word pieces
+MAX_SEQ_TOKENS = 256
+# Rough chars-per-token ratio for code and commit prose
+CHARS_PER_TOKEN = 4
+# Padded tokens per forward pass (batch size x longest doc in the batch)
+EMBED_TOKEN_BUDGET = 32768
+# Share of available memory a single forward pass may use
+EMBED_MEMORY_FRACTION = 0.25
+# Approximate activation memory per padded token during inference
+BYTES_PER_TOKEN = 64 * 1024
+# Upper bound on the on-disk embedding cache before LRU eviction kicks in
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+# After eviction the cache is trimmed down to this share of CACHE_MAX_BYTES
+CACHE_TRIM_RATIO = 0.9
+# Layout of the embedding cache table; a cache with another version is
+# dropped and rebuilt (2: keyed by document_key rather than commit sha)
+CACHE_SCHEMA_VERSION = 2
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate, capped at what the model actually reads."""
+    return max(1, min(len(text) // CHARS_PER_TOKEN, MAX_SEQ_TOKENS))
+
+
+def _read_int(path: str) -> int | None:
+    try:
+        with open(path) as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    return int(value) if value.isdigit() else None
+
+
+def available_memory() -> int | None:
+    """
+    Bytes of memory available to this process, honouring a cgroup v2 limit
+    when running in a container. Returns None if it can't be determined.
+    """
+    available = None
+
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) * 1024
+                    break
+    except (OSError, ValueError):
+        pass
+
+    limit = _read_int("/sys/fs/cgroup/memory.max")
+    usage = _read_int("/sys/fs/cgroup/memory.current")
+    if limit is not None and usage is not None:
+        headroom = max(limit - usage, 0)
+        available = headroom if available is None else min(available, headroom)
+
+    return available
+
+
+def token_budget(memory: int | None = None) -> int:
+    """
+    Padded-token budget for one forward pass: EMBED_TOKEN_BUDGET, reduced if
+    available memory is tight, but always large enough for one full document.
+    """
+    if memory is None:
+        memory = available_memory()
+
+    budget = EMBED_TOKEN_BUDGET
+    if memory is not None:
+        budget = min(budget, int(memory * EMBED_MEMORY_FRACTION) // BYTES_PER_TOKEN)
+
+    return max(budget, MAX_SEQ_TOKENS)
+
+
+def plan_batches(commits, budget: int):
+    """
+    Group commit dicts into embedding batches whose padded size
+    (batch length x longest document) stays within `budget` tokens.
+    Many short commits share one large batch; long diffs get smaller ones.
+    """
+    batch = []
+    longest = 0
+
+    for commit in commits:
+        tokens = estimate_tokens(commit["content"])
+        padded = (len(batch) + 1) * max(longest, tokens)
+
+        if batch and padded > budget:
+            yield batch
+            batch = []
+            longest = 0
+
+        batch.append(commit)
+        longest = max(longest, tokens)
+
+    if batch:
+        yield batch
+
+
+def load_model():
+    """Load the SentenceTransformer behind EMBEDDING_MODEL (imports torch)."""
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+
+def get_model():
+    """The process-wide SentenceTransformer, loaded on first use."""
+    return registry.get(("embedding model", EMBEDDING_MODEL), load_model)
+
+
+def embed_documents(model, docs: list[str]) -> list:
+    """
+    Embed `docs` in a single forward pass. Produces the same vectors as
+    ChromaDB's SentenceTransformerEmbeddingFunction for this model.
+    """
+    return model.encode(
+        docs,
+        batch_size=max(len(docs), 1),
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    )
+
+
+def document_key(text: str) -> str:
+    """Cache key for an embedded document: the SHA-256 of its text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed store of document embeddings.
+
+    Vectors are keyed by (document_key(text), doc_version, model), so a
+    commit whose document changes (a deepened shallow boundary, a new hunk
+    budget) is re-embedded rather than served a stale vector, and
+    identical documents share one entry across collections and
+    re-indexes. Least recently used entries are evicted once the cache
+    grows past `max_bytes`. Caches written with another
+    CACHE_SCHEMA_VERSION are dropped on open.
+    """
+
+    def __init__(self, path: str, doc_version: int, model: str = EMBEDDING_MODEL, max_bytes: int = CACHE_MAX_BYTES):
+        self.doc_version = doc_version
+        self.model = model
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != CACHE_SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS embeddings")
+            self._conn.execute(f"PRAGMA user_version = {CACHE_SCHEMA_VERSION}")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT NOT NULL,
+                doc_version INTEGER NOT NULL,
+                model TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (key, doc_version, model)
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings (last_used)")
+        self._conn.commit()
+
+    def get_many(self, keys: list[str]) -> dict:
+        """Return {key: vector} for the document keys already cached; marks them recently used."""
+        if not keys:
+            return {}
+
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE doc_version = ? AND model = ? AND key IN ({placeholders})",
+                    [self.doc_version, self.model, *chunk],
+                ).fetchall()
+                found.update((key, np.frombuffer(vector, dtype=np.float32)) for key, vector in rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ? AND doc_version = ? AND model = ?",
+                    [(now, key, self.doc_version, self.model) for key in found],
+                )
+                self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    def put_many(self, items: dict) -> None:
+        """Store {key: vector} and evict least recently used entries if over budget."""
+        if not items:
+            return
+
+        now = time.time()
+        rows = []
+        for key, vector in items.items():
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows.append((key, self.doc_version, self.model, blob, len(blob), now))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, doc_version, model, vector, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * CACHE_TRIM_RATIO)
+        freed = 0
+        doomed = []
+        for rowid, size in self._conn.execute("SELECT rowid, size FROM embeddings ORDER BY last_used"):
+            if total - freed <= target:
+                break
+            doomed.append((rowid,))
+            freed += size
+
+        self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", doomed)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,264 @@
+import os
+import re
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# Rows buffered in memory before a parquet part file is written
+FACTS_PART_ROWS = 100_000
+# Rows shown to the LLM for ranked (author/file/directory) aggregations
+DEFAULT_TOP_N = 10
+# Cap on rows for time-bucketed aggregations (e.g. 5 years of months)
+MAX_TIME_BUCKETS = 60
+
+FACT_COLUMNS = ["sha", "author", "timestamp", "path", "added", "removed"]
+
+_TIME_BUCKETS = {"day": "D", "week": "W", "month": "M", "year": "Y"}
+_UNITS = {"day": 1, "week": 7, "month": 30, "year": 365}
+
+_PATH_RE = re.compile(r"`([^`]+)`|(?<![\w/.])((?:[\w.-]+/)+[\w.-]*|[\w-]+\.[A-Za-z]{1,5})(?![\w/])")
+_TOP_RE = re.compile(r"\btop\s+(\d+)\b")
+_LAST_N_RE = re.compile(r"\b(?:last|past)\s+(\d+)\s+(day|week|month|year)s?\b")
+_LAST_UNIT_RE = re.compile(r"\b(?:last|past)\s+(day|week|month|year)\b")
+_IN_YEAR_RE = re.compile(r"\b(in|during|since)\s+((?:19|20)\d\d)\b")
+_NAME_PART_RE = re.compile(r"[\w.-]+")
+# Shorter name parts ("al", "jo") are too likely to be ordinary words
+_MIN_NAME_PART = 3
+
+
+def commit_facts(commits: list[dict]) -> list[dict]:
+    """
+    One row per (commit, file) from miner commit dicts. Commits that touch
+    no indexed files still get a row (path None) so commit counts are exact.
+    """
+    rows = []
+    for commit in commits:
+        base = {"sha": commit["hash"], "author": commit["author"], "timestamp": int(commit["timestamp"])}
+        files = commit.get("files") or [{"path": None, "added": 0, "removed": 0}]
+        rows.extend({**base, **f} for f in files)
+    return rows
+
+
+class FactWriter:
+    """Appends fact rows to a directory of parquet part files."""
+
+    def __init__(self, directory: str, part_rows: int = FACTS_PART_ROWS):
+        self.directory = directory
+        self.part_rows = part_rows
+        self._rows = []
+        os.makedirs(directory, exist_ok=True)
+
+    def add(self, commits: list[dict]) -> None:
+        self._rows.extend(commit_facts(commits))
+        if len(self._rows) >= self.part_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        frame = pd.DataFrame(self._rows, columns=FACT_COLUMNS).astype(
+            {"timestamp": "int64", "added": "int32", "removed": "int32"}
+        )
+        name = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+        tmp_path = os.path.join(self.directory, name + ".tmp")
+        frame.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+        self._rows = []
+
+    def close(self) -> None:
+        self.flush()
+
+
+# directory -> (part file names, DataFrame); reloaded when parts change
+_loaded = {}
+
+
+def load_facts(directory: str) -> pd.DataFrame | None:
+    """
+    All fact rows under `directory`, or None if nothing was written. An
+    incremental run that failed after flushing is redone from the same
+    base, so its (sha, path) rows are written twice; only the latest count.
+    """
+    try:
+        parts = tuple(sorted(p for p in os.listdir(directory) if p.endswith(".parquet")))
+    except OSError:
+        return None
+    if not parts:
+        return None
+
+    cached = _loaded.get(directory)
+    if cached and cached[0] == parts:
+        return cached[1]
+
+    frame = pd.concat(
+        [pd.read_parquet(os.path.join(directory, p)) for p in parts],
+        ignore_index=True,
+    ).drop_duplicates(["sha", "path"], keep="last", ignore_index=True)
+    frame["author"] = frame["author"].astype("category")
+    _loaded[directory] = (parts, frame)
+    return frame
+
+
+def _mentioned_author(text: str, authors) -> str | None:
+    # A full author name in the question, else a name part ("bob" for
+    # "Bob Smith") that only one author has
+    full = [a for a in authors if re.search(rf"(?<![\w.-]){re.escape(a.lower())}(?![\w-])", text)]
+    if full:
+        return max(full, key=len)
+
+    owners = {}
+    for author in authors:
+        for part in _NAME_PART_RE.findall(author.lower()):
+            if len(part) >= _MIN_NAME_PART:
+                owners.setdefault(part, set()).add(author)
+    named = {
+        author
+        for word in _NAME_PART_RE.findall(text)
+        if len(owners.get(word, ())) == 1
+        for author in owners[word]
+    }
+    return named.pop() if len(named) == 1 else None
+
+
+def plan_aggregation(query: str, now: datetime = None, authors=()) -> dict:
+    """
+    Turn an aggregate question into a spec for aggregate():
+    group_by (author/path/directory/day/week/month/year), sort_by
+    (commits/churn/added/removed), optional path prefix, time window, top N
+    and the author, out of `authors`, the question names.
+    """
+    now = now or datetime.now()
+    text = query.lower()
+
+    group_by = "author"
+    for bucket in _TIME_BUCKETS:
+        if re.search(rf"\b(per|each|by|every) {bucket}\b|\b{bucket}ly\b", text) or (bucket == "day" and "daily" in text):
+            group_by = bucket
+            break
+    else:
+        if re.search(r"\b(director(y|ies)|folders?|dirs?|modules?)\b", text):
+            group_by = "directory"
+        elif re.search(r"\bfiles?\b", text):
+            group_by = "path"
+
+    if re.search(r"\b(churn|lines? changed|changed lines)\b", text):
+        sort_by = "churn"
+    elif re.search(r"\blines? added\b|\badded lines\b", text):
+        sort_by = "added"
+    elif re.search(r"\blines? (removed|deleted)\b|\b(removed|deleted) lines\b", text):
+        sort_by = "removed"
+    else:
+        sort_by = "commits"
+
+    path = None
+    match = _PATH_RE.search(query)
+    if match:
+        path = (match.group(1) or match.group(2)).strip()
+
+    start = end = None
+    if m := _LAST_N_RE.search(text):
+        start = now - timedelta(days=int(m.group(1)) * _UNITS[m.group(2)])
+    elif m := _LAST_UNIT_RE.search(text):
+        start = now - timedelta(days=_UNITS[m.group(1)])
+    elif "this year" in text:
+        start = datetime(now.year, 1, 1)
+    elif m := _IN_YEAR_RE.search(text):
+        year = int(m.group(2))
+        start = datetime(year, 1, 1)
+        if m.group(1) != "since":
+            end = datetime(year + 1, 1, 1) - timedelta(seconds=1)
+
+    top = _TOP_RE.search(text)
+    return {
+        "group_by": group_by,
+        "sort_by": sort_by,
+        "path": path,
+        "start_ts": int(start.timestamp()) if start else None,
+        "end_ts": int(end.timestamp()) if end else None,
+        "top": int(top.group(1)) if top else None,
+        "author": _mentioned_author(text, authors),
+    }
+
+
+def aggregate(
+    facts: pd.DataFrame,
+    spec: dict,
+    author: str = None,
+    start_ts: int = None,
+    end_ts: int = None,
+) -> pd.DataFrame:
+    """
+    Vectorised group-by over fact rows. `author`/`start_ts`/`end_ts` are the
+    UI filters, applied on top of the spec's own author and time window.
+    Returns columns [<group_by>, commits, added, removed, churn].
+    """
+    mask = pd.Series(True, index=facts.index)
+
+    for name in (author, spec.get("author")):
+        if name:
+            mask &= facts["author"] == name
+    for lower in (start_ts, spec.get("start_ts")):
+        if lower is not None:
+            mask &= facts["timestamp"] >= lower
+    for upper in (end_ts, spec.get("end_ts")):
+        if upper is not None:
+            mask &= facts["timestamp"] <= upper
+
+    if spec.get("path"):
+        prefix = spec["path"]
+        paths = facts["path"].fillna("")
+        # "auth/" or "auth" match the directory; "auth/login.py" the file
+        mask &= (paths == prefix) | paths.str.startswith(prefix.rstrip("/") + "/")
+
+    rows = facts[mask]
+    group_by = spec["group_by"]
+
+    if group_by in _TIME_BUCKETS:
+        stamps = pd.to_datetime(rows["timestamp"], unit="s")
+        key = stamps.dt.to_period(_TIME_BUCKETS[group_by]).astype(str)
+    elif group_by == "directory":
+        key = rows["path"].str.rpartition("/")[0].replace("", ".")
+    elif group_by == "path":
+        key = rows["path"]
+    else:
+        key = rows["author"].astype(str)
+
+    table = (
+        rows.assign(**{group_by: key})
+        .groupby(group_by, observed=True, sort=False)
+        .agg(commits=("sha", "nunique"), added=("added", "sum"), removed=("removed", "sum"))
+        .reset_index()
+    )
+    table["churn"] = table["added"] + table["removed"]
+
+    if group_by in _TIME_BUCKETS:
+        return table.sort_values(group_by).tail(spec.get("top") or MAX_TIME_BUCKETS).reset_index(drop=True)
+
+    table = table.sort_values([spec["sort_by"], group_by], ascending=[False, True])
+    return table.head(spec.get("top") or DEFAULT_TOP_N).reset_index(drop=True)
+
+
+def describe(spec: dict) -> str:
+    """One-line human readable summary of an aggregation spec."""
+    parts = [f"grouped by {spec['group_by']}"]
+    if spec["group_by"] not in _TIME_BUCKETS:
+        parts.append(f"sorted by {spec['sort_by']}")
+    if spec.get("author"):
+        parts.append(f"author {spec['author']}")
+    if spec.get("path"):
+        parts.append(f"path {spec['path']}")
+    if spec.get("start_ts"):
+        parts.append(f"from {datetime.fromtimestamp(spec['start_ts']):%Y-%m-%d}")
+    if spec.get("end_ts"):
+        parts.append(f"to {datetime.fromtimestamp(spec['end_ts']):%Y-%m-%d}")
+    return ", ".join(parts)
+
+
+def format_table(table: pd.DataFrame) -> str:
+    """Compact pipe-separated table for the LLM prompt."""
+    lines = [" | ".join(table.columns)]
+    for row in table.itertuples(index=False):
+        lines.append(" | ".join(str(value) for value in row))
+    return "\n".join(lines)
@@ -1,64 +1,382 @@
 import os
+import re
+import json
 import shutil
+import hashlib
+import logging
+import time
+import uuid
+import fcntl
+import threading
+from contextlib import contextmanager
 import git
-import chromadb
-import streamlit as st
-from chromadb.utils import embedding_functions
 
-from miner import load_git_history
+from lexical import LexicalIndex
+from timeline import Timeline
+from embeddings import (
+    EMBEDDING_MODEL,
+    EmbeddingCache,
+    document_key,
+    embed_documents,
+    get_model,
+    plan_batches,
+    token_budget,
+)
+from miner import DOC_FORMAT_VERSION, hunk_documents, load_git_history
+from mirrors import ensure_mirror, lease_mirror, mirror_path, prefetch_blobs
+from pipeline import StageStats, format_stats, run_pipeline
+from registry import registry
 from utils import (
-    TEMP_REPO_PATH,
     CHROMA_PATH,
+    EMBEDDING_CACHE_PATH,
     inject_github_token,
+    normalize_repo_url,
+    remove_readonly,
 )
 
-BATCH_SIZE = 10
-EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+logger = logging.getLogger(__name__)
+
+# Commits per ChromaDB write, independent of the embedding batch size
+WRITE_BATCH_SIZE = 256
+# Minimum seconds between progress updates in the UI
+PROGRESS_INTERVAL = 0.5
+# Worker processes used to extract diffs (GitPython backend only)
+MINE_WORKERS = os.cpu_count() or 1
+# "log" streams one `git log -p`; "gitpython" runs one `git diff` per commit,
+# sharded across MINE_WORKERS spawned processes. A single log stream mined
+# about 10× faster than one gitpython worker (benchmarks/bench_mining.py),
+# so gitpython only pays off on machines with many more cores than that
+MINE_BACKEND = "log"
+# Registry of indexed repositories: collection name -> last indexed HEAD,
+# size estimate and last use (for incremental refreshes and LRU eviction)
+INDEX_STATE_FILE = "index_state.json"
+# Estimated bytes all indexed repositories may occupy before the least
+# recently used collections are evicted
+CHROMA_DISK_BUDGET = 2 * 1024 ** 3
+# Per-collection side indexes (BM25, ...) live in CHROMA_PATH/SIDECAR_DIR/<name>/
+SIDECAR_DIR = "sidecars"
+# Per-collection lock files (see _chroma_locked) live in CHROMA_PATH/LOCK_DIR/
+LOCK_DIR = "locks"
+
+# Seconds between writes of a collection's last_used; it only orders LRU
+# eviction, so questions don't each rewrite the registry
+TOUCH_INTERVAL = 300
+
+# Serializes read-modify-write of the registry between threads (see _state_locked)
+_state_lock = threading.RLock()
+# Nesting depth of _state_locked() in the thread holding _state_lock
+_state_depth = 0
+# Collections being written right now, which eviction must leave alone
+_indexing = set()
+# Guards reopening the ChromaDB client and _seen
+_client_lock = threading.Lock()
+# Collection -> write stamp of its lock file as of the current client's
+# last access; cleared when the client is reopened
+_seen = {}
+# Also index every (commit, file, hunk) as its own vector, in a second
+# collection named by hunk_collection_name()
+HUNK_INDEX = False
+
+
+def _build_embedding_function():
+    from chromadb.utils import embedding_functions
+
+    # Chroma's function keeps loaded models in a class-level cache; seed it
+    # with the shared model so the weights are only loaded once per process
+    function_class = embedding_functions.SentenceTransformerEmbeddingFunction
+    if isinstance(getattr(function_class, "models", None), dict):
+        function_class.models.setdefault(EMBEDDING_MODEL, get_model())
+    return function_class(model_name=EMBEDDING_MODEL)
 
 
 def _get_embedding_function():
-    return embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=EMBEDDING_MODEL
-    )
+    return registry.get(("embedding function", EMBEDDING_MODEL), _build_embedding_function)
 
 
-def get_collection():
-    client = chromadb.PersistentClient(path=CHROMA_PATH)
+def _build_client():
+    import chromadb
 
-    return client.get_collection(
-        name="git_commits",
-        embedding_function=_get_embedding_function(),
-    )
+    return chromadb.PersistentClient(path=CHROMA_PATH)
 
 
-def _clone_repo(repo_url: str, commit_limit: int, token: str, status_text) -> bool:
-    auth_url = inject_github_token(repo_url, token)
+def _get_client():
+    """The process-wide ChromaDB client for CHROMA_PATH (see _chroma_locked)."""
+    return registry.get(("chroma client", CHROMA_PATH), _build_client)
+
+
+def _reopen_client(stale) -> None:
+    # Chroma shares one system per path within a process, so drop that too
+    # or the new client would get the same in-memory collections back
+    if _get_client() is stale:
+        clear_system_cache = getattr(type(stale), "clear_system_cache", None)
+        if clear_system_cache is not None:
+            clear_system_cache()
+        registry.discard(("chroma client", CHROMA_PATH))
+        _seen.clear()
 
+
+@contextmanager
+def _chroma_locked(name: str, write: bool = False):
+    """
+    Yield the ChromaDB client for one read (or, with `write`, one write) of
+    collection `name` and its hunk collection.
+
+    A PersistentClient keeps collections in memory and doesn't see writes
+    made by other clients, such as the CLI next to the app. Reads therefore
+    hold a shared flock on the collection's lock file and writes an
+    exclusive one, and each write leaves a new stamp in it. A stamp the
+    current client hasn't seen means the collection was written elsewhere,
+    and the client is reopened before use.
+    """
+    os.makedirs(os.path.join(CHROMA_PATH, LOCK_DIR), exist_ok=True)
+    fd = os.open(os.path.join(CHROMA_PATH, LOCK_DIR, f"{name}.lock"), os.O_RDWR | os.O_CREAT)
     try:
-        if commit_limit == 0:
-            status_text.info(
-                f"⏳ Cloning full history of {repo_url}... this may take a while."
-            )
-            git.Repo.clone_from(auth_url, TEMP_REPO_PATH)
-        else:
-            status_text.info(
-                f"⏳ Shallow cloning {repo_url} (last {commit_limit} commits)..."
-            )
-            git.Repo.clone_from(auth_url, TEMP_REPO_PATH, depth=commit_limit)
+        fcntl.flock(fd, fcntl.LOCK_EX if write else fcntl.LOCK_SH)
+        stamp = os.pread(fd, 64, 0).decode()
 
-        return True
+        with _client_lock:
+            client = _get_client()
+            if _seen.get(name, stamp) != stamp:
+                _reopen_client(client)
+                client = _get_client()
 
-    except Exception as e:
-        status_text.error(f"❌ Failed to clone: {e}")
-        return False
+        try:
+            yield client
+        finally:
+            # Even a failed write may have changed the collection
+            if write:
+                stamp = uuid.uuid4().hex
+                os.ftruncate(fd, 0)
+                os.pwrite(fd, stamp.encode(), 0)
+            with _client_lock:
+                if client is _get_client():
+                    _seen[name] = stamp
+    finally:
+        os.close(fd)
+
+
+class LockedCollection:
+    """
+    Read-only handle on a ChromaDB collection whose calls each hold its
+    lock (see _chroma_locked) and go through the current client.
+    """
+
+    def __init__(self, name: str, lock_name: str = None):
+        self.name = name
+        self._lock_name = lock_name or name
+
+    def _call(self, method: str, **kwargs):
+        with _chroma_locked(self._lock_name) as client:
+            collection = client.get_collection(name=self.name, embedding_function=_get_embedding_function())
+            return getattr(collection, method)(**kwargs)
+
+    def get(self, **kwargs):
+        return self._call("get", **kwargs)
+
+    def query(self, **kwargs):
+        return self._call("query", **kwargs)
+
+    def count(self) -> int:
+        return self._call("count")
+
+
+def warm_up() -> None:
+    """Load the embedding model, embedding function and ChromaDB client now rather than on first use."""
+    _get_embedding_function()
+    _get_client()
+
+
+def collection_name(repo_url: str, branch: str = None) -> str:
+    """
+    ChromaDB collection for one repository branch, derived from the
+    normalized remote URL so every spelling of the URL maps to the same index.
+    """
+    key = f"{normalize_repo_url(repo_url)}@{branch or 'HEAD'}"
+    slug = re.sub(r"[^a-zA-Z0-9]+", "-", key.split("://", 1)[-1])[-40:].strip("-")
+    digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+    return f"{slug}-{digest}" if slug else f"repo-{digest}"
+
+
+def get_collection(name: str) -> LockedCollection:
+    collection = LockedCollection(name)
+    # Raises now, like client.get_collection, if it doesn't exist
+    collection.count()
+    _touch(name)
+
+    return collection
+
+
+def hunk_collection_name(name: str) -> str:
+    return f"{name}_hunks"
+
+
+def get_hunk_collection(name: str) -> LockedCollection | None:
+    """Hunk-level collection for `name`, or None if it was indexed without one."""
+    if not _load_index_state().get(name, {}).get("hunks"):
+        return None
+
+    collection = LockedCollection(hunk_collection_name(name), lock_name=name)
+    try:
+        collection.count()
+    except Exception:
+        return None
+    return collection
+
+
+def _delete_collections(name: str) -> None:
+    with _chroma_locked(name, write=True) as client:
+        for collection in (name, hunk_collection_name(name)):
+            try:
+                client.delete_collection(collection)
+            except Exception:
+                pass
+
+
+def sidecar_path(name: str, filename: str) -> str:
+    """Path of a side index stored alongside collection `name`."""
+    directory = os.path.join(CHROMA_PATH, SIDECAR_DIR, name)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, filename)
+
+
+def _drop_sidecars(name: str) -> None:
+    shutil.rmtree(os.path.join(CHROMA_PATH, SIDECAR_DIR, name), onerror=remove_readonly)
+
+
+def _open_sidecar(name: str, filename: str, cls):
+    # Collections indexed before a side index existed simply don't have one
+    path = os.path.join(CHROMA_PATH, SIDECAR_DIR, name, filename)
+    if not os.path.exists(path):
+        return None
+    return cls(path)
+
+
+def get_lexical_index(name: str) -> LexicalIndex | None:
+    """BM25 index for collection `name`, or None if it was indexed without one."""
+    return _open_sidecar(name, "lexical.sqlite", LexicalIndex)
 
 
-def _validate_repo(repo_url: str, token: str, status_text) -> bool:
+def get_timeline(name: str) -> Timeline | None:
+    """Timestamp-ordered index for collection `name`, or None if missing."""
+    return _open_sidecar(name, "timeline.sqlite", Timeline)
+
+
+def get_facts(name: str):
+    """Per-commit, per-file facts DataFrame for collection `name`, or None if missing."""
+    from facts import load_facts
+
+    return load_facts(os.path.join(CHROMA_PATH, SIDECAR_DIR, name, "facts"))
+
+
+def indexed_head(name: str) -> str | None:
+    """HEAD sha collection `name` was last indexed at, or None if unknown."""
+    return _load_index_state().get(name, {}).get("head")
+
+
+def list_indexed_repos() -> list[dict]:
+    """Indexed repositories, most recently used first."""
+    state = _load_index_state()
+    repos = [{"name": name, **entry} for name, entry in state.items()]
+    return sorted(repos, key=lambda r: r.get("last_used", 0), reverse=True)
+
+
+def _load_index_state() -> dict:
+    path = os.path.join(CHROMA_PATH, INDEX_STATE_FILE)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index_state(state: dict) -> None:
+    os.makedirs(CHROMA_PATH, exist_ok=True)
+    path = os.path.join(CHROMA_PATH, INDEX_STATE_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def _state_locked():
+    # Hold the registry for a read-modify-write. Other processes (the CLI
+    # next to the app) are kept out by an flock on a lock file beside it;
+    # re-entrant within a thread, like _state_lock
+    global _state_depth
+    with _state_lock:
+        if _state_depth == 0:
+            os.makedirs(CHROMA_PATH, exist_ok=True)
+            lock_file = open(os.path.join(CHROMA_PATH, INDEX_STATE_FILE + ".lock"), "w")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        _state_depth += 1
+        try:
+            yield
+        finally:
+            _state_depth -= 1
+            if _state_depth == 0:
+                lock_file.close()
+
+
+def _touch(name: str) -> None:
+    if time.time() - _load_index_state().get(name, {}).get("last_used", time.time()) < TOUCH_INTERVAL:
+        return
+    with _state_locked():
+        state = _load_index_state()
+        if name in state:
+            state[name]["last_used"] = time.time()
+            _save_index_state(state)
+
+
+def _forget(name: str) -> None:
+    # Drop a collection, its side indexes and its registry entry
+    with _state_locked():
+        _delete_collections(name)
+        _drop_sidecars(name)
+        state = _load_index_state()
+        if state.pop(name, None) is not None:
+            _save_index_state(state)
+
+
+def _evict_collections(keep: str) -> list[str]:
+    # Drop least recently used repositories until the estimated size of
+    # everything indexed fits CHROMA_DISK_BUDGET; `keep` and collections
+    # still being indexed are never evicted
+    with _state_locked():
+        state = _load_index_state()
+        used = sum(entry.get("bytes", 0) for entry in state.values())
+        evicted = []
+
+        by_age = sorted(state, key=lambda name: state[name].get("last_used", 0))
+
+        for name in by_age:
+            if used <= CHROMA_DISK_BUDGET:
+                break
+            if name == keep or name in _indexing:
+                continue
+
+            _delete_collections(name)
+            _drop_sidecars(name)
+
+            used -= state.pop(name).get("bytes", 0)
+            evicted.append(name)
+
+        if evicted:
+            _save_index_state(state)
+        return evicted
+
+
+def print_status(level: str, message: str) -> None:
+    """Default `on_status` callback: print to the console."""
+    print(message)
+
+
+def _validate_repo(repo_url: str, token: str, on_status) -> bool:
     if not repo_url.startswith(("http://", "https://")):
-        status_text.error("❌ Invalid URL. Must start with http:// or https://")
+        on_status("error", "❌ Invalid URL. Must start with http:// or https://")
         return False
 
-    status_text.info("📡 Verifying repository...")
+    on_status("info", "📡 Verifying repository...")
 
     auth_url = inject_github_token(repo_url, token)
 
@@ -70,98 +388,341 @@ def _validate_repo(repo_url: str, token: str, status_text) -> bool:
         msg = str(e).lower()
 
         if "not found" in msg:
-            status_text.error("❌ Repository not found. Check the URL.")
+            on_status("error", "❌ Repository not found. Check the URL.")
         elif "authentication" in msg or "could not read password" in msg:
-            status_text.error("🔒 Repository is private. Access denied.")
+            on_status("error", "🔒 Repository is private. Access denied.")
         else:
-            status_text.error(f"❌ Git error: {e}")
+            on_status("error", f"❌ Git error: {e}")
 
         return False
 
 
-def _index_commits(commit_limit: int, status_text, progress_bar) -> int:
-    os.makedirs(CHROMA_PATH, exist_ok=True)
+def _commit_metadata(commit: dict) -> dict:
+    return {
+        "author": str(commit["author"]),
+        "date": str(commit["date"]),
+        "timestamp": int(commit["timestamp"]),
+    }
 
-    client = chromadb.PersistentClient(path=CHROMA_PATH)
 
-    try:
-        client.delete_collection("git_commits")
-    except Exception:
-        pass
+def _estimate_bytes(commit: dict) -> int:
+    # Document text plus the float32 vector and roughly as much again for
+    # the HNSW graph and metadata, for the commit and each of its hunks
+    size = len(commit["content"].encode()) + len(commit["embedding"]) * 4 * 2
+    for hunk in commit.get("hunks", []):
+        size += len(hunk["content"].encode()) + len(hunk["embedding"]) * 4 * 2
+    return size
 
-    collection = client.get_or_create_collection(
-        name="git_commits",
-        embedding_function=_get_embedding_function(),
-    )
 
-    batch_ids = []
-    batch_docs = []
-    batch_meta = []
+def _hunk_metadata(commit: dict, hunk: dict) -> dict:
+    return {**_commit_metadata(commit), "commit": hunk["commit"], "path": hunk["path"]}
 
-    total = 0
-    display_limit = commit_limit if commit_limit > 0 else 2000
-
-    for commit in load_git_history(TEMP_REPO_PATH):
-        batch_ids.append(commit["hash"])
-        batch_docs.append(commit["content"])
-
-        batch_meta.append(
-            {
-                "author": str(commit["author"]),
-                "date": str(commit["date"]),
-                "timestamp": int(commit["timestamp"]),
-            }
-        )
 
-        if len(batch_ids) >= BATCH_SIZE:
-            collection.add(
-                ids=batch_ids,
-                documents=batch_docs,
-                metadatas=batch_meta,
-            )
+def _index_commits(
+    name: str,
+    repo_path: str,
+    commit_limit: int,
+    on_status,
+    on_progress,
+    branch: str = None,
+    since: str = None,
+    hunks: bool = HUNK_INDEX,
+) -> tuple[int, int, list[StageStats]]:
+    os.makedirs(CHROMA_PATH, exist_ok=True)
 
-            total += len(batch_ids)
+    # Full runs rebuild from scratch; incremental runs upsert since..HEAD
+    if since is None:
+        _delete_collections(name)
+        _drop_sidecars(name)
 
-            status_text.info(f"🧠 Indexed {total} commits...")
-            progress_bar.progress(min(total / display_limit, 1.0))
+    embed = _get_embedding_function()
 
-            batch_ids = []
-            batch_docs = []
-            batch_meta = []
+    # Created up front so even a run that finds nothing leaves a collection
+    with _chroma_locked(name, write=True) as client:
+        client.get_or_create_collection(name=name, embedding_function=embed)
+        if hunks:
+            client.get_or_create_collection(name=hunk_collection_name(name), embedding_function=embed)
+
+    total = 0
+    added_bytes = 0
+    last_progress = 0.0
+    pending = []
+
+    rev = f"{since}..{branch or 'HEAD'}" if since else (branch or "HEAD")
+    if since:
+        repo = git.Repo(repo_path)
+        display_limit = max(int(repo.git.rev_list("--count", rev)), 1)
+    else:
+        display_limit = commit_limit if commit_limit > 0 else 2000
+
+    # A cached mirror may hold more history than asked for, so cap full runs
+    limit = None if since else (commit_limit or None)
+    prefetch_blobs(repo_path, rev, limit)
+    commits = load_git_history(
+        repo_path,
+        branch=branch,
+        limit=limit,
+        since=since,
+        workers=MINE_WORKERS,
+        backend=MINE_BACKEND,
+    )
 
-    if batch_ids:
-        collection.add(
-            ids=batch_ids,
-            documents=batch_docs,
-            metadatas=batch_meta,
+    cache = EmbeddingCache(EMBEDDING_CACHE_PATH, DOC_FORMAT_VERSION, EMBEDDING_MODEL)
+    lexical = LexicalIndex(sidecar_path(name, "lexical.sqlite"))
+    timeline = Timeline(sidecar_path(name, "timeline.sqlite"))
+    # facts pulls in pandas, which nothing else on the UI's import path needs
+    from facts import FactWriter
+
+    facts = FactWriter(sidecar_path(name, "facts"))
+    model = None
+
+    def embed_batch(batch: list[dict]) -> list[dict]:
+        nonlocal model
+
+        # Commits and their hunks are cached by the text that is embedded
+        documents = list(batch)
+        if hunks:
+            for commit in batch:
+                commit["hunks"] = hunk_documents(commit)
+                documents += commit["hunks"]
+
+        keys = [document_key(document["content"]) for document in documents]
+        texts = {key: document["content"] for key, document in zip(keys, documents)}
+        vectors = cache.get_many(list(texts))
+        misses = [key for key in texts if key not in vectors]
+
+        if misses:
+            # Only load the model once something actually needs embedding
+            if model is None:
+                model = get_model()
+            embeddings = embed_documents(model, [texts[key] for key in misses])
+            fresh = dict(zip(misses, embeddings))
+            cache.put_many(fresh)
+            vectors.update(fresh)
+
+        for key, document in zip(keys, documents):
+            document["embedding"] = vectors[key]
+        return batch
+
+    def flush() -> None:
+        nonlocal total, added_bytes, pending
+
+        if pending:
+            # Each write takes the collection's lock, so questions from
+            # other processes are only held up for one batch
+            with _chroma_locked(name, write=True) as client:
+                collection = client.get_or_create_collection(name=name, embedding_function=embed)
+                collection.upsert(
+                    ids=[commit["hash"] for commit in pending],
+                    embeddings=[commit["embedding"] for commit in pending],
+                    documents=[commit["content"] for commit in pending],
+                    metadatas=[_commit_metadata(commit) for commit in pending],
+                )
+                pairs = [(commit, hunk) for commit in pending for hunk in commit["hunks"]] if hunks else []
+                if pairs:
+                    hunk_collection = client.get_or_create_collection(
+                        name=hunk_collection_name(name),
+                        embedding_function=embed,
+                    )
+                    hunk_collection.upsert(
+                        ids=[hunk["id"] for _, hunk in pairs],
+                        embeddings=[hunk["embedding"] for _, hunk in pairs],
+                        documents=[hunk["content"] for _, hunk in pairs],
+                        metadatas=[_hunk_metadata(commit, hunk) for commit, hunk in pairs],
+                    )
+            lexical.add(pending)
+            timeline.add(pending)
+            facts.add(pending)
+            total += len(pending)
+            added_bytes += sum(_estimate_bytes(commit) for commit in pending)
+            pending = []
+
+    def report_progress() -> None:
+        # Per embedded batch rather than per write, so small runs show
+        # progress (and can be cancelled) before their first flush
+        nonlocal last_progress
+
+        if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+            last_progress = time.monotonic()
+            done = total + len(pending)
+            on_status("info", f"🧠 Indexed {done} commits...")
+            on_progress(min(done / display_limit, 1.0))
+
+    def write_batch(batch: list[dict]) -> None:
+        pending.extend(batch)
+        if len(pending) >= WRITE_BATCH_SIZE:
+            flush()
+        report_progress()
+
+    # Mining, embedding and writing overlap; the writer stays on this
+    # thread, so progress callbacks are always called from the caller's thread.
+    # Embedding batches are sized by token budget, writes by WRITE_BATCH_SIZE.
+    try:
+        stats = run_pipeline(
+            ("mine", plan_batches(commits, token_budget())),
+            [("embed", embed_batch)],
+            ("write", write_batch),
         )
-        total += len(batch_ids)
 
-    return total
+        start = time.perf_counter()
+        flush()
+        facts.close()
+        stats[-1].busy += time.perf_counter() - start
+    finally:
+        cache.close()
+        lexical.close()
+        timeline.close()
+
+    logger.info(
+        "📊 Indexing throughput: %s · embedding cache %d hits / %d misses",
+        format_stats(stats), cache.hits, cache.misses,
+    )
+
+    return total, added_bytes, stats
+
+
+def _incremental_base(name: str, commit_limit: int, hunks: bool = HUNK_INDEX) -> str | None:
+    # Only refresh incrementally if the collection still exists and was
+    # built with the same depth and the same hunk-index setting
+    state = _load_index_state().get(name)
+    if not state or state.get("commit_limit") != commit_limit:
+        return None
+    if bool(state.get("hunks")) != hunks:
+        return None
 
+    try:
+        with _chroma_locked(name) as client:
+            client.get_collection(name=name)
+    except Exception:
+        return None
 
-def run_indexing(repo_url: str, commit_limit: int, token: str = None) -> bool:
-    if os.path.exists(TEMP_REPO_PATH):
-        shutil.rmtree(TEMP_REPO_PATH, ignore_errors=True)
+    return state.get("head")
 
-    status_text = st.empty()
-    progress_bar = st.progress(0)
 
-    if not _validate_repo(repo_url, token, status_text):
+def _update_mirror(repo_url: str, commit_limit: int, token: str, on_status, branch: str = None) -> str | None:
+    try:
+        if commit_limit == 0:
+            on_status(
+                "info",
+                f"⏳ Fetching full history of {repo_url}... the first run may take a while."
+            )
+        else:
+            on_status(
+                "info",
+                f"⏳ Fetching {repo_url} (last {commit_limit} commits)..."
+            )
+        return ensure_mirror(repo_url, token, depth=commit_limit or None, branch=branch)
+
+    except Exception as e:
+        on_status("error", f"❌ Failed to fetch: {e}")
+        return None
+
+
+def run_indexing(
+    repo_url: str,
+    commit_limit: int,
+    token: str = None,
+    incremental: bool = False,
+    branch: str = None,
+    hunks: bool = HUNK_INDEX,
+    on_status=None,
+    on_progress=None,
+) -> bool:
+    """
+    Fetch, mine and index one repository branch; returns False if the
+    repository can't be reached. Progress is reported through callbacks:
+    `on_status(level, message)` with level "info", "success" or "error"
+    (printed if not given) and `on_progress(fraction)`. An exception raised
+    by either aborts the run, and an aborted full rebuild is dropped rather
+    than left half-indexed.
+    """
+    on_status = on_status or print_status
+    on_progress = on_progress or (lambda fraction: None)
+
+    if not _validate_repo(repo_url, token, on_status):
         return False
 
-    if not _clone_repo(repo_url, commit_limit, token, status_text):
+    # Other jobs finishing meanwhile must not evict the mirror this one mines
+    with lease_mirror(mirror_path(repo_url)):
+        return _fetch_and_index(repo_url, commit_limit, token, incremental, branch, hunks, on_status, on_progress)
+
+
+def _fetch_and_index(repo_url, commit_limit, token, incremental, branch, hunks, on_status, on_progress) -> bool:
+    # Mining runs directly against a cached bare mirror, refreshed by fetch
+    repo_path = _update_mirror(repo_url, commit_limit, token, on_status, branch=branch)
+    if repo_path is None:
         return False
 
-    status_text.info("⛏️ Mining & indexing commits...")
+    repo = git.Repo(repo_path)
+    head = repo.commit(branch or "HEAD").hexsha
 
-    total = _index_commits(
-        commit_limit,
-        status_text,
-        progress_bar,
-    )
+    name = collection_name(repo_url, branch)
+    since = _incremental_base(name, commit_limit, hunks) if incremental else None
 
-    progress_bar.empty()
-    status_text.success(f"✅ Ready! Indexed {total} commits.")
+    if since == head:
+        _touch(name)
+        on_progress(1.0)
+        on_status("success", "✅ Already up to date — no new commits.")
+        return True
+
+    if since:
+        try:
+            if not repo.is_ancestor(since, head):
+                since = None
+        except git.exc.GitCommandError:
+            since = None
+        # History was rewritten (or the old HEAD is gone): start over
+
+    on_status("info", "⛏️ Mining & indexing commits...")
 
-    return True
\ No newline at end of file
+    with _state_lock:
+        _indexing.add(name)
+    try:
+        total, added_bytes, stats = _index_commits(
+            name,
+            repo_path,
+            commit_limit,
+            on_status,
+            on_progress,
+            branch=branch,
+            since=since,
+            hunks=hunks,
+        )
+    except BaseException:
+        # A partial rebuild must not pass for an index of the old HEAD;
+        # a partial incremental run is simply redone next time (every side
+        # index tolerates rewriting the same commits; see facts.load_facts)
+        if since is None:
+            _forget(name)
+        raise
+    finally:
+        with _state_lock:
+            _indexing.discard(name)
+
+    with _state_locked():
+        state = _load_index_state()
+        previous = state.get(name, {}) if since else {}
+        state[name] = {
+            "repo_url": normalize_repo_url(repo_url),
+            "branch": branch,
+            "head": head,
+            "commit_limit": commit_limit,
+            "hunks": hunks,
+            "commits": previous.get("commits", 0) + total,
+            "bytes": previous.get("bytes", 0) + added_bytes,
+            "indexed_at": int(time.time()),
+            "last_used": time.time(),
+        }
+        _save_index_state(state)
+
+    evicted = _evict_collections(keep=name)
+    if evicted:
+        logger.info("🧹 Evicted %d least recently used repositories: %s", len(evicted), ", ".join(evicted))
+
+    on_progress(1.0)
+    if since:
+        on_status("success", f"✅ Ready! Indexed {total} new commits. ({format_stats(stats)})")
+    else:
+        on_status("success", f"✅ Ready! Indexed {total} commits. ({format_stats(stats)})")
+
+    return True
@@ -0,0 +1,250 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from indexer import HUNK_INDEX, collection_name, run_indexing
+from utils import JOBS_PATH, normalize_repo_url
+
+# Repositories indexed at the same time; further jobs wait in the queue
+JOB_WORKERS = 2
+# Finished jobs whose progress files are kept on disk
+JOB_HISTORY = 50
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+# Owner tokens of the managers in this process that may still finish jobs
+_owners = set()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class _Reporter:
+    """
+    run_indexing's progress callbacks for one job: updates go to the job
+    record, and once the job is cancelled the next one raises JobCancelled
+    to stop the run.
+    """
+
+    def __init__(self, manager: "JobManager", job_id: str):
+        self._manager = manager
+        self._job_id = job_id
+
+    def _update(self, **fields) -> None:
+        if self._manager._cancel_requested(self._job_id):
+            raise JobCancelled()
+        self._manager._update(self._job_id, **fields)
+
+    def status(self, level: str, message: str) -> None:
+        self._update(message=message, level=level)
+
+    def progress(self, fraction: float) -> None:
+        self._update(progress=float(fraction))
+
+
+class JobManager:
+    """
+    Runs indexing jobs on a local worker pool, off the UI thread.
+
+    Each job has an id and a progress record (state, last message,
+    progress fraction, owning pid and manager) persisted as JSON under `directory`, so
+    it survives page reruns. A request for a repository branch that already
+    has a queued or running job returns that job instead of starting another.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, directory: str = JOBS_PATH, runner=run_indexing):
+        self.directory = directory
+        self._runner = runner
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="index-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._futures = {}
+        self._cancelled = set()
+        self._owner = uuid.uuid4().hex
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+        _owners.add(self._owner)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _save(self, job: dict) -> None:
+        tmp_path = self._path(job["id"]) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(job, f, indent=2)
+        os.replace(tmp_path, self._path(job["id"]))
+
+    def _owner_gone(self, job: dict) -> bool:
+        # Another manager in this process (after st.cache_resource is
+        # cleared) or another live process (the CLI beside the app) may
+        # share the directory. Our pid with an unknown owner was recycled
+        # from a process that has exited
+        if job.get("owner") in _owners:
+            return False
+        pid = job.get("pid")
+        return pid is None or pid == os.getpid() or not _pid_alive(pid)
+
+    def _recover(self) -> None:
+        # Jobs left queued or running by a process that has exited will never finish
+        for job in self.history():
+            if job["state"] in ACTIVE_STATES and self._owner_gone(job):
+                job.update(state=FAILED, message="Interrupted by a restart.", level="error", finished=time.time())
+                self._save(job)
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            self._save(job)
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        return job_id in self._cancelled
+
+    def submit(
+        self,
+        repo_url: str,
+        commit_limit: int,
+        token: str = None,
+        incremental: bool = False,
+        branch: str = None,
+        hunks: bool = HUNK_INDEX,
+    ) -> str:
+        """Queue an indexing run and return its job id (an existing one for the same repository branch)."""
+        name = collection_name(repo_url, branch)
+
+        with self._lock:
+            for job in self._jobs.values():
+                if job["collection"] == name and job["state"] in ACTIVE_STATES:
+                    return job["id"]
+
+            job_id = uuid.uuid4().hex[:12]
+            # The token is only handed to the worker, never written to disk
+            job = {
+                "id": job_id,
+                "collection": name,
+                "repo_url": normalize_repo_url(repo_url),
+                "branch": branch,
+                "pid": os.getpid(),
+                "owner": self._owner,
+                "state": QUEUED,
+                "message": "⏳ Waiting for a free indexing worker...",
+                "level": "info",
+                "progress": 0.0,
+                "created": time.time(),
+                "started": None,
+                "finished": None,
+            }
+            self._jobs[job_id] = job
+            self._save(job)
+
+            self._futures[job_id] = self._pool.submit(
+                self._run, job_id, repo_url, commit_limit, token, incremental, branch, hunks,
+            )
+        return job_id
+
+    def _run(self, job_id, repo_url, commit_limit, token, incremental, branch, hunks) -> None:
+        if self._cancel_requested(job_id):
+            # Cancelled just as a worker picked it up
+            self._update(job_id, state=CANCELLED, message="🛑 Cancelled.", level="warning", finished=time.time())
+            return
+        self._update(job_id, state=RUNNING, started=time.time())
+
+        reporter = _Reporter(self, job_id)
+        try:
+            ok = self._runner(
+                repo_url,
+                commit_limit,
+                token=token,
+                incremental=incremental,
+                branch=branch,
+                hunks=hunks,
+                on_status=reporter.status,
+                on_progress=reporter.progress,
+            )
+            state = DONE if ok else FAILED
+            fields = {"progress": 1.0} if ok else {}
+        except JobCancelled:
+            state, fields = CANCELLED, {"message": "🛑 Cancelled.", "level": "warning"}
+        except Exception as e:
+            state, fields = FAILED, {"message": f"❌ Indexing failed: {e}", "level": "error"}
+
+        self._update(job_id, state=state, finished=time.time(), **fields)
+        self._prune()
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Stop a job: a queued one never starts, a running one stops at its
+        next progress update. Returns False if it had already finished.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] not in ACTIVE_STATES:
+                return False
+            self._cancelled.add(job_id)
+            future = self._futures.get(job_id)
+
+        if future is not None and future.cancel():
+            self._update(job_id, state=CANCELLED, message="🛑 Cancelled.", level="warning", finished=time.time())
+        return True
+
+    def get(self, job_id: str) -> dict | None:
+        """Progress record of a job, from memory or, for older jobs, from disk."""
+        with self._lock:
+            if job_id in self._jobs:
+                return dict(self._jobs[job_id])
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def history(self) -> list[dict]:
+        """All job records on disk, newest first."""
+        jobs = []
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".json"):
+                job = self.get(filename[:-len(".json")])
+                if job is not None:
+                    jobs.append(job)
+        return sorted(jobs, key=lambda job: job["created"], reverse=True)
+
+    def active(self) -> list[dict]:
+        with self._lock:
+            return [dict(job) for job in self._jobs.values() if job["state"] in ACTIVE_STATES]
+
+    def _prune(self) -> None:
+        finished = [job for job in self.history() if job["state"] not in ACTIVE_STATES]
+        for job in finished[JOB_HISTORY:]:
+            try:
+                os.remove(self._path(job["id"]))
+            except OSError:
+                pass
+            with self._lock:
+                self._jobs.pop(job["id"], None)
+                self._futures.pop(job["id"], None)
+                self._cancelled.discard(job["id"])
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+        with self._lock:
+            queued = [job_id for job_id, job in self._jobs.items() if job["state"] == QUEUED]
+        for job_id in queued:
+            self._update(job_id, state=CANCELLED, message="🛑 Cancelled.", level="warning", finished=time.time())
+        if wait:
+            # Nothing of ours is left running, so a later manager may recover the rest
+            _owners.discard(self._owner)
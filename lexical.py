@@ -0,0 +1,173 @@
+import math
+import re
+import sqlite3
+from collections import Counter
+
+# BM25 term-frequency saturation and length normalisation
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Reciprocal rank fusion damping constant (Cormack et al. use 60)
+RRF_K = 60
+
+# Ticket IDs (PROJ-123), identifiers (MAX_RETRIES, camelCase), numbers
+_TOKEN_RE = re.compile(r"[A-Za-z][A-Za-z0-9]*-\d+|[A-Za-z_][A-Za-z0-9_]*|\d+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_SHA_RE = re.compile(r"\b[0-9a-f]{7,40}\b")
+# `code`, file names, snake_case, camelCase, ticket IDs, sha prefixes, numbers
+_IDENTIFIER_RE = re.compile(
+    r"`[^`]+`|\b[\w-]+\.[A-Za-z]{1,5}\b|\b\w+_\w+\b|\b[a-z]+[A-Z]\w*\b"
+    r"|\b[A-Z][A-Z0-9]+-\d+\b|\b[0-9a-f]{7,40}\b|\b\d+\b"
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lower-cased lexical tokens. Compound identifiers are kept whole and
+    also split into their parts, so `MAX_RETRIES` matches both the exact
+    identifier and a query for "retries".
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer(text):
+        token = match.group()
+        tokens.append(token.lower())
+
+        if "-" in token:
+            continue
+        parts = [p for chunk in token.split("_") for p in _CAMEL_RE.findall(chunk)]
+        if len(parts) > 1:
+            tokens.extend(p.lower() for p in parts)
+
+    return tokens
+
+
+def identifiers(text: str) -> list[str]:
+    """
+    The exact names a question is about (`MAX_RETRIES`, a sha prefix, a
+    file), lower-cased and sorted. Two questions differing only in these
+    are about different things, however similar they read.
+    """
+    return sorted({match.group().strip("`").lower() for match in _IDENTIFIER_RE.finditer(text)})
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = RRF_K) -> list[str]:
+    """Merge ranked id lists; ids ranked well in several lists rise to the top."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over commit documents, stored in SQLite next to
+    the repository's ChromaDB collection.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS docs (
+                sha TEXT PRIMARY KEY,
+                length INTEGER NOT NULL,
+                author TEXT,
+                timestamp INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                sha TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, sha)
+            ) WITHOUT ROWID;
+            """
+        )
+
+    def add(self, commits: list[dict]) -> None:
+        """Index (or re-index) commit dicts as produced by miner."""
+        with self._conn:
+            for commit in commits:
+                terms = Counter(tokenize(commit["content"]))
+                self._conn.execute("DELETE FROM postings WHERE sha = ?", (commit["hash"],))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO docs (sha, length, author, timestamp) VALUES (?, ?, ?, ?)",
+                    (commit["hash"], sum(terms.values()), commit["author"], int(commit["timestamp"])),
+                )
+                self._conn.executemany(
+                    "INSERT INTO postings (term, sha, tf) VALUES (?, ?, ?)",
+                    [(term, commit["hash"], tf) for term, tf in terms.items()],
+                )
+
+    def _filters(self, author: str = None, start_ts: int = None, end_ts: int = None) -> tuple[str, list]:
+        clauses, params = [], []
+        if author:
+            clauses.append("d.author = ?")
+            params.append(author)
+        if start_ts is not None:
+            clauses.append("d.timestamp >= ?")
+            params.append(start_ts)
+        if end_ts is not None:
+            clauses.append("d.timestamp <= ?")
+            params.append(end_ts)
+        return "".join(f" AND {c}" for c in clauses), params
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        author: str = None,
+        start_ts: int = None,
+        end_ts: int = None,
+    ) -> list[str]:
+        """
+        Top-`k` commit shas for `query` by BM25, honouring the same author
+        and timestamp filters as the vector search. Commit sha prefixes in
+        the query are resolved directly and ranked first.
+        """
+        where, params = self._filters(author, start_ts, end_ts)
+
+        exact = []
+        for prefix in _SHA_RE.findall(query.lower()):
+            rows = self._conn.execute(
+                f"SELECT d.sha FROM docs d WHERE d.sha LIKE ?{where} LIMIT ?",
+                [prefix + "%", *params, k],
+            ).fetchall()
+            exact.extend(sha for (sha,) in rows if sha not in exact)
+
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return exact[:k]
+
+        n_docs, avg_len = self._conn.execute("SELECT COUNT(*), AVG(length) FROM docs").fetchone()
+        if not n_docs:
+            return exact[:k]
+
+        placeholders = ",".join("?" * len(terms))
+        df = dict(self._conn.execute(
+            f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term",
+            terms,
+        ).fetchall())
+        idf = {
+            term: math.log((n_docs - count + 0.5) / (count + 0.5) + 1.0)
+            for term, count in df.items()
+        }
+
+        scores = {}
+        rows = self._conn.execute(
+            f"SELECT p.term, p.sha, p.tf, d.length FROM postings p JOIN docs d ON d.sha = p.sha "
+            f"WHERE p.term IN ({placeholders}){where}",
+            [*terms, *params],
+        )
+        for term, sha, tf, length in rows:
+            norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_len)
+            scores[sha] = scores.get(sha, 0.0) + idf[term] * tf * (BM25_K1 + 1) / norm
+
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        return (exact + [sha for sha in ranked if sha not in exact])[:k]
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,192 @@
+import os
+import re
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from openai import APIConnectionError, APIStatusError, OpenAI, Timeout
+
+# OpenAI-compatible endpoint and chat model (Groq). The LLM_BASE_URL and
+# LLM_MODEL environment variables override them, e.g. for a local server;
+# they are read per call, so a .env loaded after import still applies.
+LLM_BASE_URL = "https://api.groq.com/openai/v1"
+LLM_MODEL = "llama-3.3-70b-versatile"
+# Seconds allowed to connect, and for a whole request (or between streamed chunks)
+LLM_CONNECT_TIMEOUT = 5.0
+LLM_TIMEOUT = 60.0
+# Retries after the first attempt on 429, 5xx and connection errors
+LLM_MAX_RETRIES = 3
+# Exponential backoff (with jitter) when the server gives no retry hint
+LLM_BACKOFF_BASE = 0.5
+# Longest single wait between attempts, whatever the server asks for
+LLM_BACKOFF_MAX = 20.0
+# Latency samples kept per call label
+METRICS_WINDOW = 500
+
+# When no Retry-After is sent, the reset time of whichever rate limit is
+# exhausted (remaining == 0); these are Go-style durations such as "2m59.5s"
+_RESET_HEADERS = {
+    "x-ratelimit-remaining-requests": "x-ratelimit-reset-requests",
+    "x-ratelimit-remaining-tokens": "x-ratelimit-reset-tokens",
+}
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_SCALE = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class CallMetrics:
+    """Thread-safe per-label latency samples, attempts and failures of LLM calls."""
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self.window = window
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def record(self, label: str, seconds: float, attempts: int, ok: bool = True) -> None:
+        with self._lock:
+            entry = self._calls.setdefault(label, {"latencies": [], "calls": 0, "retries": 0, "failures": 0})
+            entry["latencies"] = (entry["latencies"] + [seconds])[-self.window:]
+            entry["calls"] += 1
+            entry["retries"] += attempts - 1
+            entry["failures"] += 0 if ok else 1
+
+    def snapshot(self) -> dict:
+        """{label: {calls, retries, failures, p50, p95}} with latencies in seconds."""
+        with self._lock:
+            result = {}
+            for label, entry in self._calls.items():
+                latencies = sorted(entry["latencies"])
+                result[label] = {
+                    "calls": entry["calls"],
+                    "retries": entry["retries"],
+                    "failures": entry["failures"],
+                    "p50": latencies[len(latencies) // 2] if latencies else 0.0,
+                    "p95": latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+                }
+            return result
+
+    def summary(self) -> str:
+        return " · ".join(
+            f"{label} p50 {m['p50'] * 1000:.0f} ms ({m['calls']} calls, {m['retries']} retries)"
+            for label, m in self.snapshot().items()
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._calls.clear()
+
+
+metrics = CallMetrics()
+
+
+def base_url() -> str:
+    return os.getenv("LLM_BASE_URL") or LLM_BASE_URL
+
+
+def model() -> str:
+    return os.getenv("LLM_MODEL") or LLM_MODEL
+
+
+def get_client(api_key: str = None) -> OpenAI:
+    """
+    Shared client for the configured endpoint, so every call reuses the
+    same pool of keep-alive connections. The SDK's own retries are
+    disabled; chat() retries instead.
+    """
+    api_key = api_key or os.getenv("GROQ_API_KEY")
+    key = (base_url(), api_key)
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(
+                api_key=api_key,
+                base_url=key[0],
+                timeout=Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+                max_retries=0,
+            )
+            _clients[key] = client
+        return client
+
+
+def close_clients() -> None:
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def _parse_duration(value: str) -> float | None:
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_SCALE[unit] for amount, unit in parts)
+
+
+def _retry_after(headers) -> float | None:
+    # Seconds the server asks us to wait, if it says
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+
+    if headers.get("retry-after"):
+        value = headers["retry-after"]
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                pass
+
+    waits = [
+        _parse_duration(headers.get(reset, ""))
+        for remaining, reset in _RESET_HEADERS.items()
+        if headers.get(remaining) == "0"
+    ]
+    waits = [wait for wait in waits if wait is not None]
+    return max(waits) if waits else None
+
+
+def retry_delay(attempt: int, headers=None) -> float:
+    """Seconds to wait before retry `attempt` (0-based): the server's hint, else backoff."""
+    hinted = _retry_after(headers) if headers is not None else None
+    if hinted is not None:
+        return min(max(hinted, 0.0), LLM_BACKOFF_MAX)
+    return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, APIConnectionError)
+
+
+def chat(messages: list, label: str = "chat", api_key: str = None, **kwargs):
+    """
+    chat.completions.create() on the shared client with model(), retried
+    on 429/5xx and connection errors. Latency (until the response, or for
+    streams the response headers) is recorded in `metrics` under `label`.
+    A stream that breaks after it started is not retried.
+    """
+    client = get_client(api_key)
+    start = time.perf_counter()
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            response = client.chat.completions.create(model=model(), messages=messages, **kwargs)
+        except Exception as e:
+            if not _retryable(e) or attempt == LLM_MAX_RETRIES:
+                metrics.record(label, time.perf_counter() - start, attempt + 1, ok=False)
+                raise
+            response_headers = e.response.headers if isinstance(e, APIStatusError) else None
+            time.sleep(retry_delay(attempt, response_headers))
+            continue
+
+        metrics.record(label, time.perf_counter() - start, attempt + 1)
+        return response
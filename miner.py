@@ -1,9 +1,48 @@
+import ast
+import multiprocessing
+import re
 import git
+import subprocess
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import os
 
 IGNORE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.svg', '.mp4', '.zip', '.tar', '.gz', '.lock', '.json'}
 IGNORE_DIRS = {'dist', 'build', 'node_modules', '__pycache__', '.idea', '.vscode'}
+# Pathspec equivalent of should_ignore, handed to git so ignored files are
+# never diffed — in a partial (blobless) clone their blobs are never fetched
+IGNORE_PATHSPECS = (
+    ["."]
+    + [f":(exclude,glob)**/*{ext}" for ext in sorted(IGNORE_EXTENSIONS)]
+    + [f":(exclude,glob)**/{d}/**" for d in sorted(IGNORE_DIRS)]
+)
+# Bump whenever the layout of a commit's `content` document changes, so
+# embeddings cached for the old layout are no longer reused
+DOC_FORMAT_VERSION = 1
+# Max characters of hunks kept per file before the rest are truncated
+HUNK_CHAR_BUDGET = 1200
+# Commits handed to each worker process at a time in parallel mode
+SHARD_SIZE = 64
+
+# `git log` record markers for the streaming backend: each commit header
+# starts with RS and ends with GS; fields are separated by US.
+LOG_FORMAT = "%x1e%H%x1f%P%x1f%an%x1f%ct%x1f%B%x1d"
+_RECORD_START = "\x1e"
+_HEADER_END = "\x1d"
+_FIELD_SEP = "\x1f"
+# Diff placeholders shared by both backends
+_FIRST_COMMIT = "(First commit — no parent diffs)"
+_SHALLOW_BOUNDARY = "(Diff unavailable: boundary of shallow clone)"
+# Start of a hunk header ("@@ -12,7 +12,8 @@"), wherever it appears in a chunked diff
+_HUNK_HEADER = re.compile(r"(?=@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@)")
+# Per-file header lines that precede the patch body in `git log -p`
+_DIFF_HEADER_PREFIXES = (
+    "old mode", "new mode", "deleted file mode", "new file mode",
+    "similarity index", "dissimilarity index", "rename from", "rename to",
+    "copy from", "copy to", "index ", "--- ", "+++ ",
+)
 
 
 def should_ignore(file_path: str) -> bool:
@@ -16,90 +55,462 @@ def should_ignore(file_path: str) -> bool:
     return False
 
 
-def load_git_history(repo_path: str, branch: str = "main", limit=None):
+def _chunk_hunks(patch_text: str) -> str:
     """
-    Generator that yields one commit dict at a time.
-    Diffs are chunked by hunk (@@) rather than hard-truncated,
-    giving the LLM cleaner, more meaningful context.
+    Keep whole hunks (@@) up to HUNK_CHAR_BUDGET instead of hard char truncation.
     """
-    if not os.path.exists(repo_path):
-        raise ValueError(f"Path not found: {repo_path}")
-
-    try:
-        repo = git.Repo(repo_path)
-    except git.exc.InvalidGitRepositoryError:
-        raise ValueError(f"Not a valid git repo: {repo_path}")
+    hunks = patch_text.split('\n@@')
+    meaningful_hunks = []
+    total_len = 0
 
-    print(f"⛏️  Mining repository: {repo_path}...")
+    for i, hunk in enumerate(hunks):
+        hunk_text = hunk if i == 0 else '@@' + hunk
+        if total_len + len(hunk_text) > HUNK_CHAR_BUDGET:
+            meaningful_hunks.append("...(remaining hunks truncated)")
+            break
+        meaningful_hunks.append(hunk_text)
+        total_len += len(hunk_text)
 
-    # Fall back to master if main doesn't exist
-    try:
-        target_branch = repo.head.reference.name
-    except TypeError:
-        target_branch = None
+    return ''.join(meaningful_hunks)
 
-    commits = repo.iter_commits(target_branch, max_count=limit) if target_branch else repo.iter_commits(max_count=limit)
 
-    for commit in commits:
-        message = commit.message.strip()
-        author = commit.author.name
-        date = datetime.fromtimestamp(commit.committed_date).strftime('%Y-%m-%d %H:%M:%S')
-        timestamp = int(commit.committed_date)
-        diff_summary = ""
+def _count_changes(patch_text: str) -> tuple[int, int]:
+    """Lines added and removed in a patch body (everything from the first @@)."""
+    added = removed = 0
+    start = patch_text.find("@@")
+    if start < 0:
+        return added, removed
 
-        if commit.parents:
-            try:
-                parent = commit.parents[0]
-                diffs = parent.diff(commit, create_patch=True)
+    for line in patch_text[start:].splitlines():
+        if line.startswith("+"):
+            added += 1
+        elif line.startswith("-"):
+            removed += 1
+    return added, removed
 
-                for diff in diffs:
-                    try:
-                        file_path = diff.b_path if diff.b_path else diff.a_path
-                        if should_ignore(file_path):
-                            continue
 
-                        patch_text = diff.diff.decode('utf-8', errors='replace')
+def _summarize_diff(commit) -> tuple[str, list[dict]]:
+    """
+    Build the hunk-chunked diff text for a commit against its first parent,
+    plus per-file line counts ({"path", "added", "removed"}) of the full patch.
+    """
+    if not commit.parents:
+        return _FIRST_COMMIT, []
 
-                        # Chunk by hunk (@@) instead of hard char truncation
-                        hunks = patch_text.split('\n@@')
-                        meaningful_hunks = []
-                        total_len = 0
+    diff_summary = ""
+    files = []
 
-                        for i, hunk in enumerate(hunks):
-                            hunk_text = hunk if i == 0 else '@@' + hunk
-                            if total_len + len(hunk_text) > 1200:
-                                meaningful_hunks.append("...(remaining hunks truncated)")
-                                break
-                            meaningful_hunks.append(hunk_text)
-                            total_len += len(hunk_text)
+    try:
+        parent = commit.parents[0]
+        diffs = parent.diff(commit, paths=IGNORE_PATHSPECS, create_patch=True)
 
-                        diff_summary += f"\nFile: {file_path}\n{''.join(meaningful_hunks)}\n"
+        for diff in diffs:
+            try:
+                file_path = diff.b_path if diff.b_path else diff.a_path
+                if should_ignore(file_path):
+                    continue
 
-                    except Exception:
-                        continue
+                patch_text = diff.diff.decode('utf-8', errors='replace')
+                diff_summary += f"\nFile: {file_path}\n{_chunk_hunks(patch_text)}\n"
+                added, removed = _count_changes(patch_text)
+                files.append({"path": file_path, "added": added, "removed": removed})
 
-            except git.exc.GitCommandError:
-                diff_summary = "(Diff unavailable: boundary of shallow clone)"
             except Exception:
-                diff_summary = "(Diff failed to load)"
-        else:
-            diff_summary = "(First commit — no parent diffs)"
+                continue
+
+    except git.exc.GitCommandError:
+        diff_summary = _SHALLOW_BOUNDARY
+        files = []
+    except Exception:
+        diff_summary = "(Diff failed to load)"
+        files = []
+
+    return diff_summary, files
 
-        full_content = f"""Commit: {commit.hexsha}
+
+def _doc_header(sha: str, author: str, date: str, message: str) -> str:
+    return f"""Commit: {sha}
 Author: {author}
 Date: {date}
 Message: {message}
 
 --- CODE CHANGES ---
-{diff_summary}
 """
 
-        yield {
-            "hash": commit.hexsha,
-            "author": author,
-            "date": date,
-            "timestamp": timestamp,
-            "message": message,
-            "diff": diff_summary,
-            "content": full_content,
-        }
\ No newline at end of file
+
+def _build_commit(sha: str, author: str, timestamp: int, message: str, diff_summary: str, files: list[dict]) -> dict:
+    date = datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+    full_content = f"{_doc_header(sha, author, date, message)}{diff_summary}\n"
+
+    return {
+        "hash": sha,
+        "author": author,
+        "date": date,
+        "timestamp": timestamp,
+        "message": message,
+        "diff": diff_summary,
+        "files": files,
+        "content": full_content,
+    }
+
+
+def iter_hunks(diff_summary: str) -> list[tuple[str, str]]:
+    """(path, hunk) pairs of a commit's chunked diff text, in document order."""
+    pieces = []
+    for block in diff_summary.split("\nFile: ")[1:]:
+        path, _, patch = block.partition("\n")
+        # _chunk_hunks joins hunks without a separator, so split on the headers
+        for hunk in _HUNK_HEADER.split(patch):
+            text = hunk.strip("\n")
+            if text.strip():
+                pieces.append((path, text))
+    return pieces
+
+
+def hunk_documents(commit: dict) -> list[dict]:
+    """
+    One document per (file, hunk) of a mined commit, for the optional
+    hunk-level index. Each carries the commit header, so it reads (and
+    embeds) like a single-hunk commit.
+    """
+    header = _doc_header(commit["hash"], commit["author"], commit["date"], commit["message"])
+    documents = []
+
+    for i, (path, hunk) in enumerate(iter_hunks(commit["diff"])):
+        hunk = hunk.replace("...(remaining hunks truncated)", "").rstrip()
+        if not hunk:
+            continue
+        documents.append({
+            "id": f"{commit['hash']}:{i}",
+            "commit": commit["hash"],
+            "path": path,
+            "content": f"{header}File: {path}\n{hunk}\n",
+        })
+
+    return documents
+
+
+def _commit_to_dict(commit) -> dict:
+    return _build_commit(
+        commit.hexsha,
+        commit.author.name,
+        int(commit.committed_date),
+        commit.message.strip(),
+        *_summarize_diff(commit),
+    )
+
+
+def _mine_shard(repo_path: str, shas: list[str]) -> list[dict]:
+    """Worker entry point: mine one contiguous shard of commits in a child process."""
+    repo = git.Repo(repo_path)
+    return [_commit_to_dict(repo.commit(sha)) for sha in shas]
+
+
+def _mine_parallel(repo_path: str, shas: list[str], workers: int):
+    """
+    Shard `shas` across a process pool and yield commit dicts in the original order.
+    At most `workers * 2` shards are in flight, so memory stays bounded.
+    """
+    shards = [shas[i:i + SHARD_SIZE] for i in range(0, len(shas), SHARD_SIZE)]
+
+    # Spawned, not forked: mining runs on a pipeline thread, and forking a
+    # multi-threaded process (Streamlit, the job pool) can deadlock the child
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    pending = deque()
+    next_shard = 0
+
+    try:
+        while next_shard < len(shards) or pending:
+            while next_shard < len(shards) and len(pending) < workers * 2:
+                pending.append(pool.submit(_mine_shard, repo_path, shards[next_shard]))
+                next_shard += 1
+
+            yield from pending.popleft().result()
+    finally:
+        # Also runs if the consumer stops early — drop shards nobody will read
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _unquote_path(path: str) -> str:
+    path = path.rstrip('\t')
+    if path.startswith('"') and path.endswith('"'):
+        try:
+            return ast.literal_eval(path)
+        except (ValueError, SyntaxError):
+            return path[1:-1]
+    return path
+
+
+class _FileDiff:
+    """
+    One file's section of a `git log -p` stream.
+    Applies the same hunk budget as _chunk_hunks, but line by line, so a
+    huge patch never has to be held in memory.
+    """
+
+    def __init__(self, git_line: str):
+        # Fallback paths for sections without ---/+++ lines (binary, mode-only)
+        a_part, sep, b_part = git_line[len("diff --git "):].partition(" b/")
+        self.a_path = a_part[2:] if a_part.startswith("a/") else None
+        self.b_path = b_part if sep else None
+        self.in_body = False
+        self.in_hunks = False
+        self.added = 0
+        self.removed = 0
+        self.ignored = False
+        self.kept = []
+        self.total_len = 0
+        self.hunk = []
+        self.hunk_len = 0
+        self.overflow = False
+        self.truncated = False
+
+    @property
+    def path(self) -> str:
+        return self.b_path or self.a_path
+
+    def add_header(self, line: str) -> None:
+        if line.startswith("--- "):
+            self.a_path = None if line[4:].startswith("/dev/null") else _unquote_path(line[4:])[2:]
+        elif line.startswith("+++ "):
+            self.b_path = None if line[4:].startswith("/dev/null") else _unquote_path(line[4:])[2:]
+        elif line.startswith("rename from "):
+            self.a_path = _unquote_path(line[len("rename from "):])
+        elif line.startswith("rename to "):
+            self.b_path = _unquote_path(line[len("rename to "):])
+
+    def add_body(self, line: str) -> None:
+        if not self.in_body:
+            self.in_body = True
+            self.ignored = should_ignore(self.path)
+        elif line.startswith("@@") and not self.ignored and not self.truncated:
+            self._close_hunk(last=False)
+
+        # Line counts cover the whole patch, not just the kept hunks
+        if line.startswith("@@"):
+            self.in_hunks = True
+        elif self.in_hunks and line.startswith("+"):
+            self.added += 1
+        elif self.in_hunks and line.startswith("-"):
+            self.removed += 1
+
+        if self.ignored or self.truncated or self.overflow:
+            return
+
+        self.hunk_len += len(line) + (1 if self.hunk else 0)
+        self.hunk.append(line)
+        if self.total_len + self.hunk_len > HUNK_CHAR_BUDGET:
+            # Rejected whole once it closes; stop buffering it now
+            self.overflow = True
+            self.hunk = []
+
+    def _close_hunk(self, last: bool) -> None:
+        hunk_len = self.hunk_len + (1 if last else 0)
+
+        if self.overflow or self.total_len + hunk_len > HUNK_CHAR_BUDGET:
+            self.kept.append("...(remaining hunks truncated)")
+            self.truncated = True
+        else:
+            self.kept.append('\n'.join(self.hunk) + ('\n' if last else ''))
+            self.total_len += hunk_len
+
+        self.hunk = []
+        self.hunk_len = 0
+        self.overflow = False
+
+    def summary(self) -> str:
+        """Return this file's `File:` block, or "" if it should be ignored."""
+        if should_ignore(self.path):
+            return ""
+        if self.in_body and not self.truncated:
+            self._close_hunk(last=True)
+        return f"\nFile: {self.path}\n{''.join(self.kept)}\n"
+
+    def facts(self) -> dict | None:
+        """This file's line counts, or None if it should be ignored."""
+        if should_ignore(self.path):
+            return None
+        return {"path": self.path, "added": self.added, "removed": self.removed}
+
+
+def _parse_git_log(lines, shallow: frozenset = frozenset()):
+    """
+    Incrementally parse `git log -p --format=LOG_FORMAT` output lines into
+    commit dicts. Only the commit currently being read is held in memory.
+    `shallow` holds the boundary commits of a shallow clone: git log shows
+    them without parents, but they are not the repository's first commit.
+    """
+    header = None
+    commit = None
+    diff_summary = ""
+    files = []
+    current_file = None
+
+    def close_file():
+        nonlocal diff_summary
+        diff_summary += current_file.summary()
+        facts = current_file.facts()
+        if facts:
+            files.append(facts)
+
+    def finish():
+        if current_file is not None:
+            close_file()
+        if not commit["parents"]:
+            return _build_commit(
+                commit["sha"], commit["author"], commit["timestamp"], commit["message"],
+                _SHALLOW_BOUNDARY if commit["sha"] in shallow else _FIRST_COMMIT, [],
+            )
+        return _build_commit(commit["sha"], commit["author"], commit["timestamp"], commit["message"], diff_summary, files)
+
+    for line in lines:
+        if line.startswith(_RECORD_START):
+            if commit is not None:
+                yield finish()
+            header = [line[1:]]
+            commit = None
+            diff_summary = ""
+            files = []
+            current_file = None
+
+        elif header is not None:
+            header.append(line)
+
+        elif commit is None:
+            continue
+
+        elif line.startswith("diff --git "):
+            if current_file is not None:
+                close_file()
+            current_file = None if not commit["parents"] else _FileDiff(line)
+
+        elif current_file is not None:
+            if not current_file.in_body and line.startswith(_DIFF_HEADER_PREFIXES):
+                current_file.add_header(line)
+            else:
+                current_file.add_body(line)
+
+        if header is not None and _HEADER_END in header[-1]:
+            text = '\n'.join(header)
+            sha, parents, author, committed, message = text[:text.index(_HEADER_END)].split(_FIELD_SEP, 4)
+            commit = {
+                "sha": sha,
+                "parents": parents.split(),
+                "author": author,
+                "timestamp": int(committed),
+                "message": message.strip(),
+            }
+            header = None
+
+    if commit is not None:
+        yield finish()
+
+
+def _shallow_commits(repo_path: str) -> frozenset:
+    """Boundary commits of a shallow clone (empty for a complete one)."""
+    path = subprocess.run(
+        ["git", "rev-parse", "--git-path", "shallow"],
+        cwd=repo_path, capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    try:
+        with open(os.path.join(repo_path, path)) as f:
+            return frozenset(f.read().split())
+    except OSError:
+        return frozenset()
+
+
+def _stream_git_log(repo_path: str, rev: str, limit=None):
+    """
+    Run a single `git log -p` process and parse its stdout as it arrives.
+    Merge commits are diffed against their first parent, matching the
+    GitPython backend. Ignored paths are excluded by pathspec; with
+    --full-history --sparse that only trims diffs, never the commit list.
+    """
+    cmd = [
+        "git", "-c", "core.quotePath=false", "log", "-p", "-M",
+        "--no-color", "--no-ext-diff", "--diff-merges=first-parent",
+        "--full-history", "--sparse", f"--format={LOG_FORMAT}",
+    ]
+    if limit:
+        cmd.append(f"--max-count={limit}")
+    cmd += [rev, "--", *IGNORE_PATHSPECS]
+
+    with tempfile.TemporaryFile() as stderr:
+        proc = subprocess.Popen(cmd, cwd=repo_path, stdout=subprocess.PIPE, stderr=stderr)
+        finished = False
+
+        try:
+            lines = (
+                raw[:-1].decode('utf-8', errors='replace') if raw.endswith(b'\n') else raw.decode('utf-8', errors='replace')
+                for raw in proc.stdout
+            )
+            yield from _parse_git_log(lines, _shallow_commits(repo_path))
+            finished = True
+        finally:
+            proc.stdout.close()
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+
+        if finished and proc.returncode != 0:
+            stderr.seek(0)
+            raise git.exc.GitCommandError(cmd, proc.returncode, stderr.read())
+
+
+def load_git_history(
+    repo_path: str,
+    branch: str = None,
+    limit=None,
+    since: str = None,
+    workers: int = 1,
+    backend: str = "gitpython",
+):
+    """
+    Generator that yields one commit dict at a time.
+    Diffs are chunked by hunk (@@) rather than hard-truncated,
+    giving the LLM cleaner, more meaningful context.
+
+    `branch` selects the branch to walk; by default the repository's HEAD.
+    If `since` is a commit sha, only commits reachable from HEAD but not
+    from `since` are walked (i.e. `since..HEAD`) — used for incremental indexing.
+
+    With `workers > 1`, diff extraction is sharded across a spawned process pool;
+    commits are still yielded newest first, exactly as in the serial path.
+
+    `backend="log"` streams a single `git log -p` process instead of one
+    `git diff` per commit; it yields the same dicts and ignores `workers`.
+    """
+    if not os.path.exists(repo_path):
+        raise ValueError(f"Path not found: {repo_path}")
+
+    try:
+        repo = git.Repo(repo_path)
+    except git.exc.InvalidGitRepositoryError:
+        raise ValueError(f"Not a valid git repo: {repo_path}")
+
+    print(f"⛏️  Mining repository: {repo_path}...")
+
+    # Default to whatever HEAD points at (main, master, ...)
+    target_branch = branch
+    if not target_branch:
+        try:
+            target_branch = repo.head.reference.name
+        except TypeError:
+            target_branch = None
+
+    rev = target_branch or "HEAD"
+    if since:
+        rev = f"{since}..{rev}"
+
+    if backend == "log":
+        yield from _stream_git_log(repo_path, rev, limit)
+        return
+
+    if workers > 1:
+        shas = [commit.hexsha for commit in repo.iter_commits(rev, max_count=limit)]
+        yield from _mine_parallel(repo_path, shas, workers)
+        return
+
+    for commit in repo.iter_commits(rev, max_count=limit):
+        yield _commit_to_dict(commit)
@@ -0,0 +1,291 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+import subprocess
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+import git
+
+from miner import IGNORE_PATHSPECS
+from utils import MIRROR_PATH, inject_github_token, normalize_repo_url, remove_readonly, strip_credentials
+
+# Total bytes the bare-mirror cache may use before least recently used
+# mirrors are deleted
+MIRROR_DISK_QUOTA = 5 * 1024 ** 3
+# Per-mirror bookkeeping, stored inside the bare repository
+MIRROR_META_FILE = "archaeologist.json"
+# How new mirrors are cloned:
+# - "full": every blob of every revision
+# - "blobless": --filter=blob:none; the blobs a run will diff are prefetched
+#   in one batch (prefetch_blobs), anything else is fetched lazily
+# - "blob-limit": --filter=blob:limit=BLOB_SIZE_LIMIT, only large blobs deferred
+# Blobless saves little disk on source-code repositories, and without the
+# prefetch `git log -p` makes one lazy fetch per commit
+CLONE_STRATEGY = "blob-limit"
+BLOB_SIZE_LIMIT = "1m"
+
+# One lock per mirror so concurrent sessions don't fetch into it at once
+_locks = defaultdict(threading.Lock)
+_locks_guard = threading.Lock()
+# Indexing runs reading each mirror right now, which eviction must leave alone
+_leases = Counter()
+
+
+def _lock_for(path: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks[path]
+
+
+@contextmanager
+def lease_mirror(path: str):
+    """Keep the mirror at `path` from being evicted for the duration of the block."""
+    with _locks_guard:
+        _leases[path] += 1
+    try:
+        yield path
+    finally:
+        with _locks_guard:
+            _leases[path] -= 1
+            if not _leases[path]:
+                del _leases[path]
+
+
+def _leased(path: str) -> bool:
+    with _locks_guard:
+        return path in _leases
+
+
+def mirror_path(repo_url: str) -> str:
+    digest = hashlib.sha1(normalize_repo_url(repo_url).encode()).hexdigest()[:16]
+    return os.path.join(MIRROR_PATH, digest)
+
+
+def _read_meta(path: str) -> dict:
+    try:
+        with open(os.path.join(path, MIRROR_META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_meta(path: str, meta: dict) -> None:
+    with open(os.path.join(path, MIRROR_META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def _is_shallow(path: str) -> bool:
+    return os.path.exists(os.path.join(path, "shallow"))
+
+
+def _default_branch(auth_url: str) -> str | None:
+    # "ref: refs/heads/main\tHEAD" from the remote's symbolic HEAD
+    output = git.cmd.Git().ls_remote("--symref", auth_url, "HEAD")
+    for line in output.splitlines():
+        if line.startswith("ref: refs/heads/"):
+            return line.split()[1][len("refs/heads/"):]
+    return None
+
+
+def _blob_filter(strategy: str) -> str | None:
+    if strategy == "blobless":
+        return "blob:none"
+    if strategy == "blob-limit":
+        return f"blob:limit={BLOB_SIZE_LIMIT}"
+    return None
+
+
+def _fetch(repo: git.Repo, auth_url: str, branch: str | None, depth: int | None, blob_filter: str | None) -> None:
+    refspec = f"+refs/heads/{branch}:refs/heads/{branch}" if branch else "+refs/heads/*:refs/heads/*"
+    args = ["--prune", "--no-tags"]
+
+    if depth:
+        # Only a shallow mirror needs a depth; a full one already has it all
+        if _is_shallow(repo.git_dir) or not repo.heads:
+            args.append(f"--depth={depth}")
+    elif _is_shallow(repo.git_dir):
+        args.append("--unshallow")
+
+    if blob_filter:
+        # Partial clones must fetch through the promisor remote, which is
+        # also where git lazily fetches missing blobs from while mining
+        repo.git.fetch(*args, f"--filter={blob_filter}", "origin", refspec)
+    else:
+        # The URL is passed per fetch so a token is never written to the config
+        repo.git.fetch(*args, auth_url, refspec)
+
+
+def _create(path: str, repo_url: str, auth_url: str, blob_filter: str | None) -> git.Repo:
+    repo = git.Repo.init(path, bare=True)
+    with repo.config_writer() as config:
+        config.set_value('remote "origin"', "url", strip_credentials(repo_url))
+        if blob_filter:
+            config.set_value("core", "repositoryformatversion", 1)
+            config.set_value("extensions", "partialClone", "origin")
+            config.set_value('remote "origin"', "promisor", True)
+            config.set_value('remote "origin"', "partialclonefilter", blob_filter)
+
+    default = _default_branch(auth_url)
+    if default:
+        repo.git.symbolic_ref("HEAD", f"refs/heads/{default}")
+    return repo
+
+
+def ensure_mirror(
+    repo_url: str,
+    token: str = None,
+    depth: int = None,
+    branch: str = None,
+    strategy: str = None,
+) -> str:
+    """
+    Return the path of an up-to-date bare mirror of `repo_url`.
+
+    The first call creates the mirror; later calls only `git fetch` new
+    objects into it. `depth` keeps a mirror shallow (None/0 = full history,
+    unshallowing an existing shallow mirror). `strategy` (default
+    CLONE_STRATEGY) only applies when the mirror is created. The mirror
+    cache is kept under MIRROR_DISK_QUOTA by evicting least recently used
+    mirrors.
+    """
+    path = mirror_path(repo_url)
+    auth_url = inject_github_token(repo_url, token)
+    strategy = strategy or CLONE_STRATEGY
+    if token:
+        # Lazy blob fetches would need the token long after this call,
+        # so private repositories are always mirrored in full
+        strategy = "full"
+
+    with _lock_for(path):
+        try:
+            repo = git.Repo(path) if _read_meta(path) else None
+        except (git.exc.InvalidGitRepositoryError, git.exc.NoSuchPathError):
+            repo = None
+
+        try:
+            if repo is None:
+                shutil.rmtree(path, onerror=remove_readonly)
+                os.makedirs(path)
+                repo = _create(path, repo_url, auth_url, _blob_filter(strategy))
+            else:
+                strategy = _read_meta(path).get("strategy", "full")
+            _fetch(repo, auth_url, branch, depth, _blob_filter(strategy))
+
+        except git.exc.GitCommandError:
+            # A mirror that never completed its first fetch is useless
+            if not _read_meta(path):
+                shutil.rmtree(path, onerror=remove_readonly)
+            raise
+
+        meta = _read_meta(path)
+        meta.update({
+            "repo_url": normalize_repo_url(repo_url),
+            "private": bool(token) or meta.get("private", False),
+            "strategy": strategy,
+            "last_used": time.time(),
+        })
+        _write_meta(path, meta)
+
+    evict_mirrors(keep=path)
+    return path
+
+
+def prefetch_blobs(path: str, rev: str, limit: int = None) -> int:
+    """
+    Fetch, in one round-trip, every blob that mining `rev` (up to `limit`
+    commits) will diff in a blobless mirror. Otherwise git fetches them
+    lazily, a round-trip per commit. Ignored paths and root or
+    shallow-boundary commits, which are never diffed, are skipped.
+    Returns the number of blobs requested; 0 for other mirrors.
+    """
+    if _read_meta(path).get("strategy") != "blobless":
+        return 0
+
+    cmd = [
+        "git", "-c", "log.showRoot=false", "log", "--raw", "--no-abbrev", "--format=", "-M",
+        "--diff-merges=first-parent", "--full-history", "--sparse",
+    ]
+    if limit:
+        cmd.append(f"--max-count={limit}")
+    cmd += [rev, "--", *IGNORE_PATHSPECS]
+    output = subprocess.run(cmd, cwd=path, capture_output=True, text=True, check=True).stdout
+
+    # ":100644 100644 <old> <new> M\tpath"; the null id stands for an added or deleted side
+    blobs = {
+        oid
+        for line in output.splitlines() if line.startswith(":")
+        for oid in line.split("\t", 1)[0].split()[2:4]
+        if oid.strip("0")
+    }
+    if blobs:
+        # The same request git makes for a lazy fetch, batched; blobs
+        # already present are not sent again
+        with _lock_for(path):
+            subprocess.run(
+                [
+                    "git", "-c", "fetch.negotiationAlgorithm=noop", "fetch", "origin",
+                    "--no-tags", "--no-write-fetch-head", "--recurse-submodules=no",
+                    "--filter=blob:none", "--stdin",
+                ],
+                cwd=path, input="\n".join(sorted(blobs)) + "\n", capture_output=True, text=True, check=True,
+            )
+    return len(blobs)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _list_mirrors() -> list[str]:
+    if not os.path.isdir(MIRROR_PATH):
+        return []
+    return [
+        os.path.join(MIRROR_PATH, name)
+        for name in os.listdir(MIRROR_PATH)
+        if os.path.isdir(os.path.join(MIRROR_PATH, name))
+    ]
+
+
+def evict_mirrors(keep: str = None, quota: int = None) -> list[str]:
+    """
+    Delete least recently used mirrors until the cache fits the quota,
+    skipping `keep`, leased mirrors and any being fetched.
+    """
+    quota = MIRROR_DISK_QUOTA if quota is None else quota
+    mirrors = sorted(_list_mirrors(), key=lambda p: _read_meta(p).get("last_used", 0))
+    sizes = {path: _dir_size(path) for path in mirrors}
+    used = sum(sizes.values())
+    evicted = []
+
+    for path in mirrors:
+        if used <= quota:
+            break
+        lock = _lock_for(path)
+        # Never pull a mirror out from under a fetch or a run mining it
+        if path == keep or _leased(path) or not lock.acquire(blocking=False):
+            continue
+        try:
+            shutil.rmtree(path, onerror=remove_readonly)
+        finally:
+            lock.release()
+        used -= sizes[path]
+        evicted.append(path)
+
+    return evicted
+
+
+def remove_private_mirrors() -> None:
+    """Wipe mirrors that were fetched with a token (private repositories)."""
+    for path in _list_mirrors():
+        if _read_meta(path).get("private"):
+            shutil.rmtree(path, onerror=remove_readonly)
@@ -0,0 +1,177 @@
+import logging
+import math
+import os
+
+import numpy as np
+
+from embeddings import CHARS_PER_TOKEN
+from lexical import tokenize
+from miner import iter_hunks
+from registry import registry
+
+logger = logging.getLogger(__name__)
+
+# Hugging Face repository whose tokenizer.json measures the prompt, e.g. an
+# ungated copy of the chat model's own tokenizer, and the revision to pin.
+# Empty (the default) estimates from length with CHARS_PER_TOKEN. The
+# CONTEXT_TOKENIZER and CONTEXT_TOKENIZER_REVISION environment variables
+# override them. A configured tokenizer is downloaded by qa.warm_up;
+# offline, or if the download fails, counts fall back to the estimate.
+CONTEXT_TOKENIZER = ""
+CONTEXT_TOKENIZER_REVISION = "main"
+# Tokens of retrieved commits sent to the LLM with each question
+CONTEXT_TOKEN_BUDGET = 3000
+
+CHANGES_MARKER = "--- CODE CHANGES ---"
+
+
+def _build_tokenizer(name: str, revision: str):
+    try:
+        from tokenizers import Tokenizer
+        return Tokenizer.from_pretrained(name, revision=revision)
+    except Exception as e:
+        logger.warning("⚠️ Tokenizer %s@%s unavailable (%s); estimating tokens from length", name, revision, e)
+        return None
+
+
+def load_tokenizer(name: str = None, revision: str = None):
+    """
+    Lazy-load a `tokenizers` tokenizer, the configured CONTEXT_TOKENIZER by
+    default (downloaded once, then served from the Hugging Face cache); one
+    instance per process. Returns None if none is configured or it can't
+    be loaded, e.g. offline before the first download.
+    """
+    name = (os.getenv("CONTEXT_TOKENIZER") or CONTEXT_TOKENIZER) if name is None else name
+    revision = revision or os.getenv("CONTEXT_TOKENIZER_REVISION") or CONTEXT_TOKENIZER_REVISION
+    if not name:
+        return None
+    return registry.get(("tokenizer", name, revision), lambda: _build_tokenizer(name, revision))
+
+
+def token_counts(texts: list[str]) -> list[int]:
+    """Tokens per text with CONTEXT_TOKENIZER, or a chars-per-token estimate without it."""
+    if not texts:
+        return []
+    tokenizer = load_tokenizer()
+    if tokenizer is None:
+        return [math.ceil(len(text) / CHARS_PER_TOKEN) for text in texts]
+    return [len(e.ids) for e in tokenizer.encode_batch(texts, add_special_tokens=False)]
+
+
+def split_document(doc: str) -> tuple[str, list[tuple[str, str]]]:
+    """A commit document's header (through the changes marker) and its (path, hunk) pairs."""
+    header, marker, changes = doc.partition(CHANGES_MARKER)
+    pieces = iter_hunks(changes) if marker else []
+    if not pieces:
+        # No per-file changes ("First commit", "Diff unavailable"): all header
+        return doc.rstrip(), []
+    return header + marker, pieces
+
+
+def select_hunks(query: str, pieces: list[tuple[str, str]], budget: float, costs: list[int]) -> set[int]:
+    """
+    Indices of the hunks to keep within `budget`: those sharing the most
+    tokens with the query first, so the least relevant are dropped first.
+    """
+    terms = set(tokenize(query))
+    overlap = [len(terms & set(tokenize(f"{path}\n{hunk}"))) for path, hunk in pieces]
+
+    chosen = set()
+    for i in sorted(range(len(pieces)), key=lambda i: (-overlap[i], i)):
+        if costs[i] <= budget:
+            chosen.add(i)
+            budget -= costs[i]
+    return chosen
+
+
+def render_document(header: str, pieces: list[tuple[str, str]], chosen: set[int]) -> str:
+    """Header plus the chosen hunks in their original order, grouped under their file."""
+    lines = [header]
+    last_path = None
+    for i in sorted(chosen):
+        path, hunk = pieces[i]
+        if path != last_path:
+            lines.append(f"File: {path}")
+            last_path = path
+        lines.append(hunk)
+    return "\n".join(lines)
+
+
+def _allocate(budget: int, weights: list[float], needs: list[int]) -> list[float]:
+    # Split `budget` in proportion to `weights`; whatever a document doesn't
+    # need is handed on to the others in the same proportion
+    allocation = [0.0] * len(needs)
+    active = set(range(len(needs)))
+
+    while active and budget > 0:
+        total = sum(weights[i] for i in active)
+        share = {
+            i: budget * (weights[i] / total if total > 0 else 1 / len(active))
+            for i in active
+        }
+        satisfied = [i for i in active if needs[i] <= share[i]]
+        if not satisfied:
+            for i in active:
+                allocation[i] = share[i]
+            break
+        for i in satisfied:
+            allocation[i] = needs[i]
+            budget -= needs[i]
+            active.remove(i)
+
+    return allocation
+
+
+def pack_documents(
+    query: str,
+    docs: list[str],
+    scores: list[float] | None = None,
+    budget: int = CONTEXT_TOKEN_BUDGET,
+) -> list[str]:
+    """
+    Fit commit documents into `budget` tokens. Headers (sha, author, date,
+    message) are kept whole; the rest of the budget is shared out in
+    proportion to the softmax of the rerank `scores` (evenly without them),
+    and each document keeps the hunks most relevant to the query that fit
+    its share. Documents whose header no longer fits are dropped, least
+    relevant first. Order is preserved.
+    """
+    if not docs:
+        return []
+
+    if scores is None:
+        weights = np.ones(len(docs))
+    else:
+        logits = np.asarray(scores, dtype=np.float64)
+        weights = np.exp(logits - logits.max())
+
+    parts = [split_document(doc) for doc in docs]
+    header_costs = token_counts([header for header, _ in parts])
+    hunk_texts = [f"File: {path}\n{hunk}" for _, pieces in parts for path, hunk in pieces]
+    flat_costs = iter(token_counts(hunk_texts))
+    costs = [[next(flat_costs) for _ in pieces] for _, pieces in parts]
+
+    kept = []
+    remaining = budget
+    for i in sorted(range(len(docs)), key=lambda i: (-weights[i], i)):
+        if header_costs[i] <= remaining:
+            kept.append(i)
+            remaining -= header_costs[i]
+    kept.sort()
+
+    allocation = _allocate(
+        remaining,
+        [float(weights[i]) for i in kept],
+        [sum(costs[i]) for i in kept],
+    )
+
+    packed = []
+    for i, allowance in zip(kept, allocation):
+        header, pieces = parts[i]
+        chosen = select_hunks(query, pieces, allowance, costs[i])
+        if len(chosen) == len(pieces):
+            packed.append(docs[i].rstrip())
+            continue
+        doc = render_document(header, pieces, chosen)
+        packed.append(f"{doc}\n...({len(pieces) - len(chosen)} of {len(pieces)} hunks omitted)")
+    return packed
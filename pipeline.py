@@ -0,0 +1,156 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass
+
+# Batches buffered between two stages before the upstream stage blocks
+QUEUE_DEPTH = 4
+
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    name: str
+    items: int = 0
+    busy: float = 0.0
+
+    @property
+    def rate(self) -> float:
+        """Items per second of time spent working (queue waits excluded)."""
+        return self.items / self.busy if self.busy else 0.0
+
+
+def format_stats(stats: list[StageStats]) -> str:
+    """One-line throughput summary, naming the slowest stage as the bottleneck."""
+    if not stats:
+        return ""
+    parts = [f"{s.name} {s.rate:.1f}/s" for s in stats]
+    measured = [s for s in stats if s.busy]
+    if not measured:
+        return " · ".join(parts)
+    bottleneck = min(measured, key=lambda s: s.rate)
+    return " · ".join(parts) + f" (bottleneck: {bottleneck.name})"
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    # Blocking put that gives up once the pipeline is being torn down
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(q: queue.Queue, stop: threading.Event):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def _run_source(source, out_q, stop, stats):
+    iterator = iter(source)
+    try:
+        while not stop.is_set():
+            start = time.perf_counter()
+            batch = next(iterator, _DONE)
+            stats.busy += time.perf_counter() - start
+
+            if batch is _DONE:
+                break
+            stats.items += len(batch)
+            if not _put(out_q, batch, stop):
+                return
+        _put(out_q, _DONE, stop)
+    except BaseException as e:
+        _put(out_q, _Failure(e), stop)
+    finally:
+        close = getattr(iterator, "close", None)
+        if close:
+            close()
+
+
+def _run_stage(fn, in_q, out_q, stop, stats):
+    try:
+        while True:
+            batch = _get(in_q, stop)
+            if batch is _DONE or isinstance(batch, _Failure):
+                _put(out_q, batch, stop)
+                return
+
+            start = time.perf_counter()
+            result = fn(batch)
+            stats.busy += time.perf_counter() - start
+            stats.items += len(batch)
+
+            if not _put(out_q, result, stop):
+                return
+    except BaseException as e:
+        _put(out_q, _Failure(e), stop)
+
+
+def run_pipeline(source, stages: list, sink, queue_depth: int = QUEUE_DEPTH) -> list[StageStats]:
+    """
+    Run `source → stages... → sink` concurrently, linked by bounded queues.
+
+    `source` is a (name, iterable of batches) pair and runs in its own thread,
+    as does each (name, fn) in `stages`. The (name, fn) `sink` runs in the
+    calling thread, so it is safe for it to update UI elements.
+    Errors raised in any stage are re-raised here. Returns per-stage stats.
+    """
+    stop = threading.Event()
+    source_name, source_iter = source
+    sink_name, sink_fn = sink
+
+    stats = [StageStats(source_name)] + [StageStats(name) for name, _ in stages] + [StageStats(sink_name)]
+    queues = [queue.Queue(maxsize=queue_depth) for _ in range(len(stages) + 1)]
+
+    threads = [
+        threading.Thread(
+            target=_run_source,
+            args=(source_iter, queues[0], stop, stats[0]),
+            name=f"pipeline-{source_name}",
+            daemon=True,
+        )
+    ]
+    for i, (name, fn) in enumerate(stages):
+        threads.append(
+            threading.Thread(
+                target=_run_stage,
+                args=(fn, queues[i], queues[i + 1], stop, stats[i + 1]),
+                name=f"pipeline-{name}",
+                daemon=True,
+            )
+        )
+
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            batch = queues[-1].get()
+            if batch is _DONE:
+                break
+            if isinstance(batch, _Failure):
+                raise batch.error
+
+            start = time.perf_counter()
+            sink_fn(batch)
+            stats[-1].busy += time.perf_counter() - start
+            stats[-1].items += len(batch)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    return stats
@@ -1,8 +1,33 @@
 import os
+import re
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from openai import OpenAI
-from indexer import get_collection
 from functools import lru_cache
+from openai.types.chat import ChatCompletionChunk
+from answer_cache import AnswerCache, normalize_query
+from embeddings import embed_documents, get_model
+from indexer import (
+    get_collection,
+    get_facts,
+    get_hunk_collection,
+    get_lexical_index,
+    get_timeline,
+    indexed_head,
+    warm_up as warm_up_indexer,
+)
+from lexical import identifiers, reciprocal_rank_fusion, tokenize
+from classifier import MIN_CONFIDENCE, classify
+from facts import aggregate, describe, format_table, plan_aggregation
+from packer import load_tokenizer, pack_documents
+import llm
+import rerank
+from registry import registry
+from utils import ANSWER_CACHE_PATH
+
+logger = logging.getLogger(__name__)
 
 # How many past messages to include for conversation context
 HISTORY_WINDOW = 5
@@ -10,32 +35,50 @@ HISTORY_WINDOW = 5
 RETRIEVAL_K = 10
 # How many to pass to the LLM after reranking
 RERANK_TOP_N = 3
+# How many hunks to fetch when the repository has a hunk-level index; they
+# are grouped back into at most RETRIEVAL_K commits
+HUNK_RETRIEVAL_K = 30
+# A rewritten query whose token overlap (Jaccard) with the raw query is at
+# least this reuses the retrieval speculatively started on the raw query
+REWRITE_SIMILARITY = 0.8
 
-
-@lru_cache(maxsize=1)
-def _get_reranker():
-    """
-    Lazy-load the cross-encoder reranker on first use.
-    Downloads ~85MB on first call, then cached by sentence-transformers.
-    """
-    from sentence_transformers import CrossEncoder
-    return CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
+# Classification, rewriting and speculative retrieval run side by side
+_executor = ThreadPoolExecutor(max_workers=6, thread_name_prefix="qa")
 
 
-def _rerank(query: str, docs: list[str]) -> list[str]:
+def _rerank(query: str, docs: list[str]) -> tuple[list[str], list[float]]:
     """
-    Score each (query, doc) pair with the cross-encoder.
-    Returns docs sorted by relevance score, top RERANK_TOP_N only.
+    Score each (query, doc) pair with the cross-encoder (see rerank.py).
+    Returns docs sorted by relevance score, top RERANK_TOP_N only, and
+    their scores.
     """
     if not docs:
-        return docs
+        return docs, []
+
+    scores = rerank.score(query, docs)
+
+    ranked = sorted(zip(scores, docs), key=lambda x: x[0], reverse=True)[:RERANK_TOP_N]
+    return [doc for _, doc in ranked], [float(score) for score, _ in ranked]
+
+
+def _format_context(docs: list[str]) -> str:
+    context = ""
+    for i, doc in enumerate(docs):
+        context += f"--- COMMIT {i + 1} ---\n{doc}\n\n"
+    return context
 
-    reranker = _get_reranker()
-    pairs = [(query, doc) for doc in docs]
-    scores = reranker.predict(pairs)
 
-    ranked = sorted(zip(scores, docs), key=lambda x: x[0], reverse=True)
-    return [doc for _, doc in ranked[:RERANK_TOP_N]]
+def _filter_bounds(author: str = None, start_date: str = None, end_date: str = None) -> tuple:
+    """
+    Normalise optional filters to (author, start_ts, end_ts), each None if unset.
+    The end date is inclusive, so it is extended to the end of that day.
+    """
+    author = author.strip() if author and author.strip() else None
+    start_ts = int(datetime.strptime(start_date, "%Y-%m-%d").timestamp()) if start_date else None
+    end_ts = None
+    if end_date:
+        end_ts = int(datetime.strptime(end_date + " 23:59:59", "%Y-%m-%d %H:%M:%S").timestamp())
+    return author, start_ts, end_ts
 
 
 def _build_where_clause(author: str = None, start_date: str = None, end_date: str = None) -> dict | None:
@@ -44,17 +87,16 @@ def _build_where_clause(author: str = None, start_date: str = None, end_date: st
     Returns None if no filters are active.
     """
     conditions = []
+    author, start_ts, end_ts = _filter_bounds(author, start_date, end_date)
 
-    if author and author.strip():
-        conditions.append({"author": {"$eq": author.strip()}})
+    if author:
+        conditions.append({"author": {"$eq": author}})
 
-    if start_date:
-        ts = int(datetime.strptime(start_date, "%Y-%m-%d").timestamp())
-        conditions.append({"timestamp": {"$gte": ts}})
+    if start_ts is not None:
+        conditions.append({"timestamp": {"$gte": start_ts}})
 
-    if end_date:
-        ts = int(datetime.strptime(end_date + " 23:59:59", "%Y-%m-%d %H:%M:%S").timestamp())
-        conditions.append({"timestamp": {"$lte": ts}})
+    if end_ts is not None:
+        conditions.append({"timestamp": {"$lte": end_ts}})
 
     if not conditions:
         return None
@@ -65,25 +107,33 @@ def _build_where_clause(author: str = None, start_date: str = None, end_date: st
 
 def _classify_query(query: str) -> str:
     """
-    Use LLM to classify query as 'listing' or 'semantic'.
+    Classify query as 'listing', 'semantic' or 'aggregate' with the local
+    rule-based classifier; only ask the LLM when it isn't confident.
+    """
+    label, confidence = classify(query)
+    if confidence >= MIN_CONFIDENCE:
+        return label
+    return _classify_with_llm(query)
+
+
+def _classify_with_llm(query: str) -> str:
+    """
+    Use LLM to classify query as 'listing', 'semantic' or 'aggregate'.
     - listing: ordered/sequential queries (most recent, last N, first commit, newest)
     - semantic: specific changes, reasons, authors, bugs, features
+    - aggregate: counts and rankings over the whole history (top authors, commits per month, churn per file)
     """
-    client = OpenAI(
-        api_key=os.getenv("GROQ_API_KEY"),
-        base_url="https://api.groq.com/openai/v1"
-    )
-
-    response = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
+    response = llm.chat(
+        label="classify",
         messages=[{
             "role": "user",
-            "content": f"""Classify this Git repository question into one of two types:
+            "content": f"""Classify this Git repository question into one of three types:
 
 - "listing": questions asking for ordered/sequential commits (most recent, last N, first commit, latest, newest, chronological list)
 - "semantic": questions asking about specific changes, reasons, authors, bugs, features
+- "aggregate": questions asking for counts or rankings across many commits (how many, top authors, commits per month, churn per file)
 
-Reply with ONLY one word: listing or semantic.
+Reply with ONLY one word: listing, semantic or aggregate.
 
 Question: "{query}"
 """
@@ -92,40 +142,100 @@ Question: "{query}"
     )
 
     result = response.choices[0].message.content.strip().lower()
-    return "listing" if "listing" in result else "semantic"
+    if "listing" in result:
+        return "listing"
+    return "aggregate" if "aggregate" in result else "semantic"
 
 
-def _get_ordered_commits(query: str, n: int = 5) -> str:
+def _listing_count(query: str) -> int:
+    """Commits a listing query asks for, e.g. 10 for "last 10 commits"; 5 by default."""
+    for num in ["10", "7", "6", "5", "4", "3", "2"]:
+        if num in query:
+            return int(num)
+    return 5
+
+
+def _get_ordered_commits(
+    query: str,
+    collection_name: str,
+    n: int = 5,
+    author: str = None,
+    start_date: str = None,
+    end_date: str = None,
+) -> str:
     """
-    Fetch commits directly from ChromaDB ordered by timestamp.
+    Fetch the N most recent (or, for first/earliest queries, oldest)
+    commits matching the filters, in timestamp order.
     Used for listing/ordering queries that RAG can't handle reliably.
     """
-    collection = get_collection()
+    collection = get_collection(collection_name)
+    newest_first = not any(kw in query.lower() for kw in ["first", "earliest", "initial", "oldest"])
+
+    timeline = get_timeline(collection_name)
+    if timeline is None:
+        docs = _scan_ordered(collection, n, newest_first, _build_where_clause(author, start_date, end_date))
+    else:
+        # Index range scan for the shas, then only those N documents
+        try:
+            shas = timeline.ordered(n, newest_first, *_filter_bounds(author, start_date, end_date))
+        finally:
+            timeline.close()
+        docs = _get_documents(collection, shas)
+
+    return _format_context(pack_documents(query, docs))
+
+
+def _get_documents(collection, ids: list[str]) -> list[str]:
+    """Documents for `ids`, in the order given (ChromaDB doesn't preserve it)."""
+    if not ids:
+        return []
+    results = collection.get(ids=ids, include=["documents"])
+    by_id = dict(zip(results["ids"], results["documents"]))
+    return [by_id[doc_id] for doc_id in ids if doc_id in by_id]
+
+
+def _scan_ordered(collection, n: int, newest_first: bool, where: dict | None) -> list[str]:
+    # Fallback for collections indexed before the timeline existed: only
+    # correct for repositories with at most 500 commits
     results = collection.get(
         limit=500,
+        where=where,
         include=["metadatas", "documents"]
     )
 
-    docs = results["documents"]
-    metas = results["metadatas"]
-
-    # Sort by timestamp descending (most recent first)
     paired = sorted(
-        zip(metas, docs),
+        zip(results["metadatas"], results["documents"]),
         key=lambda x: x[0].get("timestamp", 0),
-        reverse=True
+        reverse=newest_first
     )
+    return [doc for _, doc in paired[:n]]
 
-    # Reverse for first/earliest queries
-    if any(kw in query.lower() for kw in ["first", "earliest", "initial"]):
-        paired = list(reversed(paired))
 
-    top = paired[:n]
-    context = ""
-    for i, (meta, doc) in enumerate(top):
-        context += f"--- COMMIT {i + 1} ---\n{doc}\n\n"
+def _get_aggregate(
+    query: str,
+    collection_name: str,
+    author: str = None,
+    start_date: str = None,
+    end_date: str = None,
+) -> str | None:
+    """
+    Answer counting/ranking questions with a group-by over the collection's
+    per-file facts store; the LLM gets the resulting table instead of a few
+    commits. Returns None if the collection has no facts store.
+    """
+    facts = get_facts(collection_name)
+    if facts is None:
+        return None
 
-    return context
+    spec = plan_aggregation(query, authors=facts["author"].cat.categories)
+    table = aggregate(facts, spec, *_filter_bounds(author, start_date, end_date))
+    if table.empty:
+        return "No commits match this aggregation."
+
+    return (
+        f"--- AGGREGATE ({describe(spec)}; {facts['sha'].nunique()} commits indexed) ---\n"
+        f"{format_table(table)}\n"
+    )
 
 
 def _rewrite_query(query: str, history: list) -> str:
@@ -141,13 +251,8 @@ def _rewrite_query(query: str, history: list) -> str:
         f"{m['role'].upper()}: {m['content']}" for m in recent
     )
 
-    client = OpenAI(
-        api_key=os.getenv("GROQ_API_KEY"),
-        base_url="https://api.groq.com/openai/v1"
-    )
-
-    response = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
+    response = llm.chat(
+        label="rewrite",
         messages=[{
             "role": "user",
             "content": f"""Given this conversation history:
@@ -163,45 +268,120 @@ Rewrite this follow-up question as a standalone search query (one sentence, no e
     return response.choices[0].message.content.strip()
 
 
-def _build_context(
+def _fuse(collection, docs_by_id: dict, rankings: list[list[str]]) -> list[str]:
+    """
+    Merge ranked id lists with reciprocal rank fusion and return the top
+    RETRIEVAL_K documents, fetching any the vector search didn't return.
+    """
+    fused = reciprocal_rank_fusion(rankings)[:RETRIEVAL_K]
+
+    missing = [doc_id for doc_id in fused if doc_id not in docs_by_id]
+    if missing:
+        fetched = collection.get(ids=missing, include=["documents"])
+        docs_by_id.update(zip(fetched["ids"], fetched["documents"]))
+
+    return [docs_by_id[doc_id] for doc_id in fused if doc_id in docs_by_id]
+
+
+def _vector_search(collection, query: str, n: int, where: dict | None) -> tuple[dict, bool]:
+    # Returns the results and whether the filters could actually be applied
+    try:
+        if where:
+            return collection.query(query_texts=[query], n_results=n, where=where), True
+        return collection.query(query_texts=[query], n_results=n), False
+    except Exception:
+        return collection.query(query_texts=[query], n_results=n), False
+
+
+def _group_hunks(ids: list[str], docs: list[str], metadatas: list[dict]) -> tuple[list[str], list[str]]:
+    """
+    Fold hunk-level hits back into one document per parent commit: commits
+    are ranked by their best hunk and keep only the hunks that matched, in
+    their original order. Returns (commit ids, documents).
+    """
+    headers, bodies = {}, {}
+    for hunk_id, doc, metadata in zip(ids, docs, metadatas):
+        sha = metadata["commit"]
+        header, marker, body = doc.partition("--- CODE CHANGES ---")
+        headers.setdefault(sha, header + marker + "\n")
+        bodies.setdefault(sha, []).append((int(hunk_id.rsplit(":", 1)[1]), body))
+
+    return list(headers), [
+        headers[sha] + "".join(body for _, body in sorted(bodies[sha]))
+        for sha in headers
+    ]
+
+
+def _retrieve(
     query: str,
+    collection_name: str,
     author: str = None,
     start_date: str = None,
     end_date: str = None,
-) -> tuple[str, bool]:
+) -> tuple[list[str], bool]:
     """
-    Retrieve top-K commits from ChromaDB, rerank, return top-N as context string.
+    Retrieve top-K commits from ChromaDB and the BM25 index and fuse them.
+    With a hunk-level index, the best hunks grouped by commit are fused in
+    too; commit-level hits still count, since merges and message-only
+    commits have no hunks. Returns (documents, whether the filters could
+    be applied).
     """
-    collection = get_collection()
+    collection = get_collection(collection_name)
     where = _build_where_clause(author, start_date, end_date)
-    filters_active = where is not None
-
-    try:
-        if where:
-            results = collection.query(
-                query_texts=[query],
-                n_results=RETRIEVAL_K,
-                where=where
-            )
-        else:
-            results = collection.query(query_texts=[query], n_results=RETRIEVAL_K)
-    except Exception:
-        results = collection.query(query_texts=[query], n_results=RETRIEVAL_K)
-        filters_active = False
 
+    results, filters_active = _vector_search(collection, query, RETRIEVAL_K, where)
     docs = results["documents"][0] if results["documents"] else []
-
+    ids = results["ids"][0] if results.get("ids") else []
+    rankings = [ids]
+    docs_by_id = dict(zip(ids, docs))
+
+    hunk_collection = get_hunk_collection(collection_name)
+    if hunk_collection is not None:
+        results, hunk_filters_active = _vector_search(hunk_collection, query, HUNK_RETRIEVAL_K, where)
+        filters_active = filters_active and hunk_filters_active
+        if results["documents"]:
+            hunk_ids, hunk_docs = _group_hunks(results["ids"][0], results["documents"][0], results["metadatas"][0])
+            rankings.insert(0, hunk_ids[:RETRIEVAL_K])
+            # Prefer the matched hunks over the whole commit
+            docs_by_id.update(zip(hunk_ids[:RETRIEVAL_K], hunk_docs[:RETRIEVAL_K]))
+
+    # Exact identifiers (function names, error codes, ticket IDs, sha
+    # prefixes) are often missed by embeddings; fuse in BM25 hits
+    lexical = get_lexical_index(collection_name)
+    if lexical is not None:
+        bounds = _filter_bounds(author, start_date, end_date) if filters_active else (None, None, None)
+        try:
+            rankings.append(lexical.search(query, RETRIEVAL_K, *bounds))
+        finally:
+            lexical.close()
+
+    if len(rankings) > 1:
+        docs = _fuse(collection, docs_by_id, rankings)
+    return docs, filters_active
+
+
+def _rank_context(query: str, docs: list[str], filters_active: bool, filtered: bool) -> tuple[str, bool]:
+    """Rerank retrieved documents and pack the top-N into the context token budget."""
     # If filters were active but returned nothing, signal clearly
-    if where and not docs:
+    if filtered and not docs:
         return "No commits found matching the active filters.", True
 
-    reranked_docs = _rerank(query, docs)
+    reranked_docs, scores = _rerank(query, docs)
 
-    context = ""
-    for i, doc in enumerate(reranked_docs):
-        context += f"--- COMMIT {i + 1} ---\n{doc}\n\n"
+    return _format_context(pack_documents(query, reranked_docs, scores)), filters_active
 
-    return context, filters_active
+
+def _build_context(
+    query: str,
+    collection_name: str,
+    author: str = None,
+    start_date: str = None,
+    end_date: str = None,
+) -> tuple[str, bool]:
+    """Retrieve, rerank and pack: the context string for a semantic query."""
+    docs, filters_active = _retrieve(query, collection_name, author, start_date, end_date)
+    filtered = _build_where_clause(author, start_date, end_date) is not None
+    return _rank_context(query, docs, filters_active, filtered)
 
 
 def _build_messages(
@@ -238,7 +418,8 @@ Rules:
 - Always cite the commit hash and author when referencing a specific change.
 - If the context doesn't contain enough information to answer, say so clearly — do not hallucinate.
 - Keep answers concise and technical. Avoid filler sentences.
-- For listing queries (last N commits, recent commits), present them in order with commit hash, author, date and message.{filter_note}
+- For listing queries (last N commits, recent commits), present them in order with commit hash, author, date and message.
+- For aggregate results, answer from the table exactly as given; do not estimate or add numbers that aren't in it.{filter_note}
 """
 
     messages = [{"role": "system", "content": system_prompt}]
@@ -257,41 +438,216 @@ Rules:
     return messages
 
 
+@lru_cache(maxsize=1)
+def _get_answer_cache() -> AnswerCache:
+    return AnswerCache(ANSWER_CACHE_PATH)
+
+
+def _answer_cache_key(query: str, query_type: str, author: str = None, start_date: str = None, end_date: str = None) -> str:
+    """
+    Answer cache key: the filters plus the route and what it parsed from the
+    query, so "last 5 commits" never replays "last 10 commits" and a
+    question about `MAX_RETRIES` never one about `MIN_RETRIES`. Aggregate
+    windows are kept to the day, or "last month" would never hit twice.
+    """
+    key = {"filters": _filter_bounds(author, start_date, end_date), "type": query_type}
+    if query_type == "semantic":
+        key["identifiers"] = identifiers(query)
+    elif query_type == "listing":
+        key["n"] = _listing_count(query)
+    elif query_type == "aggregate":
+        spec = plan_aggregation(query)
+        for bound in ("start_ts", "end_ts"):
+            if spec[bound] is not None:
+                spec[bound] //= 86400
+        key["spec"] = spec
+    return json.dumps(key, sort_keys=True)
+
+
+def _embed_query(query: str):
+    return embed_documents(get_model(), [query])[0]
+
+
+def _replay(answer: str):
+    """Yield a stored answer as completion chunks, like a live LLM stream."""
+    for i, piece in enumerate(re.findall(r"\S+\s*|\s+", answer)):
+        yield ChatCompletionChunk(
+            id=f"cached-{i}",
+            object="chat.completion.chunk",
+            created=int(time.time()),
+            model=llm.model(),
+            choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+        )
+
+
+def _timed(timings: dict, key: str, fn, *args):
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        timings[key] = time.perf_counter() - start
+
+
+def _same_search(query: str, rewritten: str) -> bool:
+    """True if the rewrite keeps the raw query's retrieval meaningful."""
+    a, b = set(tokenize(query)), set(tokenize(rewritten))
+    if not a and not b:
+        return True
+    return len(a & b) / len(a | b) >= REWRITE_SIMILARITY
+
+
+class TimedStream:
+    """
+    Iterates an LLM completion stream, recording time-to-first-token
+    (from the start of `ask`) alongside the per-step `timings`.
+    `on_complete` receives the full answer text once the stream is exhausted.
+    """
+
+    def __init__(self, stream, started: float, timings: dict, on_complete=None):
+        self._stream = stream
+        self._started = started
+        self._on_complete = on_complete
+        self.timings = timings
+
+    @property
+    def ttft(self) -> float | None:
+        return self.timings.get("ttft")
+
+    def __iter__(self):
+        parts = []
+        for chunk in self._stream:
+            if "ttft" not in self.timings:
+                self.timings["ttft"] = time.perf_counter() - self._started
+                steps = " · ".join(
+                    f"{key} {value * 1000:.0f} ms"
+                    for key, value in self.timings.items()
+                    if key != "ttft" and isinstance(value, float)
+                )
+                logger.info(
+                    "⏱️ Time to first token: %.0f ms (%s) · rerank cache %.0f%% hits · answer cache %.0f%% hits",
+                    self.ttft * 1000, steps,
+                    rerank.score_cache.hit_rate * 100, _get_answer_cache().hit_rate * 100,
+                )
+                logger.debug("🔌 LLM calls: %s", llm.metrics.summary())
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+            yield chunk
+
+        if self._on_complete and parts:
+            self._on_complete("".join(parts))
+
+
+def warm_up() -> None:
+    """
+    Load everything a question needs (embedding model, ChromaDB client,
+    reranker, context tokenizer, LLM client, answer cache) so the first
+    one doesn't pay for it.
+    """
+    started = time.perf_counter()
+    warm_up_indexer()
+    rerank.load_reranker()
+    load_tokenizer()
+    llm.get_client()
+    _get_answer_cache()
+    logger.info("🔥 Warmed up in %.0f ms (%s)", (time.perf_counter() - started) * 1000, registry.summary())
+
+
 def ask(
     query: str,
     history: list,
+    collection_name: str,
     author: str = None,
     start_date: str = None,
     end_date: str = None,
-):
+) -> TimedStream:
     """
     Query the RAG pipeline with reranking and optional metadata filters.
-
-    Pipeline: classify → (listing: ordered fetch) | (semantic: rewrite → ChromaDB → rerank) → Groq LLM
+    `collection_name` selects the indexed repository (see indexer.collection_name).
+
+    Pipeline: classify (local, LLM fallback) → (listing: ordered fetch) | (aggregate: facts group-by) | (semantic: rewrite → ChromaDB + BM25 → fuse → rerank) → Groq LLM
+
+    Classification, rewriting and a speculative retrieval on the raw query
+    run concurrently; the speculative candidates are reranked only once the
+    query is known to be semantic, uncached and not materially changed by
+    the rewrite. An answer already given against the same indexed HEAD,
+    filters and route (see _answer_cache_key) for a similar standalone
+    query, or for listing and aggregate questions the same raw one, is
+    replayed without calling the LLM. Returns a TimedStream whose `ttft`
+    is set once the first token arrives.
     """
+    started = time.perf_counter()
     api_key = os.getenv("GROQ_API_KEY")
     if not api_key:
         raise ValueError("GROQ_API_KEY is not set.")
 
-    # Classify query type
-    query_type = _classify_query(query)
+    timings = {}
+    classified = _executor.submit(_timed, timings, "classify", _classify_query, query)
+    rewritten = _executor.submit(_timed, timings, "rewrite", _rewrite_query, query, history)
+    # Retrieval only: the cross-encoder waits until the answer is known to need it
+    speculative = _executor.submit(
+        _timed, timings, "speculate", _retrieve,
+        query, collection_name, author, start_date, end_date,
+    )
 
+    query_type = classified.result()
+
+    # Answers are only valid for the HEAD they were generated against
+    head = indexed_head(collection_name)
+    if head:
+        cache = _get_answer_cache()
+        if query_type == "semantic":
+            # Matched by meaning, so on the standalone rewrite of a follow-up
+            standalone = rewritten.result()
+            vector = _timed(timings, "embed", _embed_query, standalone)
+            exact = None
+        else:
+            # Listing and aggregate routes read the raw query and don't wait
+            # for the rewrite; a near-identical question can still ask for
+            # different rows, so only the same question matches
+            standalone, vector = query, None
+            exact = normalize_query(query)
+        normalized = normalize_query(standalone)
+        cache_key = _answer_cache_key(standalone, query_type, author, start_date, end_date)
+        cached = cache.lookup(collection_name, head, cache_key, vector, exact)
+        timings["answer_cache"] = "hit" if cached is not None else "miss"
+        if cached is not None:
+            speculative.cancel()
+            return TimedStream(_replay(cached), started, timings)
+
+    context = None
     if query_type == "listing":
-        # Extract number from query if present e.g. "last 10 commits"
-        n = 5
-        for num in ["10", "7", "6", "5", "4", "3", "2"]:
-            if num in query:
-                n = int(num)
-                break
-        context = _get_ordered_commits(query, n=n)
-        filters_active = False
+        context = _timed(
+            timings, "listing", _get_ordered_commits,
+            query, collection_name, _listing_count(query), author, start_date, end_date,
+        )
+        filters_active = _build_where_clause(author, start_date, end_date) is not None
+    elif query_type == "aggregate":
+        # None if this collection was indexed before the facts store existed
+        context = _timed(
+            timings, "aggregate", _get_aggregate,
+            query, collection_name, author, start_date, end_date,
+        )
+        filters_active = _build_where_clause(author, start_date, end_date) is not None
+
+    if context is not None:
+        speculative.cancel()
     else:
-        search_query = _rewrite_query(query, history)
-        context, filters_active = _build_context(search_query, author, start_date, end_date)
-
-    MAX_CONTEXT_CHARS = 12000
-    if len(context) > MAX_CONTEXT_CHARS:
-        context = context[:MAX_CONTEXT_CHARS] + "\n...(context truncated)"
+        search_query = rewritten.result()
+        if _same_search(query, search_query):
+            docs, filters_active = speculative.result()
+            timings["speculation"] = "hit"
+            context, filters_active = _timed(
+                timings, "rerank", _rank_context,
+                query, docs, filters_active, _build_where_clause(author, start_date, end_date) is not None,
+            )
+        else:
+            timings["speculation"] = "miss"
+            # The rewrite changed what we're looking for; discard the speculation
+            speculative.cancel()
+            context, filters_active = _timed(
+                timings, "retrieve", _build_context,
+                search_query, collection_name, author, start_date, end_date,
+            )
 
     messages = _build_messages(
         query, context, history,
@@ -301,15 +657,11 @@ def ask(
         filters_active=filters_active,
     )
 
-    client = OpenAI(
-        api_key=api_key,
-        base_url="https://api.groq.com/openai/v1"
-    )
+    stream = llm.chat(messages, label="answer", api_key=api_key, stream=True)
 
-    stream = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=messages,
-        stream=True,
-    )
+    on_complete = None
+    if head:
+        def on_complete(answer: str) -> None:
+            cache.store(collection_name, head, cache_key, normalized, vector, answer)
 
-    return stream
\ No newline at end of file
+    return TimedStream(stream, started, timings, on_complete)
\ No newline at end of file
@@ -0,0 +1,62 @@
+import threading
+import time
+
+
+class Registry:
+    """
+    Process-wide cache of expensive objects (models, clients), keyed by
+    (kind, name) and each built once by its factory. Concurrent first
+    requests for a key wait for a single build. Load counts and timings
+    are kept per key.
+    """
+
+    def __init__(self):
+        self._objects = {}
+        self._locks = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, factory):
+        try:
+            return self._objects[key]
+        except KeyError:
+            pass
+
+        with self._lock:
+            key_lock = self._locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            if key not in self._objects:
+                start = time.perf_counter()
+                self._objects[key] = factory()
+                elapsed = time.perf_counter() - start
+
+                with self._lock:
+                    stats = self._stats.setdefault(key, {"loads": 0, "seconds": 0.0})
+                    stats["loads"] += 1
+                    stats["seconds"] += elapsed
+            return self._objects[key]
+
+    def stats(self) -> dict:
+        """{key: {"loads": n, "seconds": total build time}}."""
+        with self._lock:
+            return {key: dict(value) for key, value in self._stats.items()}
+
+    def summary(self) -> str:
+        return " · ".join(
+            f"{key[0]} {value['loads']}× {value['seconds'] * 1000:.0f} ms"
+            for key, value in self.stats().items()
+        )
+
+    def discard(self, key) -> None:
+        """Forget the object built for `key`; the next get() builds a new one."""
+        with self._lock:
+            self._objects.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._objects.clear()
+            self._locks.clear()
+
+
+registry = Registry()
@@ -0,0 +1,224 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from embeddings import CHARS_PER_TOKEN
+from lexical import tokenize
+from packer import render_document, select_hunks, split_document
+from registry import registry
+
+logger = logging.getLogger(__name__)
+
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+# "onnx" runs the int8-quantized export with ONNX Runtime; "torch" the
+# original CrossEncoder. ONNX falls back to torch if it can't be loaded.
+RERANK_BACKEND = "onnx"
+# Quantized export shipped in the model repository (AVX2 kernels, x86 CPUs)
+RERANK_ONNX_FILE = "onnx/model_qint8_avx2.onnx"
+# Word pieces per (query, document) pair; the model's limit is 512 but
+# header, message and the best hunks fit comfortably in far fewer
+RERANK_TOKEN_BUDGET = 256
+# Cross-encoder scores remembered per (normalized query, document)
+SCORE_CACHE_SIZE = 4096
+# Seconds a cached score stays valid
+SCORE_CACHE_TTL = 3600
+
+
+def cpu_threads() -> int:
+    """CPUs this process may actually use: affinity mask capped by a cgroup v2 quota."""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            count = min(count, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+
+    return count
+
+
+def normalize_query(query: str) -> str:
+    """Case, punctuation and whitespace-insensitive form of a query."""
+    return " ".join(tokenize(query))
+
+
+def _doc_key(doc: str) -> str:
+    # Keyed by content, not commit sha: a commit's full document and its
+    # matched hunks (hunk-level index) are focused and scored differently
+    return hashlib.sha1(doc.encode()).hexdigest()
+
+
+class ScoreCache:
+    """Thread-safe LRU of reranker scores whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = SCORE_CACHE_SIZE, ttl: float = SCORE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: list) -> dict:
+        """{key: score} for the keys cached and not expired."""
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or now - entry[1] > self.ttl:
+                    self._entries.pop(key, None)
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[0]
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items: dict) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = (value, now)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+score_cache = ScoreCache()
+
+
+def focus_document(query: str, doc: str, token_budget: int = RERANK_TOKEN_BUDGET) -> str:
+    """
+    Shrink a commit document to roughly `token_budget` tokens for reranking.
+
+    The header (sha, author, date, message) is always kept; the remaining
+    budget goes to the hunks sharing the most tokens with the query, which
+    are then emitted in their original order.
+    """
+    budget = max(token_budget - len(tokenize(query)), 0) * CHARS_PER_TOKEN
+    if len(doc) <= budget:
+        return doc
+
+    header, pieces = split_document(doc)
+    if not pieces or len(header) >= budget:
+        return doc[:budget]
+
+    # "File: <path>" line (when a new file starts) plus the hunk and newlines
+    costs = [len(path) + len(hunk) + 8 for path, hunk in pieces]
+    chosen = select_hunks(query, pieces, budget - len(header), costs)
+    return render_document(header, pieces, chosen)
+
+
+class _OnnxReranker:
+    """Int8 ONNX Runtime session plus a fast Rust tokenizer."""
+
+    def __init__(self, threads: int):
+        import onnxruntime as ort
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(RERANK_MODEL, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=RERANK_TOKEN_BUDGET)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            hf_hub_download(RERANK_MODEL, RERANK_ONNX_FILE),
+            options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._inputs = {i.name for i in self.session.get_inputs()}
+
+    def predict(self, pairs: list[tuple[str, str]]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(pairs)
+        feed = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        logits = self.session.run(None, {k: v for k, v in feed.items() if k in self._inputs})[0]
+        return logits.reshape(len(pairs), -1)[:, 0]
+
+
+class _TorchReranker:
+    """sentence-transformers CrossEncoder, capped at the same token budget."""
+
+    def __init__(self, threads: int):
+        import torch
+        from sentence_transformers import CrossEncoder
+
+        torch.set_num_threads(threads)
+        self.model = CrossEncoder(RERANK_MODEL, max_length=RERANK_TOKEN_BUDGET)
+
+    def predict(self, pairs: list[tuple[str, str]]) -> np.ndarray:
+        scores = self.model.predict(pairs, batch_size=max(len(pairs), 1), show_progress_bar=False)
+        return np.asarray(scores, dtype=np.float32)
+
+
+def _build_reranker(backend: str):
+    threads = cpu_threads()
+    if backend == "onnx":
+        try:
+            return _OnnxReranker(threads)
+        except Exception as e:
+            logger.warning("⚠️ ONNX reranker unavailable (%s); falling back to torch", e)
+    return _TorchReranker(threads)
+
+
+def load_reranker(backend: str = RERANK_BACKEND):
+    """
+    Lazy-load the cross-encoder on first use (downloads it once, then
+    served from the Hugging Face cache); one instance per process.
+    """
+    return registry.get(("reranker", backend), lambda: _build_reranker(backend))
+
+
+def score(query: str, docs: list[str], backend: str = RERANK_BACKEND, cache: ScoreCache = score_cache) -> np.ndarray:
+    """
+    Relevance score per doc. Scores already in `cache` for this normalized
+    query are reused; the rest are scored in a single batch on focused
+    documents. Pass cache=None to always run the model.
+    """
+    if not docs:
+        return np.zeros(0, dtype=np.float32)
+
+    if cache is None:
+        pairs = [(query, focus_document(query, doc)) for doc in docs]
+        return load_reranker(backend).predict(pairs)
+
+    normalized = normalize_query(query)
+    keys = [(backend, normalized, _doc_key(doc)) for doc in docs]
+    scores = cache.get_many(keys)
+
+    missing = [i for i, key in enumerate(keys) if key not in scores]
+    if missing:
+        pairs = [(query, focus_document(query, docs[i])) for i in missing]
+        fresh = load_reranker(backend).predict(pairs)
+        computed = {keys[i]: float(value) for i, value in zip(missing, fresh)}
+        cache.put_many(computed)
+        scores.update(computed)
+
+    return np.array([scores[key] for key in keys], dtype=np.float32)
@@ -0,0 +1,77 @@
+"""
+Tests for answer_cache.py
+
+Covers:
+- similarity threshold matching
+- keying by collection, HEAD and filters; exact query matches
+- invalidation when a collection moves to a new HEAD
+- per-collection row cap and hit/miss counters
+"""
+
+import numpy as np
+import pytest
+
+from answer_cache import AnswerCache, normalize_query
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = AnswerCache(str(tmp_path / "answers.sqlite"), threshold=0.95)
+    yield c
+    c.close()
+
+
+V1 = np.array([1.0, 0.0, 0.0])
+V1_NEAR = np.array([1.0, 0.05, 0.0])
+V2 = np.array([0.0, 1.0, 0.0])
+
+
+class TestLookup:
+
+    def test_near_duplicate_query_hits(self, cache):
+        cache.store("repo", "h1", "[]", "why was X removed", V1, "Because.")
+        assert cache.lookup("repo", "h1", "[]", V1_NEAR) == "Because."
+
+    def test_different_query_misses(self, cache):
+        cache.store("repo", "h1", "[]", "why was X removed", V1, "Because.")
+        assert cache.lookup("repo", "h1", "[]", V2) is None
+
+    def test_keyed_by_collection_and_filters(self, cache):
+        cache.store("repo", "h1", "[]", "q", V1, "A")
+        assert cache.lookup("other", "h1", "[]", V1) is None
+        assert cache.lookup("repo", "h1", '["bob", null, null]', V1) is None
+
+    def test_exact_query(self, cache):
+        cache.store("repo", "h1", "[]", normalize_query("Last 10 commits?"), V1, "A")
+        assert cache.lookup("repo", "h1", "[]", V1, normalize_query("last 10  commits")) == "A"
+        assert cache.lookup("repo", "h1", "[]", V1, normalize_query("last 5 commits")) is None
+
+    def test_counters(self, cache):
+        cache.store("repo", "h1", "[]", "q", V1, "A")
+        cache.lookup("repo", "h1", "[]", V1)
+        cache.lookup("repo", "h1", "[]", V2)
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert cache.hit_rate == 0.5
+
+
+class TestInvalidation:
+
+    def test_new_head_drops_old_answers(self, cache):
+        cache.store("repo", "h1", "[]", "q", V1, "old")
+        assert cache.lookup("repo", "h2", "[]", V1) is None
+        # Even going back to h1 finds nothing: the old rows are gone
+        assert cache.lookup("repo", "h1", "[]", V1) is None
+
+    def test_other_collections_untouched(self, cache):
+        cache.store("a", "h1", "[]", "q", V1, "A")
+        cache.store("b", "h1", "[]", "q", V1, "B")
+        cache.lookup("a", "h2", "[]", V1)
+        assert cache.lookup("b", "h1", "[]", V1) == "B"
+
+    def test_row_cap_keeps_newest(self, tmp_path):
+        cache = AnswerCache(str(tmp_path / "capped.sqlite"), max_rows=2)
+        for i, vector in enumerate([V1, V2, np.array([0.0, 0.0, 1.0])]):
+            cache.store("repo", "h1", "[]", f"q{i}", vector, f"A{i}")
+        assert cache.lookup("repo", "h1", "[]", V1) is None
+        assert cache.lookup("repo", "h1", "[]", V2) == "A1"
+        cache.close()
@@ -0,0 +1,92 @@
+"""
+Tests for classifier.py
+
+Covers:
+- classify() against a labeled set of listing / semantic / aggregate questions
+- low confidence on ambiguous or cue-less questions (LLM fallback)
+- per-query latency budget
+"""
+
+import time
+import pytest
+
+from classifier import MIN_CONFIDENCE, classify
+
+LABELED = [
+    # listing
+    ("What are the last 10 commits?", "listing"),
+    ("Show me the latest 5 commits", "listing"),
+    ("What was the most recent commit?", "listing"),
+    ("What was the first commit?", "listing"),
+    ("Show the initial commit of this repo", "listing"),
+    ("List the newest changes", "listing"),
+    ("What are the earliest 3 commits?", "listing"),
+    ("Give me the oldest commit", "listing"),
+    ("List recent commits chronologically", "listing"),
+    ("Show me the commit history in order", "listing"),
+    ("last 7 commits", "listing"),
+    ("What are the latest commits?", "listing"),
+    ("Show the last few commits", "listing"),
+    ("Give me a timeline of the most recent changes", "listing"),
+    # semantic
+    ("Why was the caching layer removed?", "semantic"),
+    ("Who introduced the retry logic?", "semantic"),
+    ("When did MAX_RETRIES change?", "semantic"),
+    ("What changed in auth/login.py?", "semantic"),
+    ("Which commit fixed PROJ-123?", "semantic"),
+    ("Explain commit 3f9a2c1", "semantic"),
+    ("How did the `parse_config` function evolve?", "semantic"),
+    ("Was there a bug in the upload handler?", "semantic"),
+    ("Who refactored getUserById?", "semantic"),
+    ("Why did the timeout go from 5 to 10?", "semantic"),
+    ("What was the reason for dropping Python 3.8 support?", "semantic"),
+    ("When was the dark mode feature added?", "semantic"),
+    ("What happened to the legacy API?", "semantic"),
+    ("Which author renamed the config module?", "semantic"),
+    # aggregate
+    ("Who touched `auth/` the most last year?", "aggregate"),
+    ("How many commits per month?", "aggregate"),
+    ("Top 5 contributors by lines added", "aggregate"),
+    ("Which files have the most churn?", "aggregate"),
+    ("How many commits did bob make in 2023?", "aggregate"),
+    ("Monthly commit counts for src/", "aggregate"),
+    ("Who committed the most in the last 6 months?", "aggregate"),
+]
+
+
+class TestLabeledSet:
+
+    @pytest.mark.parametrize("query, expected", LABELED)
+    def test_confident_and_correct(self, query, expected):
+        label, confidence = classify(query)
+        assert label == expected
+        assert confidence >= MIN_CONFIDENCE
+
+
+class TestLowConfidence:
+
+    def test_no_cues_is_unsure(self):
+        assert classify("tell me about this repository")[1] < MIN_CONFIDENCE
+
+    def test_conflicting_cues_are_unsure(self):
+        # Equally strong listing and semantic cues
+        assert classify("why was the first commit reverted?")[1] < MIN_CONFIDENCE
+
+    def test_single_weak_cue_is_unsure(self):
+        # A bare "recent" is not enough to answer with the latest N commits
+        assert classify("Summarize recent work on the parser")[1] < MIN_CONFIDENCE
+
+
+class TestLatency:
+
+    def test_under_a_millisecond_per_query(self):
+        queries = [q for q, _ in LABELED]
+        rounds = 50
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for query in queries:
+                classify(query)
+        per_query = (time.perf_counter() - start) / (rounds * len(queries))
+
+        assert per_query < 0.001
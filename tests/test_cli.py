@@ -0,0 +1,163 @@
+"""
+Tests for cli.py
+
+Covers:
+- manifest parsing (JSON and plain text) with command-line defaults
+- `index` running every repository through the job manager, exit status on failure
+- `query` refusing unindexed repositories and printing JSON lines
+- `stats` table and JSON output
+"""
+
+import json
+import logging
+import functools
+import pytest
+
+import cli
+from indexer import collection_name
+from jobs import JobManager
+
+DEFAULTS = {"depth": 500, "incremental": True, "hunks": False, "branch": None}
+REPOS = [
+    {
+        "name": collection_name("https://github.com/a/b.git"),
+        "repo_url": "https://github.com/a/b.git",
+        "branch": "main",
+        "commits": 1234,
+        "bytes": 5 * 1024 ** 2,
+        "head": "0123456789abcdef",
+        "indexed_at": 1700000000,
+    }
+]
+
+
+@pytest.fixture
+def job_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, "JobManager", functools.partial(JobManager, directory=str(tmp_path)))
+    monkeypatch.setattr(cli, "POLL_INTERVAL", 0.01)
+
+
+class TestLoadManifest:
+
+    def test_json_strings_and_objects(self, tmp_path):
+        path = tmp_path / "repos.json"
+        path.write_text(json.dumps([
+            "https://github.com/a/b.git",
+            {"repo_url": "https://github.com/c/d.git", "branch": "dev", "depth": 0, "hunks": True},
+        ]))
+        entries = cli.load_manifest(str(path), DEFAULTS)
+        assert entries[0] == {**DEFAULTS, "repo_url": "https://github.com/a/b.git"}
+        assert entries[1] == {
+            **DEFAULTS, "repo_url": "https://github.com/c/d.git", "branch": "dev", "depth": 0, "hunks": True,
+        }
+
+    def test_text_lines_with_comments(self, tmp_path):
+        path = tmp_path / "repos.txt"
+        path.write_text(
+            "# nightly\n"
+            "https://github.com/a/b.git\n"
+            "\n"
+            "https://github.com/c/d.git release  # pinned\n"
+        )
+        entries = cli.load_manifest(str(path), DEFAULTS)
+        assert [(e["repo_url"], e["branch"]) for e in entries] == [
+            ("https://github.com/a/b.git", None),
+            ("https://github.com/c/d.git", "release"),
+        ]
+
+
+class TestIndex:
+
+    def test_indexes_every_repo(self, job_dir, monkeypatch, capsys):
+        calls = []
+
+        def runner(repo_url, commit_limit, on_status, on_progress, **kwargs):
+            calls.append((repo_url, commit_limit, kwargs["branch"], kwargs["incremental"]))
+            on_status("info", "⛏️ Mining & indexing commits...")
+            on_progress(0.5)
+            on_status("success", "✅ Ready!")
+            return True
+
+        monkeypatch.setattr(cli, "run_indexing", runner)
+        code = cli.main(["index", "https://github.com/a/b.git", "https://github.com/c/d.git",
+                         "--depth", "100", "--branch", "main", "--full"])
+
+        assert code == 0
+        assert sorted(calls) == [
+            ("https://github.com/a/b.git", 100, "main", False),
+            ("https://github.com/c/d.git", 100, "main", False),
+        ]
+        out = capsys.readouterr().out
+        assert "[https://github.com/a/b.git@main] ✅ Ready!" in out
+        assert "2/2 repositories indexed." in out
+
+    def test_failure_sets_exit_status(self, job_dir, capsys):
+        def runner(repo_url, commit_limit, on_status, on_progress, **kwargs):
+            if "bad" in repo_url:
+                raise RuntimeError("boom")
+            return True
+
+        jobs = cli.index_repos(
+            [{**DEFAULTS, "repo_url": url} for url in ["https://github.com/a/ok.git", "https://github.com/a/bad.git"]],
+            workers=2,
+            runner=runner,
+        )
+        assert [job["state"] for job in jobs] == ["done", "failed"]
+        assert "boom" in capsys.readouterr().out
+
+    def test_nothing_to_index(self, capsys):
+        assert cli.main(["index"]) == 2
+
+
+class TestQuery:
+
+    def test_unindexed_repo(self, monkeypatch, capsys):
+        monkeypatch.setattr(cli, "list_indexed_repos", lambda: [])
+        assert cli.main(["query", "https://github.com/a/b.git", "why?"]) == 1
+        assert "not indexed" in capsys.readouterr().err
+
+    def test_json_lines(self, monkeypatch, capsys, caplog, tmp_path):
+        monkeypatch.setattr(cli, "list_indexed_repos", lambda: REPOS)
+        asked = []
+
+        def fake_answer(question, collection, *filters):
+            asked.append((question, collection, filters))
+            logging.getLogger("qa").info("timing log")
+            return {"question": question, "answer": f"because {question}", "ttft": 0.1}
+
+        monkeypatch.setattr(cli, "answer", fake_answer)
+        questions = tmp_path / "questions.txt"
+        questions.write_text("second?\n\nthird?\n")
+
+        code = cli.main(["-v", "query", "https://github.com/a/b.git", "first?", "--questions", str(questions),
+                         "--author", "Ann", "--since", "2024-01-01", "--json", "--jobs", "2"])
+        assert code == 0
+
+        captured = capsys.readouterr()
+        lines = [json.loads(line) for line in captured.out.splitlines()]
+        assert [line["question"] for line in lines] == ["first?", "second?", "third?"]
+        assert lines[0]["answer"] == "because first?"
+        assert "timing log" in caplog.text and "timing log" not in captured.out
+        assert asked[0][1] == REPOS[0]["name"]
+        assert asked[0][2] == ("Ann", "2024-01-01", None)
+
+
+class TestStats:
+
+    def test_table(self, monkeypatch, capsys):
+        monkeypatch.setattr(cli, "list_indexed_repos", lambda: REPOS)
+        assert cli.main(["stats"]) == 0
+        out = capsys.readouterr().out
+        assert "https://github.com/a/b.git@main" in out
+        assert "1234" in out and "5.0 MB" in out and "0123456789" in out
+        assert "0123456789a" not in out
+
+    def test_json(self, monkeypatch, capsys):
+        monkeypatch.setattr(cli, "list_indexed_repos", lambda: REPOS)
+        cli.main(["stats", "--json"])
+        assert json.loads(capsys.readouterr().out) == REPOS
+
+    def test_empty(self, monkeypatch, capsys):
+        monkeypatch.setattr(cli, "list_indexed_repos", lambda: [])
+        cli.main(["stats"])
+        assert "No repositories" in capsys.readouterr().out
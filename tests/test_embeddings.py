@@ -0,0 +1,145 @@
+"""
+Tests for embeddings.py
+
+Covers:
+- estimate_tokens() capping
+- token_budget() memory-aware sizing
+- plan_batches() padded token budgeting
+- EmbeddingCache keying, hit counters, LRU eviction and schema rebuilds
+"""
+
+import sqlite3
+import time
+import numpy as np
+
+from embeddings import (
+    EmbeddingCache,
+    document_key,
+    MAX_SEQ_TOKENS,
+    EMBED_TOKEN_BUDGET,
+    BYTES_PER_TOKEN,
+    EMBED_MEMORY_FRACTION,
+    estimate_tokens,
+    plan_batches,
+    token_budget,
+)
+
+
+def _commit(chars: int) -> dict:
+    return {"content": "x" * chars}
+
+
+class TestEstimateTokens:
+
+    def test_short_text_is_at_least_one_token(self):
+        assert estimate_tokens("") == 1
+
+    def test_long_text_is_capped_at_model_limit(self):
+        assert estimate_tokens("x" * 100_000) == MAX_SEQ_TOKENS
+
+
+class TestTokenBudget:
+
+    def test_unknown_memory_uses_default_budget(self, monkeypatch):
+        monkeypatch.setattr("embeddings.available_memory", lambda: None)
+        assert token_budget() == EMBED_TOKEN_BUDGET
+
+    def test_plenty_of_memory_uses_default_budget(self):
+        assert token_budget(memory=64 * 1024 ** 3) == EMBED_TOKEN_BUDGET
+
+    def test_tight_memory_shrinks_budget(self):
+        memory = int(1000 * BYTES_PER_TOKEN / EMBED_MEMORY_FRACTION)
+        assert token_budget(memory=memory) == 1000
+
+    def test_budget_always_fits_one_document(self):
+        assert token_budget(memory=1) == MAX_SEQ_TOKENS
+
+
+class TestPlanBatches:
+
+    def test_short_commits_share_large_batches(self):
+        commits = [_commit(40) for _ in range(1000)]  # ~10 tokens each
+        batches = list(plan_batches(commits, budget=2000))
+        assert [len(b) for b in batches] == [200] * 5
+
+    def test_long_commits_get_smaller_batches(self):
+        commits = [_commit(10_000) for _ in range(20)]  # capped at 256 tokens
+        batches = list(plan_batches(commits, budget=1024))
+        assert all(len(b) == 4 for b in batches)
+
+    def test_padding_counts_longest_document(self):
+        commits = [_commit(40)] * 3 + [_commit(10_000)]
+        batches = list(plan_batches(commits, budget=MAX_SEQ_TOKENS * 2))
+        # One long doc pads the whole batch to 256 tokens per row
+        assert [len(b) for b in batches] == [3, 1]
+
+    def test_oversized_document_still_gets_a_batch(self):
+        batches = list(plan_batches([_commit(10_000)], budget=1))
+        assert len(batches) == 1
+
+    def test_preserves_order_and_items(self):
+        commits = [{"content": "y" * (i * 37 % 900), "id": i} for i in range(300)]
+        batches = list(plan_batches(commits, budget=4096))
+        assert [c["id"] for b in batches for c in b] == list(range(300))
+
+
+class TestEmbeddingCache:
+
+    def _cache(self, tmp_path, **kwargs):
+        kwargs.setdefault("doc_version", 1)
+        kwargs.setdefault("model", "model-a")
+        return EmbeddingCache(str(tmp_path / "cache.sqlite"), **kwargs)
+
+    def test_round_trips_vectors(self, tmp_path):
+        cache = self._cache(tmp_path)
+        cache.put_many({"abc": [0.5, 0.25, -1.0]})
+        found = cache.get_many(["abc", "missing"])
+        assert list(found) == ["abc"]
+        assert np.allclose(found["abc"], [0.5, 0.25, -1.0])
+
+    def test_counts_hits_and_misses(self, tmp_path):
+        cache = self._cache(tmp_path)
+        cache.put_many({"abc": [1.0]})
+        cache.get_many(["abc", "def", "ghi"])
+        assert (cache.hits, cache.misses) == (1, 2)
+        assert cache.hit_rate == 1 / 3
+
+    def test_persists_across_instances(self, tmp_path):
+        self._cache(tmp_path).put_many({"abc": [1.0, 2.0]})
+        assert "abc" in self._cache(tmp_path).get_many(["abc"])
+
+    def test_keyed_by_model_and_doc_version(self, tmp_path):
+        self._cache(tmp_path).put_many({"abc": [1.0]})
+        assert self._cache(tmp_path, model="model-b").get_many(["abc"]) == {}
+        assert self._cache(tmp_path, doc_version=2).get_many(["abc"]) == {}
+
+    def test_old_schema_is_rebuilt(self, tmp_path):
+        conn = sqlite3.connect(tmp_path / "cache.sqlite")
+        conn.execute("CREATE TABLE embeddings (sha TEXT, doc_version INTEGER, model TEXT, vector BLOB)")
+        conn.execute("INSERT INTO embeddings VALUES ('abc', 1, 'model-a', x'0000803f')")
+        conn.commit()
+        conn.close()
+
+        cache = self._cache(tmp_path)
+        assert cache.get_many(["abc"]) == {}
+        cache.put_many({"abc": [1.0]})
+        assert "abc" in self._cache(tmp_path).get_many(["abc"])
+
+    def test_document_key_follows_content(self):
+        assert document_key("Commit: abc\n") == document_key("Commit: abc\n")
+        assert document_key("Commit: abc\n") != document_key("Commit: abc\n(more history)")
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        # Each 4-float vector is 16 bytes; budget fits three of them
+        cache = self._cache(tmp_path, max_bytes=48)
+        cache.put_many({"a": [0.0] * 4, "b": [0.0] * 4})
+        time.sleep(0.01)
+        cache.put_many({"c": [0.0] * 4})
+        time.sleep(0.01)
+        cache.get_many(["a"])  # "a" is now more recent than "b"
+        time.sleep(0.01)
+        cache.put_many({"d": [0.0] * 4})
+
+        remaining = set(cache.get_many(["a", "b", "c", "d"]))
+        assert "b" not in remaining
+        assert {"a", "d"} <= remaining
@@ -0,0 +1,217 @@
+"""
+Tests for facts.py
+
+Covers:
+- commit_facts() rows, including commits that touch no files
+- FactWriter / load_facts() parquet round trip, reload on new parts and
+  rows written again by a rerun after a failed incremental run
+- plan_aggregation() parsing of group-by, sort, path, time window, top N
+  and a named author
+- aggregate() results and filters
+- aggregation latency over 100k commits
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from facts import (
+    FACT_COLUMNS,
+    FactWriter,
+    aggregate,
+    commit_facts,
+    format_table,
+    load_facts,
+    plan_aggregation,
+)
+
+NOW = datetime(2025, 6, 1)
+
+
+def _commit(sha, author, when, files):
+    return {
+        "hash": sha,
+        "author": author,
+        "timestamp": int(when.timestamp()),
+        "files": [{"path": p, "added": a, "removed": r} for p, a, r in files],
+    }
+
+
+COMMITS = [
+    _commit("s1", "alice", datetime(2024, 1, 10), [("auth/login.py", 10, 2), ("README.md", 1, 0)]),
+    _commit("s2", "bob", datetime(2024, 1, 20), [("auth/session.py", 5, 5)]),
+    _commit("s3", "bob", datetime(2024, 2, 5), [("auth/login.py", 1, 1)]),
+    _commit("s4", "bob", datetime(2024, 3, 1), [("api/routes.py", 40, 0)]),
+    _commit("s5", "carol", datetime(2025, 3, 1), [("auth/login.py", 2, 2)]),
+    _commit("s6", "alice", datetime(2025, 4, 1), []),
+]
+
+
+@pytest.fixture
+def facts():
+    return pd.DataFrame(commit_facts(COMMITS), columns=FACT_COLUMNS)
+
+
+def _spec(**overrides):
+    spec = {"group_by": "author", "sort_by": "commits", "path": None, "start_ts": None, "end_ts": None, "top": None}
+    spec.update(overrides)
+    return spec
+
+
+class TestCommitFacts:
+
+    def test_one_row_per_file(self):
+        rows = commit_facts(COMMITS[:1])
+        assert [r["path"] for r in rows] == ["auth/login.py", "README.md"]
+
+    def test_commit_without_files_keeps_a_row(self):
+        rows = commit_facts(COMMITS[-1:])
+        assert rows == [{"sha": "s6", "author": "alice", "timestamp": COMMITS[-1]["timestamp"],
+                         "path": None, "added": 0, "removed": 0}]
+
+
+class TestStore:
+
+    def test_round_trip(self, tmp_path):
+        writer = FactWriter(str(tmp_path))
+        writer.add(COMMITS)
+        writer.close()
+
+        loaded = load_facts(str(tmp_path))
+        assert len(loaded) == 7
+        assert set(loaded["sha"]) == {"s1", "s2", "s3", "s4", "s5", "s6"}
+
+    def test_reloads_when_parts_are_added(self, tmp_path):
+        writer = FactWriter(str(tmp_path), part_rows=1)
+        writer.add(COMMITS[:2])
+        assert len(load_facts(str(tmp_path))) == 3
+
+        writer.add(COMMITS[2:3])
+        assert len(load_facts(str(tmp_path))) == 4
+
+    def test_rerun_after_failed_incremental_run_counts_once(self, tmp_path):
+        base = FactWriter(str(tmp_path))
+        base.add(COMMITS[:2])
+        base.close()
+
+        # Fails after flushing part of the new commits, then is redone in full
+        failed = FactWriter(str(tmp_path), part_rows=1)
+        failed.add(COMMITS[2:4])
+        rerun = FactWriter(str(tmp_path))
+        rerun.add(COMMITS[2:])
+        rerun.close()
+
+        table = aggregate(load_facts(str(tmp_path)), _spec())
+        bob = table[table["author"] == "bob"].iloc[0]
+        assert (bob["commits"], bob["added"], bob["removed"]) == (3, 46, 6)
+
+    def test_missing_directory(self, tmp_path):
+        assert load_facts(str(tmp_path / "nope")) is None
+
+
+class TestPlanAggregation:
+
+    def test_who_touched_a_directory_the_most_last_year(self):
+        spec = plan_aggregation("who touched `auth/` the most last year?", now=NOW)
+        assert spec["group_by"] == "author"
+        assert spec["path"] == "auth/"
+        assert spec["start_ts"] == int((NOW - timedelta(days=365)).timestamp())
+
+    def test_commits_per_month(self):
+        spec = plan_aggregation("how many commits per month?", now=NOW)
+        assert spec["group_by"] == "month"
+        assert spec["path"] is None and spec["start_ts"] is None
+
+    def test_top_files_by_churn_in_a_year(self):
+        spec = plan_aggregation("top 5 files by churn in 2023", now=NOW)
+        assert spec["group_by"] == "path"
+        assert spec["sort_by"] == "churn"
+        assert spec["top"] == 5
+        assert datetime.fromtimestamp(spec["start_ts"]) == datetime(2023, 1, 1)
+        assert datetime.fromtimestamp(spec["end_ts"]) == datetime(2023, 12, 31, 23, 59, 59)
+
+    def test_named_author(self):
+        spec = plan_aggregation("How many commits did bob make?", now=NOW, authors=["alice", "bob", "carol"])
+        assert spec["author"] == "bob"
+        assert plan_aggregation("How many commits per author?", now=NOW, authors=["alice", "bob"])["author"] is None
+
+    def test_author_named_by_part_of_their_name(self):
+        authors = ["Bob Smith", "Alice Smith", "Carol Jones"]
+        assert plan_aggregation("what did Jones change in 2024", authors=authors)["author"] == "Carol Jones"
+        # "smith" is ambiguous, the full name is not
+        assert plan_aggregation("lines added by smith", authors=authors)["author"] is None
+        assert plan_aggregation("lines added by alice smith", authors=authors)["author"] == "Alice Smith"
+
+    def test_directories_by_lines_added(self):
+        spec = plan_aggregation("which directories had the most lines added in the last 6 months", now=NOW)
+        assert spec["group_by"] == "directory"
+        assert spec["sort_by"] == "added"
+
+
+class TestAggregate:
+
+    def test_top_authors_by_commits(self, facts):
+        table = aggregate(facts, _spec())
+        assert list(table["author"]) == ["bob", "alice", "carol"]
+        assert list(table["commits"]) == [3, 2, 1]
+
+    def test_path_prefix(self, facts):
+        table = aggregate(facts, _spec(path="auth/"))
+        assert dict(zip(table["author"], table["commits"])) == {"bob": 2, "alice": 1, "carol": 1}
+
+    def test_exact_file(self, facts):
+        table = aggregate(facts, _spec(group_by="path", path="auth/login.py"))
+        assert list(table["path"]) == ["auth/login.py"]
+        assert table["commits"][0] == 3
+
+    def test_churn_per_directory(self, facts):
+        table = aggregate(facts, _spec(group_by="directory", sort_by="churn"))
+        assert list(table["directory"]) == ["api", "auth", "."]
+        assert list(table["churn"]) == [40, 28, 1]
+
+    def test_commits_per_month_in_time_order(self, facts):
+        table = aggregate(facts, _spec(group_by="month"))
+        assert list(table["month"]) == ["2024-01", "2024-02", "2024-03", "2025-03", "2025-04"]
+        assert list(table["commits"]) == [2, 1, 1, 1, 1]
+
+    def test_ui_filters_apply(self, facts):
+        table = aggregate(facts, _spec(), author="alice", start_ts=int(datetime(2025, 1, 1).timestamp()))
+        assert list(table["commits"]) == [1]
+
+    def test_named_author_outside_the_top_n(self, facts):
+        spec = plan_aggregation("How many commits did carol make?", authors=list(facts["author"].unique()))
+        table = aggregate(facts, {**spec, "top": 1})
+        assert table.to_dict("records") == [
+            {"author": "carol", "commits": 1, "added": 2, "removed": 2, "churn": 4},
+        ]
+
+    def test_format_table(self, facts):
+        text = format_table(aggregate(facts, _spec(top=1)))
+        assert text.splitlines() == ["author | commits | added | removed | churn", "bob | 3 | 46 | 6 | 52"]
+
+
+class TestLatency:
+
+    def test_100k_commits_under_a_second(self):
+        rng = np.random.default_rng(0)
+        n = 300_000  # ~3 files per commit across 100k commits
+        facts = pd.DataFrame({
+            "sha": rng.integers(0, 100_000, n).astype(str),
+            "author": pd.Categorical(rng.integers(0, 200, n).astype(str)),
+            "timestamp": rng.integers(1_400_000_000, 1_750_000_000, n),
+            "path": pd.Series([f"dir{d}/file{f}.py" for d, f in zip(rng.integers(0, 50, n), rng.integers(0, 40, n))]),
+            "added": rng.integers(0, 50, n),
+            "removed": rng.integers(0, 50, n),
+        })
+
+        start = time.perf_counter()
+        for spec in (
+            _spec(),
+            _spec(group_by="month"),
+            _spec(group_by="directory", sort_by="churn", path="dir7/"),
+        ):
+            aggregate(facts, spec)
+        assert (time.perf_counter() - start) / 3 < 1.0
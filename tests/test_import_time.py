@@ -0,0 +1,91 @@
+"""
+Import-time budget for the Streamlit landing page.
+
+app.py's top-level imports run before the first page renders (and on
+every cold start), so they must stay away from the heavy dependencies.
+These are imported in a fresh interpreter under `python -X importtime`;
+`pytest tests/test_import_time.py -s` prints the slowest modules.
+
+Covers:
+- none of the heavy dependencies are imported by the landing page
+- the landing page's imports stay within IMPORT_BUDGET_MS
+"""
+
+import ast
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time allowed for app.py's top-level imports (about
+# 200 ms today; the rest is headroom for slower machines)
+IMPORT_BUDGET_MS = 800
+# Fresh interpreters measured; the fastest run counts
+RUNS = 3
+# Only loaded on first use: indexing, questions, PDF export
+HEAVY_MODULES = [
+    "chromadb",
+    "fpdf",
+    "onnxruntime",
+    "openai",
+    "pandas",
+    "sentence_transformers",
+    "tokenizers",
+    "torch",
+    "transformers",
+]
+# Third-party UI framework, timed by Streamlit itself rather than us
+EXCLUDED = {"streamlit"}
+
+
+def landing_imports() -> list[str]:
+    """Modules app.py imports at top level."""
+    with open(os.path.join(ROOT, "app.py")) as f:
+        tree = ast.parse(f.read())
+
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            modules.append(node.module)
+    return [m for m in dict.fromkeys(modules) if m.split(".")[0] not in EXCLUDED]
+
+
+def measure(modules: list[str]) -> tuple[float, dict, set]:
+    """(total ms, {module: cumulative ms}, modules loaded) for importing `modules` afresh."""
+    code = f"import sys; {'; '.join(f'import {m}' for m in modules)}; print(' '.join(sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+
+    cumulative = {}
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        ms = int(cumulative_us) / 1000
+        cumulative[name.strip()] = ms
+        if not name.startswith("  "):
+            # Top-level entries; nested ones are already in their parent's time
+            total += ms
+    return total, cumulative, set(result.stdout.split())
+
+
+def test_landing_page_skips_heavy_dependencies():
+    _, _, loaded = measure(landing_imports())
+    assert sorted(m for m in HEAVY_MODULES if m in loaded) == []
+
+
+def test_landing_page_import_budget():
+    modules = landing_imports()
+    total, cumulative, _ = min((measure(modules) for _ in range(RUNS)), key=lambda run: run[0])
+
+    slowest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:10]
+    print(f"\nLanding page imports: {total:.0f} ms (budget {IMPORT_BUDGET_MS} ms)")
+    for name, ms in slowest:
+        print(f"  {ms:8.1f} ms  {name.strip()}")
+    assert total <= IMPORT_BUDGET_MS
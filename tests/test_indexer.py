@@ -0,0 +1,381 @@
+"""
+Tests for indexer.py
+
+Covers:
+- collection_name() per-repository namespacing
+- the repository registry, its cross-process lock and LRU eviction under
+  CHROMA_DISK_BUDGET
+- one shared ChromaDB client per process, per-collection locks across
+  processes and reopening the client after another process writes
+- progress reported before the first write batch is flushed
+- run_indexing's incremental refresh: up-to-date HEAD, rewritten history,
+  failed rebuilds and incremental runs, summed counts, the mirror lease
+"""
+
+import os
+import subprocess
+import sys
+import time
+import types
+import git
+import pytest
+
+import indexer
+import mirrors
+
+
+class FakeClient:
+    """Records deleted collections instead of touching disk."""
+
+    deleted = []
+    created = 0
+    cleared = 0
+
+    def __init__(self, path=None):
+        FakeClient.created += 1
+
+    @classmethod
+    def clear_system_cache(cls):
+        FakeClient.cleared += 1
+
+    def delete_collection(self, name):
+        FakeClient.deleted.append(name)
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.setattr(indexer, "CHROMA_PATH", str(tmp_path))
+    monkeypatch.setitem(sys.modules, "chromadb", types.SimpleNamespace(PersistentClient=FakeClient))
+    FakeClient.deleted = []
+    FakeClient.created = 0
+    FakeClient.cleared = 0
+    monkeypatch.setattr(indexer, "_seen", {})
+    return tmp_path
+
+
+# ── collection_name ────────────────────────────────────────────────────────────
+
+class TestCollectionName:
+
+    def test_equivalent_urls_share_a_collection(self):
+        a = indexer.collection_name("https://github.com/Owner/Repo.git")
+        b = indexer.collection_name("https://token@GitHub.com/Owner/Repo/")
+        assert a == b
+
+    def test_different_repos_differ(self):
+        assert indexer.collection_name("https://github.com/a/one") != indexer.collection_name("https://github.com/a/two")
+
+    def test_branch_is_part_of_the_name(self):
+        url = "https://github.com/owner/repo"
+        assert indexer.collection_name(url) != indexer.collection_name(url, "develop")
+
+    def test_name_is_valid_for_chromadb(self):
+        name = indexer.collection_name("https://github.com/some-org/" + "x" * 200 + ".git", "feature/foo")
+        assert 3 <= len(name) <= 63
+        assert name[0].isalnum() and name[-1].isalnum()
+        assert all(c.isalnum() or c in "-_." for c in name)
+
+
+# ── registry & eviction ────────────────────────────────────────────────────────
+
+class TestRegistry:
+
+    def test_list_indexed_repos_most_recent_first(self, registry):
+        indexer._save_index_state({
+            "old": {"repo_url": "https://a", "last_used": 1},
+            "new": {"repo_url": "https://b", "last_used": 2},
+        })
+        assert [r["name"] for r in indexer.list_indexed_repos()] == ["new", "old"]
+
+    def test_touch_updates_last_used(self, registry):
+        indexer._save_index_state({"repo": {"last_used": 0}})
+        indexer._touch("repo")
+        assert indexer._load_index_state()["repo"]["last_used"] > 0
+
+    def test_touch_skips_recent_entries(self, registry):
+        indexer._save_index_state({"repo": {"last_used": time.time() - 1}})
+        mtime = os.stat(os.path.join(indexer.CHROMA_PATH, indexer.INDEX_STATE_FILE)).st_mtime_ns
+        indexer._touch("repo")
+        assert os.stat(os.path.join(indexer.CHROMA_PATH, indexer.INDEX_STATE_FILE)).st_mtime_ns == mtime
+
+    def test_state_writes_exclude_other_processes(self, registry):
+        # A second process can't take the registry lock while we hold it
+        probe = (
+            "import fcntl, sys; f = open(sys.argv[1], 'w')\n"
+            "try: fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)\n"
+            "except OSError: sys.exit(1)"
+        )
+        lock_path = os.path.join(indexer.CHROMA_PATH, indexer.INDEX_STATE_FILE + ".lock")
+        with indexer._state_locked(), indexer._state_locked():
+            assert subprocess.run([sys.executable, "-c", probe, lock_path]).returncode == 1
+        assert subprocess.run([sys.executable, "-c", probe, lock_path]).returncode == 0
+
+    def test_evicts_least_recently_used_until_under_budget(self, registry, monkeypatch):
+        monkeypatch.setattr(indexer, "CHROMA_DISK_BUDGET", 250)
+        indexer._save_index_state({
+            "oldest": {"bytes": 100, "last_used": 1},
+            "older": {"bytes": 100, "last_used": 2},
+            "recent": {"bytes": 100, "last_used": 3},
+        })
+
+        evicted = indexer._evict_collections(keep="recent")
+
+        assert evicted == ["oldest"]
+        assert FakeClient.deleted == ["oldest", "oldest_hunks"]
+        assert set(indexer._load_index_state()) == {"older", "recent"}
+
+    def test_never_evicts_the_kept_collection(self, registry, monkeypatch):
+        monkeypatch.setattr(indexer, "CHROMA_DISK_BUDGET", 10)
+        indexer._save_index_state({
+            "current": {"bytes": 100, "last_used": 1},
+            "other": {"bytes": 100, "last_used": 2},
+        })
+
+        assert indexer._evict_collections(keep="current") == ["other"]
+        assert set(indexer._load_index_state()) == {"current"}
+
+    def test_nothing_evicted_within_budget(self, registry):
+        indexer._save_index_state({"a": {"bytes": 1, "last_used": 1}})
+        assert indexer._evict_collections(keep="a") == []
+        assert FakeClient.deleted == []
+
+
+class TestSharedClient:
+
+    def test_client_is_built_once(self, registry):
+        indexer._save_index_state({"repo": {"bytes": 10, "last_used": 1}})
+        for _ in range(3):
+            indexer._evict_collections(keep="repo")
+        assert indexer._get_client() is indexer._get_client()
+        assert FakeClient.created == 1
+
+    def test_reads_exclude_writers_in_other_processes(self, registry):
+        probe = (
+            "import fcntl, os, sys; fd = os.open(sys.argv[1], os.O_RDWR)\n"
+            "try: fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)\n"
+            "except OSError: sys.exit(1)"
+        )
+        lock_path = os.path.join(indexer.CHROMA_PATH, indexer.LOCK_DIR, "repo.lock")
+        with indexer._chroma_locked("repo"):
+            assert subprocess.run([sys.executable, "-c", probe, lock_path]).returncode == 1
+        assert subprocess.run([sys.executable, "-c", probe, lock_path]).returncode == 0
+
+    def test_own_writes_keep_the_client(self, registry):
+        with indexer._chroma_locked("repo", write=True) as client:
+            pass
+        with indexer._chroma_locked("repo") as reader:
+            assert reader is client
+        assert FakeClient.created == 1
+
+    def test_write_by_another_process_reopens_the_client(self, registry):
+        with indexer._chroma_locked("repo") as client:
+            pass
+        with open(os.path.join(indexer.CHROMA_PATH, indexer.LOCK_DIR, "repo.lock"), "w") as f:
+            f.write("elsewhere")
+
+        with indexer._chroma_locked("repo") as reopened:
+            assert reopened is not client
+        with indexer._chroma_locked("repo") as reader:
+            assert reader is reopened
+        assert (FakeClient.created, FakeClient.cleared) == (2, 1)
+
+
+# ── _index_commits ─────────────────────────────────────────────────────────────
+
+class FakeCollection:
+
+    def __init__(self):
+        self.upserted = []
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.upserted += ids
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """A local repository with three commits to main.py."""
+    repo = git.Repo.init(tmp_path / "repo")
+    repo.config_writer().set_value("user", "name", "Test User").release()
+    repo.config_writer().set_value("user", "email", "test@example.com").release()
+    for i in range(3):
+        _commit(repo, f"timeout = {i}\n", f"Set timeout to {i}")
+    return str(tmp_path / "repo")
+
+
+def _commit(repo, content: str, message: str) -> str:
+    with open(os.path.join(repo.working_tree_dir, "main.py"), "w") as f:
+        f.write(content)
+    repo.index.add(["main.py"])
+    return repo.index.commit(message).hexsha
+
+
+class TestIndexCommits:
+
+    @pytest.fixture
+    def index(self, repo, tmp_path, monkeypatch):
+        """Runs _index_commits on `repo` with fake ChromaDB and model; returns (embedded texts, progress)."""
+        collection = FakeCollection()
+        client = types.SimpleNamespace(
+            get_or_create_collection=lambda name, embedding_function: collection,
+            delete_collection=lambda name: None,
+        )
+        embedded = []
+
+        def embed_documents(model, docs):
+            embedded.extend(docs)
+            return [[0.0, 1.0] for _ in docs]
+
+        monkeypatch.setattr(indexer, "CHROMA_PATH", str(tmp_path / "chroma"))
+        monkeypatch.setattr(indexer, "EMBEDDING_CACHE_PATH", str(tmp_path / "cache.sqlite"))
+        monkeypatch.setattr(indexer, "MINE_WORKERS", 1)
+        monkeypatch.setattr(indexer, "PROGRESS_INTERVAL", 0.0)
+        monkeypatch.setattr(indexer, "_get_client", lambda: client)
+        monkeypatch.setattr(indexer, "_get_embedding_function", lambda: None)
+        monkeypatch.setattr(indexer, "get_model", lambda: None)
+        monkeypatch.setattr(indexer, "embed_documents", embed_documents)
+
+        def run():
+            embedded.clear()
+            progress = []
+            total, _, _ = indexer._index_commits(
+                "repo", repo, 100,
+                on_status=lambda level, message: None,
+                on_progress=lambda fraction: progress.append((fraction, len(collection.upserted))),
+            )
+            assert total == 3
+            return list(embedded), progress
+
+        return run
+
+    def test_progress_before_first_flush(self, index):
+        _, progress = index()
+        # Fewer commits than WRITE_BATCH_SIZE: one flush at the end, progress before it
+        assert progress and progress[0] == (0.03, 0)
+
+    def test_changed_documents_are_re_embedded(self, index, monkeypatch):
+        assert len(index()[0]) == 3
+        assert index()[0] == []
+
+        load = indexer.load_git_history
+
+        def deepened(*args, **kwargs):
+            for commit in load(*args, **kwargs):
+                if "First commit" in commit["content"]:
+                    commit["content"] = commit["content"].replace("First commit — no parent diffs", "timeout = 0")
+                yield commit
+
+        monkeypatch.setattr(indexer, "load_git_history", deepened)
+        embedded, _ = index()
+        assert len(embedded) == 1 and "timeout = 0" in embedded[0]
+
+
+# ── run_indexing: incremental refresh ──────────────────────────────────────────
+
+URL = "https://github.com/a/repo.git"
+
+
+class FakeIndexRun:
+    """Stands in for _index_commits: records each run's `since`, then adds 2 commits of 50 bytes or fails."""
+
+    def __init__(self):
+        self.since = []
+        self.fail = False
+
+    def __call__(self, name, repo_path, commit_limit, on_status, on_progress, branch=None, since=None, hunks=False):
+        self.since.append(since)
+        if self.fail:
+            raise RuntimeError("embedding failed")
+        return 2, 50, []
+
+
+class TestRunIndexing:
+
+    @pytest.fixture
+    def indexing(self, repo, registry, monkeypatch):
+        """run_indexing on `repo` with the network, ChromaDB and _index_commits faked."""
+        run = FakeIndexRun()
+        client = types.SimpleNamespace(get_collection=lambda name: None, delete_collection=FakeClient.deleted.append)
+        monkeypatch.setattr(indexer, "_validate_repo", lambda *args: True)
+        monkeypatch.setattr(indexer, "_update_mirror", lambda *args, **kwargs: repo)
+        monkeypatch.setattr(indexer, "_get_client", lambda: client)
+        monkeypatch.setattr(indexer, "_index_commits", run)
+        return run
+
+    @staticmethod
+    def _index(**kwargs) -> dict:
+        assert indexer.run_indexing(URL, 100, incremental=True, on_status=lambda *args: None, **kwargs)
+        return indexer._load_index_state()[indexer.collection_name(URL)]
+
+    @staticmethod
+    def _indexed_at(head: str, **fields) -> None:
+        indexer._save_index_state({indexer.collection_name(URL): {
+            "head": head, "commit_limit": 100, "hunks": False, "commits": 10, "bytes": 1000, **fields,
+        }})
+
+    def test_up_to_date_head_skips_indexing(self, indexing, repo):
+        self._indexed_at(git.Repo(repo).head.commit.hexsha)
+        progress = []
+        assert indexer.run_indexing(URL, 100, incremental=True, on_status=lambda *args: None,
+                                    on_progress=progress.append)
+        assert indexing.since == [] and progress == [1.0]
+
+    def test_new_commits_are_added_to_the_counts(self, indexing, repo):
+        base = git.Repo(repo).head.commit.hexsha
+        self._indexed_at(base)
+        head = _commit(git.Repo(repo), "timeout = 9\n", "Set timeout to 9")
+
+        state = self._index()
+        assert indexing.since == [base]
+        assert (state["head"], state["commits"], state["bytes"]) == (head, 12, 1050)
+
+    @pytest.mark.parametrize("rewritten", [True, False], ids=["rewritten", "unknown-base"])
+    def test_diverged_history_is_rebuilt(self, indexing, repo, rewritten):
+        r = git.Repo(repo)
+        if rewritten:
+            # The old HEAD still exists but is no longer an ancestor
+            old = _commit(r, "timeout = 9\n", "Set timeout to 9")
+            r.git.reset("--hard", "HEAD~1")
+            _commit(r, "timeout = 8\n", "Set timeout to 8")
+        else:
+            old = "f" * 40
+        self._indexed_at(old)
+
+        state = self._index()
+        assert indexing.since == [None]
+        assert (state["commits"], state["bytes"]) == (2, 50)
+
+    def test_mirror_is_leased_while_indexing(self, indexing, monkeypatch):
+        leased = []
+
+        def index_commits(*args, **kwargs):
+            leased.append(mirrors._leased(mirrors.mirror_path(URL)))
+            return indexing(*args, **kwargs)
+
+        monkeypatch.setattr(indexer, "_index_commits", index_commits)
+
+        self._index()
+        assert leased == [True]
+        assert not mirrors._leased(mirrors.mirror_path(URL))
+
+    def test_failed_rebuild_is_forgotten(self, indexing, registry):
+        name = indexer.collection_name(URL)
+        indexer.sidecar_path(name, "lexical.sqlite")
+        self._indexed_at("f" * 40)
+        indexing.fail = True
+
+        with pytest.raises(RuntimeError):
+            self._index()
+        assert indexer._load_index_state() == {}
+        assert name in FakeClient.deleted
+        assert not os.path.exists(os.path.join(indexer.CHROMA_PATH, indexer.SIDECAR_DIR, name))
+
+    def test_failed_incremental_run_keeps_the_old_state(self, indexing, repo):
+        base = git.Repo(repo).head.commit.hexsha
+        self._indexed_at(base)
+        _commit(git.Repo(repo), "timeout = 9\n", "Set timeout to 9")
+        indexing.fail = True
+
+        with pytest.raises(RuntimeError):
+            self._index()
+        assert indexer._load_index_state()[indexer.collection_name(URL)]["head"] == base
+        assert FakeClient.deleted == []
@@ -0,0 +1,190 @@
+"""
+Tests for jobs.py
+
+Covers:
+- jobs run off the calling thread with persisted progress records
+- duplicate requests for one repository coalesced into one job
+- the concurrency limit
+- cancellation of queued and running jobs
+- jobs left running by a previous process marked as interrupted, while
+  those of another live process or another manager in this process
+  sharing the directory are left alone
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import pytest
+
+import jobs
+from jobs import JobManager
+
+
+class FakeRun:
+    """Stands in for run_indexing: reports progress in steps until released."""
+
+    def __init__(self, steps: int = 5, delay: float = 0.02):
+        self.steps = steps
+        self.delay = delay
+        self.release = threading.Event()
+        self.running = 0
+        self.peak = 0
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, repo_url, commit_limit, on_status, on_progress, **kwargs):
+        with self._lock:
+            self.calls.append(repo_url)
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            on_status("info", "⛏️ Mining & indexing commits...")
+            self.release.wait(5)
+            for i in range(self.steps):
+                time.sleep(self.delay)
+                on_progress((i + 1) / self.steps)
+            on_status("success", "✅ Ready!")
+            return True
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def _wait(manager, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id)
+        if job["state"] not in jobs.ACTIVE_STATES:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {manager.get(job_id)['state']}")
+
+
+@pytest.fixture
+def run():
+    return FakeRun()
+
+
+@pytest.fixture
+def manager(tmp_path, run):
+    manager = JobManager(workers=2, directory=str(tmp_path), runner=run)
+    yield manager
+    run.release.set()
+    manager.shutdown()
+
+
+class TestJobManager:
+
+    def test_runs_in_background_and_persists_progress(self, manager, run, tmp_path):
+        job_id = manager.submit("https://github.com/a/one", 100, token="secret")
+        assert manager.get(job_id)["state"] in jobs.ACTIVE_STATES
+
+        run.release.set()
+        job = _wait(manager, job_id)
+
+        assert job["state"] == jobs.DONE
+        assert job["progress"] == 1.0
+        assert job["message"] == "✅ Ready!"
+        with open(tmp_path / f"{job_id}.json") as f:
+            on_disk = json.load(f)
+        assert on_disk["state"] == jobs.DONE
+        assert "secret" not in json.dumps(on_disk)
+
+    def test_duplicate_requests_are_coalesced(self, manager, run):
+        first = manager.submit("https://github.com/a/one", 100)
+        again = manager.submit("https://github.com/a/one.git", 100)
+        other_branch = manager.submit("https://github.com/a/one", 100, branch="dev")
+
+        assert again == first
+        assert other_branch != first
+        run.release.set()
+        _wait(manager, first)
+        _wait(manager, other_branch)
+        assert len(run.calls) == 2
+
+    def test_resubmitting_after_completion_starts_a_new_job(self, manager, run):
+        run.release.set()
+        first = manager.submit("https://github.com/a/one", 100)
+        _wait(manager, first)
+        assert manager.submit("https://github.com/a/one", 100) != first
+
+    def test_concurrency_limit(self, manager, run):
+        ids = [manager.submit(f"https://github.com/a/repo{i}", 100) for i in range(4)]
+        time.sleep(0.1)
+        states = [manager.get(job_id)["state"] for job_id in ids]
+        assert states.count(jobs.RUNNING) == 2 and states.count(jobs.QUEUED) == 2
+
+        run.release.set()
+        for job_id in ids:
+            assert _wait(manager, job_id)["state"] == jobs.DONE
+        assert run.peak == 2
+
+    def test_cancel_running_job(self, manager, run):
+        job_id = manager.submit("https://github.com/a/one", 100)
+        time.sleep(0.05)
+        assert manager.cancel(job_id)
+        run.release.set()
+
+        job = _wait(manager, job_id)
+        assert job["state"] == jobs.CANCELLED
+        assert job["progress"] < 1.0
+
+    def test_cancel_queued_job_never_runs(self, manager, run):
+        ids = [manager.submit(f"https://github.com/a/repo{i}", 100) for i in range(3)]
+        time.sleep(0.05)
+        assert manager.cancel(ids[2])
+        run.release.set()
+
+        assert _wait(manager, ids[2])["state"] == jobs.CANCELLED
+        assert "https://github.com/a/repo2" not in run.calls
+        assert not manager.cancel(ids[2])
+
+    def test_failure_is_recorded(self, tmp_path):
+        def broken(*args, **kwargs):
+            raise RuntimeError("disk full")
+
+        manager = JobManager(directory=str(tmp_path), runner=broken)
+        job = _wait(manager, manager.submit("https://github.com/a/one", 100))
+        manager.shutdown()
+        assert job["state"] == jobs.FAILED
+        assert "disk full" in job["message"]
+
+    def test_restart_marks_unfinished_jobs_interrupted(self, tmp_path, run):
+        # Our own pid under an owner token no manager here holds: the pid
+        # was recycled from a process that has exited
+        with open(tmp_path / "stale.json", "w") as f:
+            json.dump({"id": "stale", "pid": os.getpid(), "owner": "gone", "state": jobs.RUNNING,
+                       "created": time.time()}, f)
+
+        manager = JobManager(directory=str(tmp_path), runner=run)
+        assert manager.get("stale")["state"] == jobs.FAILED
+        assert "Interrupted" in manager.get("stale")["message"]
+        manager.shutdown()
+
+    def test_second_manager_leaves_running_jobs_of_first(self, tmp_path, run):
+        first = JobManager(directory=str(tmp_path), runner=run)
+        job_id = first.submit("https://github.com/a/one", 100)
+        time.sleep(0.05)
+
+        second = JobManager(directory=str(tmp_path), runner=run)
+        assert second.get(job_id)["state"] == jobs.RUNNING
+
+        run.release.set()
+        first.shutdown()
+        assert second.get(job_id)["state"] == jobs.DONE
+        second.shutdown()
+
+    def test_restart_leaves_live_processes_jobs(self, tmp_path, run):
+        exited = subprocess.Popen([sys.executable, "-c", "pass"])
+        exited.wait()
+        for job_id, pid in [("live", os.getppid()), ("dead", exited.pid)]:
+            with open(tmp_path / f"{job_id}.json", "w") as f:
+                json.dump({"id": job_id, "pid": pid, "state": jobs.RUNNING, "created": time.time()}, f)
+
+        manager = JobManager(directory=str(tmp_path), runner=run)
+        assert manager.get("live")["state"] == jobs.RUNNING
+        assert manager.get("dead")["state"] == jobs.FAILED
+        manager.shutdown()
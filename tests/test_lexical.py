@@ -0,0 +1,97 @@
+"""
+Tests for lexical.py
+
+Covers:
+- tokenize() identifier, ticket ID and path handling; identifiers()
+- LexicalIndex BM25 ranking, filters, sha-prefix lookup and re-indexing
+- reciprocal_rank_fusion() merging
+"""
+
+import pytest
+
+from lexical import LexicalIndex, identifiers, reciprocal_rank_fusion, tokenize
+
+
+def _commit(sha: str, message: str, author: str = "alice", timestamp: int = 1_700_000_000) -> dict:
+    return {
+        "hash": sha,
+        "author": author,
+        "timestamp": timestamp,
+        "content": f"Commit: {sha}\nAuthor: {author}\nMessage: {message}\n",
+    }
+
+
+@pytest.fixture
+def index(tmp_path):
+    idx = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+    idx.add([
+        _commit("a" * 40, "Raise MAX_RETRIES for flaky uploads", timestamp=100),
+        _commit("b" * 40, "Fix PROJ-123 crash in auth/login.py", author="bob", timestamp=200),
+        _commit("c" * 40, "Refactor parseConfig helper", timestamp=300),
+        _commit("d" * 40, "Update docs for uploads", author="bob", timestamp=400),
+    ])
+    yield idx
+    idx.close()
+
+
+class TestTokenize:
+
+    def test_identifier_kept_whole_and_split(self):
+        tokens = tokenize("MAX_RETRIES = 3")
+        assert "max_retries" in tokens
+        assert "max" in tokens and "retries" in tokens
+
+    def test_camel_case_is_split(self):
+        assert {"parseconfig", "parse", "config"} <= set(tokenize("parseConfig()"))
+
+    def test_ticket_id_is_one_token(self):
+        assert "proj-123" in tokenize("Fixes PROJ-123.")
+
+    def test_path_components(self):
+        assert {"auth", "login", "py"} <= set(tokenize("auth/login.py"))
+
+    def test_identifiers(self):
+        assert identifiers("Why did `retry()` in upload.py drop MAX_RETRIES for PROJ-12 in 3f9a2c1?") == [
+            "3f9a2c1", "max_retries", "proj-12", "retry()", "upload.py",
+        ]
+        assert identifiers("Why was the retry logic removed?") == []
+
+
+class TestLexicalIndex:
+
+    def test_exact_identifier_ranks_first(self, index):
+        assert index.search("MAX_RETRIES")[0] == "a" * 40
+
+    def test_ticket_id_lookup(self, index):
+        assert index.search("what happened in PROJ-123?")[0] == "b" * 40
+
+    def test_sha_prefix_resolves_directly(self, index):
+        assert index.search("explain commit ccccccc")[0] == "c" * 40
+
+    def test_author_filter(self, index):
+        assert index.search("uploads", author="bob") == ["d" * 40]
+
+    def test_timestamp_filter(self, index):
+        assert index.search("uploads", start_ts=50, end_ts=150) == ["a" * 40]
+
+    def test_no_match_returns_empty(self, index):
+        assert index.search("kubernetes") == []
+
+    def test_k_limits_results(self, index):
+        assert len(index.search("uploads", k=1)) == 1
+
+    def test_re_adding_a_commit_replaces_its_postings(self, index):
+        index.add([_commit("a" * 40, "Rename the retry constant")])
+        assert len(index) == 4
+        assert "a" * 40 not in index.search("MAX_RETRIES")
+
+
+class TestReciprocalRankFusion:
+
+    def test_ids_in_both_lists_rank_first(self):
+        fused = reciprocal_rank_fusion([["x", "y", "z"], ["w", "y"]])
+        assert fused[0] == "y"
+        assert set(fused) == {"w", "x", "y", "z"}
+
+    def test_single_list_keeps_order(self):
+        assert reciprocal_rank_fusion([["a", "b", "c"]]) == ["a", "b", "c"]
@@ -0,0 +1,167 @@
+"""
+Tests for llm.py
+
+Covers:
+- chat() against a local OpenAI-compatible server (no Groq needed)
+- one pooled keep-alive connection reused across calls
+- retries on 429/5xx honouring Retry-After and rate-limit reset headers
+- no retry on other 4xx; timeouts; per-label latency metrics
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from openai import APITimeoutError, BadRequestError
+
+import llm
+
+
+class MockLLM(BaseHTTPRequestHandler):
+    """OpenAI-compatible /chat/completions that replays queued (status, headers) replies."""
+
+    protocol_version = "HTTP/1.1"
+    replies = []
+    requests = []
+    connections = set()
+    delay = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        MockLLM.requests.append(time.monotonic())
+        MockLLM.connections.add(self.client_address)
+        time.sleep(MockLLM.delay)
+
+        status, headers = MockLLM.replies.pop(0) if MockLLM.replies else (200, {})
+        if status == 200:
+            payload = {
+                "id": "c", "object": "chat.completion", "created": 0, "model": "mock",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "ok"},
+                    "finish_reason": "stop",
+                }],
+            }
+        else:
+            payload = {"error": {"message": "nope", "type": "error"}}
+
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    MockLLM.replies = []
+    MockLLM.requests = []
+    MockLLM.connections = set()
+    MockLLM.delay = 0.0
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockLLM)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(llm, "LLM_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setattr(llm, "LLM_BACKOFF_BASE", 0.01)
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    llm.metrics.clear()
+
+    yield MockLLM
+    llm.close_clients()
+    server.shutdown()
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+class TestChat:
+
+    def test_returns_completion(self, server):
+        response = llm.chat(MESSAGES)
+        assert response.choices[0].message.content == "ok"
+
+    def test_reuses_one_pooled_connection(self, server):
+        for _ in range(3):
+            llm.chat(MESSAGES)
+        assert len(server.requests) == 3
+        assert len(server.connections) == 1
+        assert llm.get_client() is llm.get_client()
+
+    def test_retries_server_errors(self, server):
+        server.replies = [(503, {}), (500, {})]
+        assert llm.chat(MESSAGES, label="rewrite").choices[0].message.content == "ok"
+        assert len(server.requests) == 3
+        assert llm.metrics.snapshot()["rewrite"]["retries"] == 2
+
+    def test_honours_retry_after(self, server):
+        server.replies = [(429, {"retry-after-ms": "300"})]
+        llm.chat(MESSAGES)
+        assert server.requests[1] - server.requests[0] >= 0.3
+
+    def test_waits_for_exhausted_rate_limit_reset(self, server):
+        server.replies = [(429, {
+            "x-ratelimit-remaining-requests": "10",
+            "x-ratelimit-reset-requests": "2m59.5s",
+            "x-ratelimit-remaining-tokens": "0",
+            "x-ratelimit-reset-tokens": "250ms",
+        })]
+        llm.chat(MESSAGES)
+        assert 0.25 <= server.requests[1] - server.requests[0] < 2
+
+    def test_gives_up_after_max_retries(self, server, monkeypatch):
+        monkeypatch.setattr(llm, "LLM_MAX_RETRIES", 2)
+        server.replies = [(502, {})] * 5
+        with pytest.raises(Exception):
+            llm.chat(MESSAGES, label="answer")
+        assert len(server.requests) == 3
+        assert llm.metrics.snapshot()["answer"]["failures"] == 1
+
+    def test_client_errors_are_not_retried(self, server):
+        server.replies = [(400, {})]
+        with pytest.raises(BadRequestError):
+            llm.chat(MESSAGES)
+        assert len(server.requests) == 1
+
+    def test_timeout(self, server, monkeypatch):
+        monkeypatch.setattr(llm, "LLM_TIMEOUT", 0.2)
+        monkeypatch.setattr(llm, "LLM_MAX_RETRIES", 0)
+        server.delay = 0.5
+        with pytest.raises(APITimeoutError):
+            llm.chat(MESSAGES)
+
+    def test_records_latency_per_label(self, server):
+        server.delay = 0.05
+        llm.chat(MESSAGES, label="classify")
+        llm.chat(MESSAGES, label="classify")
+        stats = llm.metrics.snapshot()["classify"]
+        assert stats["calls"] == 2 and stats["retries"] == 0
+        assert stats["p50"] >= 0.05
+        assert "classify p50" in llm.metrics.summary()
+
+
+class TestRetryDelay:
+
+    def test_retry_after_seconds(self):
+        assert llm.retry_delay(0, {"retry-after": "3"}) == 3.0
+
+    def test_capped(self):
+        assert llm.retry_delay(0, {"retry-after": "600"}) == llm.LLM_BACKOFF_MAX
+
+    def test_reset_headers_ignored_unless_exhausted(self, monkeypatch):
+        monkeypatch.setattr(llm, "LLM_BACKOFF_BASE", 0.5)
+        headers = {"x-ratelimit-remaining-requests": "5", "x-ratelimit-reset-requests": "1m"}
+        assert llm.retry_delay(0, headers) <= 0.5
+
+    def test_exponential_backoff_without_hint(self, monkeypatch):
+        monkeypatch.setattr(llm, "LLM_BACKOFF_BASE", 1.0)
+        assert all(0 <= llm.retry_delay(3) <= 8.0 for _ in range(50))
@@ -5,6 +5,7 @@ Covers:
 - should_ignore() filtering logic
 - load_git_history() generator output shape and fields
 - Hunk-based diff chunking behaviour
+- hunk_documents() splitting a commit into per-hunk documents
 """
 
 import os
@@ -12,7 +13,7 @@ import pytest
 import tempfile
 import git as gitpython
 
-from miner import should_ignore, load_git_history
+from miner import hunk_documents, should_ignore, load_git_history
 
 
 # ── should_ignore ──────────────────────────────────────────────────────────────
@@ -159,6 +160,106 @@ class TestLoadGitHistory:
         second_commit = commits[1]
         assert "main.py" in second_commit["diff"] or "main.py" in second_commit["content"]
 
+    def test_since_only_yields_newer_commits(self, temp_git_repo):
+        commits = list(load_git_history(temp_git_repo))
+        oldest = commits[-1]["hash"]
+        newer = list(load_git_history(temp_git_repo, since=oldest))
+        assert [c["hash"] for c in newer] == [c["hash"] for c in commits[:-1]]
+
+    def test_since_head_yields_nothing(self, temp_git_repo):
+        head = next(load_git_history(temp_git_repo))["hash"]
+        assert list(load_git_history(temp_git_repo, since=head)) == []
+
+    def test_parallel_matches_serial(self, temp_git_repo, monkeypatch):
+        monkeypatch.setattr("miner.SHARD_SIZE", 1)
+        serial = list(load_git_history(temp_git_repo))
+        parallel = list(load_git_history(temp_git_repo, workers=2))
+        assert parallel == serial
+
+    def test_log_backend_matches_gitpython(self, temp_git_repo):
+        expected = list(load_git_history(temp_git_repo))
+        streamed = list(load_git_history(temp_git_repo, backend="log"))
+        assert streamed == expected
+
+    def test_log_backend_respects_limit_and_since(self, temp_git_repo):
+        commits = list(load_git_history(temp_git_repo))
+        assert list(load_git_history(temp_git_repo, limit=1, backend="log")) == commits[:1]
+        since = list(load_git_history(temp_git_repo, since=commits[-1]["hash"], backend="log"))
+        assert since == commits[:-1]
+
+    def test_log_backend_matches_hunk_truncation(self, temp_git_repo):
+        repo = gitpython.Repo(temp_git_repo)
+        lines = [f"value_{i} = {i}  # {'x' * 60}" for i in range(200)]
+        big = os.path.join(temp_git_repo, "big.py")
+        with open(big, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        with open(os.path.join(temp_git_repo, "logo.png"), "w") as f:
+            f.write("not really an image\n")
+        repo.index.add(["big.py", "logo.png"])
+        repo.index.commit("Add big.py")
+
+        # Touch lines far apart so the diff has several hunks
+        for i in (5, 100, 190):
+            lines[i] = f"value_{i} = -{i}"
+        with open(big, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        repo.index.add(["big.py"])
+        repo.index.commit("Negate some values")
+
+        expected = list(load_git_history(temp_git_repo))
+        streamed = list(load_git_history(temp_git_repo, backend="log"))
+        assert streamed == expected
+        assert "remaining hunks truncated" in streamed[0]["diff"]
+        assert "logo.png" not in streamed[1]["diff"]
+        # Line counts cover the whole patch even when hunks are truncated
+        assert streamed[0]["files"] == [{"path": "big.py", "added": 3, "removed": 3}]
+        assert streamed[1]["files"] == [{"path": "big.py", "added": 200, "removed": 0}]
+
+    def test_log_backend_marks_shallow_boundary(self, temp_git_repo, tmp_path):
+        clone = str(tmp_path / "shallow.git")
+        gitpython.Repo.clone_from(f"file://{temp_git_repo}", clone, bare=True, depth=2)
+
+        expected = list(load_git_history(clone))
+        streamed = list(load_git_history(clone, backend="log"))
+        assert len(streamed) == 2
+        assert streamed == expected
+        assert "boundary of shallow clone" in streamed[-1]["diff"]
+        assert "First commit" not in streamed[-1]["diff"]
+
+    def test_files_record_lines_added_and_removed(self, temp_git_repo):
+        commits = list(load_git_history(temp_git_repo))
+        assert commits[0]["files"] == [{"path": "utils.py", "added": 1, "removed": 0}]
+        assert commits[1]["files"] == [{"path": "main.py", "added": 1, "removed": 1}]
+        assert commits[2]["files"] == []
+
+    def test_hunk_documents_one_per_hunk(self, temp_git_repo):
+        repo = gitpython.Repo(temp_git_repo)
+        lines = [f"value_{i} = {i}" for i in range(60)]
+        big = os.path.join(temp_git_repo, "big.py")
+        with open(big, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        repo.index.add(["big.py"])
+        repo.index.commit("Add big.py")
+        lines[2], lines[50] = "value_2 = -2", "value_50 = -50"
+        with open(big, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        repo.index.add(["big.py"])
+        repo.index.commit("Negate two values")
+
+        commit = next(load_git_history(temp_git_repo))
+        hunks = hunk_documents(commit)
+
+        assert [h["id"] for h in hunks] == [f"{commit['hash']}:0", f"{commit['hash']}:1"]
+        assert all(h["commit"] == commit["hash"] and h["path"] == "big.py" for h in hunks)
+        assert "+value_2 = -2" in hunks[0]["content"] and "value_50 = -50" not in hunks[0]["content"]
+        assert "+value_50 = -50" in hunks[1]["content"]
+        assert hunks[1]["content"].startswith(f"Commit: {commit['hash']}\nAuthor: Test User")
+        assert "Message: Negate two values" in hunks[1]["content"]
+
+    def test_first_commit_has_no_hunk_documents(self, temp_git_repo):
+        first = list(load_git_history(temp_git_repo))[-1]
+        assert hunk_documents(first) == []
+
     def test_raises_on_invalid_path(self):
         with pytest.raises((ValueError, Exception)):
             list(load_git_history("/nonexistent/path/to/repo"))
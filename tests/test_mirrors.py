@@ -0,0 +1,218 @@
+"""
+Tests for mirrors.py
+
+Covers:
+- ensure_mirror() creating and incrementally fetching bare mirrors
+- shallow / full depth handling
+- LRU eviction under MIRROR_DISK_QUOTA, sparing leased mirrors, and
+  private-mirror cleanup
+
+All remotes are local file:// repositories, so no network is needed.
+"""
+
+import os
+import time
+import pytest
+import git as gitpython
+
+import mirrors
+from miner import load_git_history
+
+
+def _commit(repo, name, content, message):
+    path = os.path.join(repo.working_tree_dir, name)
+    with open(path, "w") as f:
+        f.write(content)
+    repo.index.add([name])
+    return repo.index.commit(message)
+
+
+@pytest.fixture
+def upstream(tmp_path):
+    repo = gitpython.Repo.init(tmp_path / "upstream", initial_branch="main")
+    repo.config_writer().set_value("user", "name", "Test User").release()
+    repo.config_writer().set_value("user", "email", "test@example.com").release()
+    for i in range(5):
+        _commit(repo, "main.py", f"value = {i}\n", f"Set value to {i}")
+    return repo
+
+
+@pytest.fixture
+def mirror_root(tmp_path, monkeypatch):
+    root = tmp_path / "mirrors"
+    monkeypatch.setattr(mirrors, "MIRROR_PATH", str(root))
+    return root
+
+
+def _url(repo) -> str:
+    return "file://" + repo.working_tree_dir
+
+
+class TestEnsureMirror:
+
+    def test_creates_bare_mirror(self, upstream, mirror_root):
+        path = mirrors.ensure_mirror(_url(upstream))
+        mirror = gitpython.Repo(path)
+        assert mirror.bare
+        assert mirror.commit("HEAD").hexsha == upstream.head.commit.hexsha
+
+    def test_same_url_reuses_mirror(self, upstream, mirror_root):
+        a = mirrors.ensure_mirror(_url(upstream))
+        b = mirrors.ensure_mirror(_url(upstream) + "/")
+        assert a == b
+        assert len(os.listdir(mirror_root)) == 1
+
+    def test_fetches_new_commits(self, upstream, mirror_root):
+        path = mirrors.ensure_mirror(_url(upstream))
+        new = _commit(upstream, "main.py", "value = 99\n", "Set value to 99")
+
+        mirrors.ensure_mirror(_url(upstream))
+
+        assert gitpython.Repo(path).commit("HEAD").hexsha == new.hexsha
+
+    def test_miner_reads_the_bare_mirror(self, upstream, mirror_root):
+        path = mirrors.ensure_mirror(_url(upstream))
+        for backend in ("gitpython", "log"):
+            commits = list(load_git_history(path, backend=backend))
+            assert len(commits) == 5
+            assert commits[0]["message"] == "Set value to 4"
+
+    def test_shallow_mirror_then_unshallow(self, upstream, mirror_root):
+        path = mirrors.ensure_mirror(_url(upstream), depth=2)
+        assert len(list(gitpython.Repo(path).iter_commits("HEAD"))) == 2
+
+        mirrors.ensure_mirror(_url(upstream), depth=None)
+        assert len(list(gitpython.Repo(path).iter_commits("HEAD"))) == 5
+
+    def test_tracks_requested_branch(self, upstream, mirror_root):
+        upstream.git.checkout("-b", "feature")
+        feature = _commit(upstream, "feature.py", "x = 1\n", "Add feature")
+        upstream.git.checkout("main")
+
+        path = mirrors.ensure_mirror(_url(upstream), branch="feature")
+        assert gitpython.Repo(path).commit("feature").hexsha == feature.hexsha
+
+    def test_token_is_not_written_to_config(self, upstream, mirror_root, monkeypatch):
+        # file:// URLs can't carry a token, so fake the injection
+        monkeypatch.setattr(mirrors, "inject_github_token", lambda url, token: url)
+        path = mirrors.ensure_mirror(_url(upstream), token="secret-token")
+        with open(os.path.join(path, "config")) as f:
+            assert "secret-token" not in f.read()
+
+    def test_failed_first_fetch_leaves_nothing_behind(self, tmp_path, mirror_root):
+        with pytest.raises(gitpython.exc.GitCommandError):
+            mirrors.ensure_mirror("file://" + str(tmp_path / "missing"))
+        assert not mirror_root.exists() or not os.listdir(mirror_root)
+
+
+def _missing_objects(path) -> set:
+    output = gitpython.Repo(path).git.rev_list("--objects", "--all", "--missing=print")
+    return {line[1:] for line in output.splitlines() if line.startswith("?")}
+
+
+@pytest.fixture
+def asset_heavy(upstream):
+    upstream.config_writer().set_value("uploadpack", "allowFilter", "true").release()
+    upstream.config_writer().set_value("uploadpack", "allowAnySHA1InWant", "true").release()
+    with open(os.path.join(upstream.working_tree_dir, "logo.png"), "wb") as f:
+        f.write(os.urandom(4096))
+    upstream.index.add(["logo.png"])
+    upstream.index.commit("Add logo")
+    _commit(upstream, "main.py", "value = 100\n", "Set value to 100")
+    return upstream
+
+
+class TestPartialClone:
+
+    def test_blobless_mirror_defers_blobs(self, asset_heavy, mirror_root):
+        path = mirrors.ensure_mirror(_url(asset_heavy), strategy="blobless")
+        logo = asset_heavy.head.commit.tree["logo.png"].hexsha
+        assert logo in _missing_objects(path)
+
+    def test_mining_only_fetches_kept_blobs(self, asset_heavy, mirror_root):
+        path = mirrors.ensure_mirror(_url(asset_heavy), strategy="blobless")
+        logo = asset_heavy.head.commit.tree["logo.png"].hexsha
+
+        commits = list(load_git_history(path, backend="log"))
+
+        assert "value = 100" in commits[0]["diff"]
+        assert logo in _missing_objects(path)
+
+    def test_blobless_matches_full_mirror_output(self, asset_heavy, mirror_root, tmp_path, monkeypatch):
+        partial = mirrors.ensure_mirror(_url(asset_heavy), strategy="blobless")
+        partial_commits = list(load_git_history(partial, backend="log"))
+
+        monkeypatch.setattr(mirrors, "MIRROR_PATH", str(tmp_path / "full"))
+        full = mirrors.ensure_mirror(_url(asset_heavy), strategy="full")
+        assert not _missing_objects(full)
+        assert list(load_git_history(full, backend="log")) == partial_commits
+
+    def test_prefetch_fetches_diffed_blobs_in_one_batch(self, asset_heavy, mirror_root):
+        path = mirrors.ensure_mirror(_url(asset_heavy), strategy="blobless")
+        tree = asset_heavy.head.commit.tree
+
+        assert mirrors.prefetch_blobs(path, "HEAD", limit=1) == 2
+        missing = _missing_objects(path)
+        assert tree["main.py"].hexsha not in missing
+        assert tree["logo.png"].hexsha in missing
+
+        # Mining the prefetched range needs nothing more from the remote
+        with gitpython.Repo(path).config_writer() as config:
+            config.set_value('remote "origin"', "url", "file:///nonexistent")
+        assert "value = 100" in next(load_git_history(path, backend="log", limit=1))["diff"]
+
+    def test_prefetch_skips_non_blobless_mirrors(self, asset_heavy, mirror_root):
+        path = mirrors.ensure_mirror(_url(asset_heavy), strategy="full")
+        assert mirrors.prefetch_blobs(path, "HEAD") == 0
+
+    def test_blob_limit_only_defers_large_blobs(self, asset_heavy, mirror_root, monkeypatch):
+        monkeypatch.setattr(mirrors, "BLOB_SIZE_LIMIT", "1k")
+        path = mirrors.ensure_mirror(_url(asset_heavy), strategy="blob-limit")
+        tree = asset_heavy.head.commit.tree
+        missing = _missing_objects(path)
+        assert tree["logo.png"].hexsha in missing
+        assert tree["main.py"].hexsha not in missing
+
+    def test_incremental_fetch_keeps_filter(self, asset_heavy, mirror_root):
+        path = mirrors.ensure_mirror(_url(asset_heavy), strategy="blobless")
+        new = _commit(asset_heavy, "main.py", "value = 101\n", "Set value to 101")
+        mirrors.ensure_mirror(_url(asset_heavy))
+        assert new.tree["main.py"].hexsha in _missing_objects(path)
+
+
+class TestEviction:
+
+    def test_evicts_least_recently_used(self, upstream, mirror_root, tmp_path):
+        other = gitpython.Repo.clone_from(upstream.working_tree_dir, tmp_path / "other")
+        old = mirrors.ensure_mirror(_url(upstream))
+        time.sleep(0.01)
+        new = mirrors.ensure_mirror(_url(other))
+
+        evicted = mirrors.evict_mirrors(quota=0, keep=new)
+
+        assert evicted == [old]
+        assert os.path.exists(new) and not os.path.exists(old)
+
+    def test_leased_mirror_is_kept(self, upstream, mirror_root, tmp_path):
+        other = gitpython.Repo.clone_from(upstream.working_tree_dir, tmp_path / "other")
+        old = mirrors.ensure_mirror(_url(upstream))
+        new = mirrors.ensure_mirror(_url(other))
+
+        with mirrors.lease_mirror(old):
+            assert mirrors.evict_mirrors(quota=0, keep=new) == []
+        assert mirrors.evict_mirrors(quota=0, keep=new) == [old]
+
+    def test_within_quota_keeps_everything(self, upstream, mirror_root):
+        path = mirrors.ensure_mirror(_url(upstream))
+        assert mirrors.evict_mirrors(quota=10 ** 12) == []
+        assert os.path.exists(path)
+
+    def test_remove_private_mirrors(self, upstream, mirror_root, tmp_path, monkeypatch):
+        monkeypatch.setattr(mirrors, "inject_github_token", lambda url, token: url)
+        other = gitpython.Repo.clone_from(upstream.working_tree_dir, tmp_path / "other")
+        public = mirrors.ensure_mirror(_url(upstream))
+        private = mirrors.ensure_mirror(_url(other), token="tok")
+
+        mirrors.remove_private_mirrors()
+
+        assert os.path.exists(public) and not os.path.exists(private)
@@ -0,0 +1,120 @@
+"""
+Tests for packer.py
+
+Covers:
+- pack_documents() staying within the token budget
+- headers kept whole, budget shared by rerank score
+- least relevant hunks and documents dropped first, order preserved
+- the length estimate unless a tokenizer is configured; an unavailable one
+  loaded once, falling back to the estimate
+"""
+
+import math
+
+import pytest
+
+import packer
+from embeddings import CHARS_PER_TOKEN
+from packer import pack_documents, split_document, token_counts
+from registry import Registry
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    monkeypatch.delenv("CONTEXT_TOKENIZER", raising=False)
+    monkeypatch.delenv("CONTEXT_TOKENIZER_REVISION", raising=False)
+
+
+def _doc(sha: str, message: str, hunks: dict) -> str:
+    changes = "".join(
+        f"\nFile: {path}\n" + "\n".join(body) + "\n"
+        for path, body in hunks.items()
+    )
+    return (
+        f"Commit: {sha}\nAuthor: Alice\nDate: 2024-01-01 00:00:00\n"
+        f"Message: {message}\n\n--- CODE CHANGES ---\n{changes}"
+    )
+
+
+def _filler(name: str, lines: int = 40) -> str:
+    body = "\n".join(f"+ {name}_line_{i} = {i}  # padding padding padding" for i in range(lines))
+    return f"@@ -1,{lines} +1,{lines} @@\n{body}"
+
+
+BIG = _doc("aaa", "Refactor everything", {
+    "docs/guide.md": [_filler("guide")],
+    "src/upload.py": [_filler("upload"), "@@ -80,2 +80,2 @@\n-MAX_RETRIES = 3\n+MAX_RETRIES = 5"],
+})
+SMALL = _doc("bbb", "Tweak retries", {"src/retry.py": ["@@ -1 +1 @@\n-delay = 1\n+delay = 2"]})
+
+
+def _tokens(docs: list[str]) -> int:
+    return sum(token_counts(docs))
+
+
+class TestPackDocuments:
+
+    def test_fits_budget(self):
+        packed = pack_documents("MAX_RETRIES", [BIG, SMALL], [2.0, 1.0], budget=200)
+        assert _tokens(packed) <= 200 + 20  # plus the "hunks omitted" notes
+
+    def test_small_documents_are_unchanged(self):
+        assert pack_documents("q", [SMALL], [0.0]) == [SMALL.rstrip()]
+
+    def test_headers_are_kept_whole(self):
+        packed = pack_documents("MAX_RETRIES", [BIG, SMALL], [2.0, 1.0], budget=150)
+        assert packed[0].startswith("Commit: aaa\nAuthor: Alice\nDate: 2024-01-01 00:00:00\nMessage: Refactor everything")
+        assert packed[1].startswith("Commit: bbb")
+
+    def test_least_relevant_hunks_dropped_first(self):
+        packed = pack_documents("why did MAX_RETRIES change?", [BIG], [0.0], budget=200)
+        assert "+MAX_RETRIES = 5" in packed[0]
+        assert "guide_line" not in packed[0]
+        assert "hunks omitted" in packed[0]
+
+    def test_budget_follows_rerank_score(self):
+        other = BIG.replace("Commit: aaa", "Commit: ccc")
+        high_first = pack_documents("q", [BIG, other], [5.0, 0.0], budget=600)
+        high_second = pack_documents("q", [BIG, other], [0.0, 5.0], budget=600)
+        assert len(high_first[0]) > len(high_first[1])
+        assert len(high_second[1]) > len(high_second[0])
+
+    def test_unused_share_flows_to_other_documents(self):
+        # SMALL needs little of its share; BIG gets the rest
+        packed = pack_documents("q", [SMALL, BIG], [0.0, 0.0], budget=2000)
+        assert packed == [SMALL.rstrip(), BIG.rstrip()]
+
+    def test_drops_least_relevant_document_when_headers_do_not_fit(self):
+        header_tokens = token_counts([split_document(SMALL)[0]])[0]
+        packed = pack_documents("q", [BIG, SMALL], [0.0, 3.0], budget=header_tokens + 5)
+        assert len(packed) == 1 and packed[0].startswith("Commit: bbb")
+
+    def test_keeps_document_order(self):
+        packed = pack_documents("q", [SMALL, BIG], [0.0, 9.0], budget=2000)
+        assert packed[0].startswith("Commit: bbb")
+
+    def test_document_without_hunks_is_kept_whole(self):
+        doc = "Commit: ddd\nAuthor: A\nMessage: init\n\n--- CODE CHANGES ---\n(First commit — no parent diffs)\n"
+        assert pack_documents("q", [doc]) == [doc.rstrip()]
+
+
+class TestLoadTokenizer:
+
+    @pytest.fixture
+    def builds(self, monkeypatch):
+        builds = []
+        monkeypatch.setattr(packer, "registry", Registry())
+        monkeypatch.setattr(packer, "_build_tokenizer", lambda name, revision: builds.append((name, revision)))
+        return builds
+
+    def test_estimates_unless_configured(self, builds):
+        assert packer.load_tokenizer() is None
+        assert builds == []
+
+    def test_unavailable_tokenizer_falls_back_once(self, builds, monkeypatch):
+        monkeypatch.setenv("CONTEXT_TOKENIZER", "offline/tokenizer")
+        monkeypatch.setenv("CONTEXT_TOKENIZER_REVISION", "0123abc")
+
+        estimate = [math.ceil(40 / CHARS_PER_TOKEN)]
+        assert token_counts(["x" * 40]) == token_counts(["x" * 40]) == estimate
+        assert builds == [("offline/tokenizer", "0123abc")]
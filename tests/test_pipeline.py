@@ -0,0 +1,108 @@
+"""
+Tests for pipeline.py
+
+Covers:
+- run_pipeline() ordering, stage overlap and error propagation
+- StageStats / format_stats() throughput reporting
+"""
+
+import time
+import threading
+import pytest
+
+from pipeline import StageStats, format_stats, run_pipeline
+
+
+def _batches(n, size=2):
+    return [list(range(i, min(i + size, n))) for i in range(0, n, size)]
+
+
+class TestRunPipeline:
+
+    def test_preserves_batch_order(self):
+        received = []
+        run_pipeline(
+            ("source", _batches(10)),
+            [("double", lambda b: [x * 2 for x in b])],
+            ("sink", received.extend),
+        )
+        assert received == [x * 2 for x in range(10)]
+
+    def test_sink_runs_on_calling_thread(self):
+        threads = set()
+        run_pipeline(
+            ("source", _batches(4)),
+            [],
+            ("sink", lambda b: threads.add(threading.get_ident())),
+        )
+        assert threads == {threading.get_ident()}
+
+    def test_stages_overlap(self):
+        def slow_source():
+            for batch in _batches(8):
+                time.sleep(0.05)
+                yield batch
+
+        def slow_stage(batch):
+            time.sleep(0.05)
+            return batch
+
+        start = time.perf_counter()
+        run_pipeline(("source", slow_source()), [("stage", slow_stage)], ("sink", lambda b: None))
+        elapsed = time.perf_counter() - start
+
+        # 4 batches x 2 stages x 50ms = 400ms if run strictly in sequence
+        assert elapsed < 0.35
+
+    def test_stage_error_is_reraised(self):
+        def boom(batch):
+            raise RuntimeError("embedding failed")
+
+        with pytest.raises(RuntimeError, match="embedding failed"):
+            run_pipeline(("source", _batches(10)), [("stage", boom)], ("sink", lambda b: None))
+
+    def test_sink_error_stops_source(self):
+        closed = threading.Event()
+
+        def endless():
+            try:
+                while True:
+                    yield [1]
+            finally:
+                closed.set()
+
+        def bad_sink(batch):
+            raise ValueError("write failed")
+
+        with pytest.raises(ValueError):
+            run_pipeline(("source", endless()), [], ("sink", bad_sink))
+        assert closed.wait(1)
+
+    def test_stats_count_items_per_stage(self):
+        stats = run_pipeline(
+            ("mine", _batches(7, size=3)),
+            [("embed", lambda b: b)],
+            ("write", lambda b: None),
+        )
+        assert [s.name for s in stats] == ["mine", "embed", "write"]
+        assert all(s.items == 7 for s in stats)
+
+
+class TestFormatStats:
+
+    def test_rate_is_items_per_busy_second(self):
+        assert StageStats("embed", items=50, busy=2.0).rate == 25.0
+        assert StageStats("embed", items=50, busy=0.0).rate == 0.0
+
+    def test_names_slowest_stage_as_bottleneck(self):
+        stats = [
+            StageStats("mine", items=100, busy=1.0),
+            StageStats("embed", items=100, busy=10.0),
+            StageStats("write", items=100, busy=0.5),
+        ]
+        summary = format_stats(stats)
+        assert "embed 10.0/s" in summary
+        assert summary.endswith("(bottleneck: embed)")
+
+    def test_empty(self):
+        assert format_stats([]) == ""
@@ -4,24 +4,45 @@ Tests for qa.py
 Covers:
 - _build_where_clause() filter construction logic
   (the pure function we can test without ChromaDB or Groq)
+- _get_ordered_commits() via the timeline index
+- _group_hunks() folding hunk-level hits back into commits, fused with
+  commit-level hits
+- ask() running rewrite and speculative retrieval concurrently,
+  against a local stub of the Groq chat completions API; reranking only
+  semantic, uncached questions
+- ask() replaying cached answers for the same indexed HEAD, and listing or
+  aggregate answers only for the same question
 """
 
-import sys
-import types
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import pytest
 
-# Stub out heavy dependencies so qa.py can be imported without
-# Streamlit, ChromaDB, or a live Groq key in the test environment.
-for mod in ["streamlit", "chromadb", "chromadb.utils", "chromadb.utils.embedding_functions"]:
-    if mod not in sys.modules:
-        sys.modules[mod] = types.ModuleType(mod)
+import qa
+import llm
+from qa import _build_where_clause
+from answer_cache import AnswerCache
+from timeline import Timeline
 
-# Stub indexer.get_collection so qa module-level import doesn't fail
-indexer_stub = types.ModuleType("indexer")
-indexer_stub.get_collection = lambda: None
-sys.modules["indexer"] = indexer_stub
 
-from qa import _build_where_clause
+@pytest.fixture(autouse=True)
+def no_index(monkeypatch):
+    # No ChromaDB collections or sidecars unless a test provides them
+    monkeypatch.setattr(qa, "get_collection", lambda name: None)
+    monkeypatch.setattr(qa, "get_lexical_index", lambda name: None)
+    monkeypatch.setattr(qa, "get_timeline", lambda name: None)
+    monkeypatch.setattr(qa, "get_facts", lambda name: None)
+    monkeypatch.setattr(qa, "get_hunk_collection", lambda name: None)
+    monkeypatch.setattr(qa, "indexed_head", lambda name: None)
+    monkeypatch.setattr(qa, "warm_up_indexer", lambda: None)
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # Pack context by the length heuristic rather than downloading a tokenizer
+    monkeypatch.delenv("CONTEXT_TOKENIZER", raising=False)
 
 
 class TestBuildWhereClause:
@@ -93,4 +114,322 @@ class TestBuildWhereClause:
     def test_two_conditions_wrapped_in_and(self):
         result = _build_where_clause(author="kartik", start_date="2023-01-01")
         assert "$and" in result
-        assert len(result["$and"]) == 2
\ No newline at end of file
+        assert len(result["$and"]) == 2
+
+# ── _get_ordered_commits ───────────────────────────────────────────────────────
+
+class DocStore:
+    """Collection stand-in that only supports get(ids=...), in shuffled order."""
+
+    def __init__(self, docs: dict):
+        self.docs = docs
+        self.fetched = []
+
+    def get(self, ids, include):
+        self.fetched.extend(ids)
+        ids = sorted(ids)
+        return {"ids": ids, "documents": [self.docs[i] for i in ids]}
+
+
+class TestGetOrderedCommits:
+
+    @pytest.fixture
+    def store(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "timeline.sqlite")
+        tl = Timeline(path)
+        tl.add([{"hash": f"s{i:04d}", "timestamp": 1_600_000_000 + i * 86400, "author": "alice"} for i in range(1000)])
+        tl.close()
+
+        store = DocStore({f"s{i:04d}": f"doc {i}" for i in range(1000)})
+        monkeypatch.setattr(qa, "get_collection", lambda name: store)
+        monkeypatch.setattr(qa, "get_timeline", lambda name: Timeline(path))
+        return store
+
+    def test_latest_fetches_only_n_documents(self, store):
+        context = qa._get_ordered_commits("last 3 commits", "repo", n=3)
+        assert store.fetched == ["s0999", "s0998", "s0997"]
+        assert context.index("doc 999") < context.index("doc 998") < context.index("doc 997")
+
+    def test_first_is_oldest_first(self, store):
+        context = qa._get_ordered_commits("first commit", "repo", n=1)
+        assert "doc 0\n" in context
+        assert store.fetched == ["s0000"]
+
+    def test_date_filter(self, store):
+        from datetime import datetime
+        end_ts = int(datetime.strptime("2020-09-16 23:59:59", "%Y-%m-%d %H:%M:%S").timestamp())
+        expected = [f"s{i:04d}" for i in range(1000) if 1_600_000_000 + i * 86400 <= end_ts]
+
+        qa._get_ordered_commits("latest commits", "repo", n=100, end_date="2020-09-16")
+        assert store.fetched == expected[::-1]
+
+
+# ── ask() against a stub LLM server ──────────────────────────────────────────
+
+QUERY = "Why was the retry logic removed?"
+LLM_DELAY = 0.3
+RETRIEVE_DELAY = 0.3
+
+
+def _hunk(sha: str, n: int, path: str, body: str) -> tuple[str, str, dict]:
+    doc = f"Commit: {sha}\nAuthor: A\nMessage: m\n\n--- CODE CHANGES ---\nFile: {path}\n{body}\n"
+    return f"{sha}:{n}", doc, {"commit": sha, "path": path}
+
+
+class TestGroupHunks:
+
+    def test_commits_ranked_by_best_hunk(self):
+        hits = [_hunk("b", 0, "x.py", "+b0"), _hunk("a", 2, "y.py", "+a2"), _hunk("b", 1, "x.py", "+b1")]
+        ids, docs = qa._group_hunks(*map(list, zip(*hits)))
+        assert ids == ["b", "a"]
+        assert docs[0].startswith("Commit: b\n")
+        assert docs[0].count("--- CODE CHANGES ---") == 1
+
+    def test_hunks_keep_original_order(self):
+        hits = [_hunk("a", 3, "z.py", "+late"), _hunk("a", 1, "y.py", "+early")]
+        _, docs = qa._group_hunks(*map(list, zip(*hits)))
+        assert docs[0].index("+early") < docs[0].index("+late")
+        assert "File: y.py" in docs[0] and "File: z.py" in docs[0]
+
+
+class SearchResults:
+    """Collection stand-in whose query() always returns the same hits."""
+
+    def __init__(self, ids: list[str], docs: list[str], metadatas: list[dict] = None):
+        self.results = {"ids": [ids], "documents": [docs], "metadatas": [metadatas]}
+
+    def query(self, query_texts, n_results, where=None):
+        return self.results
+
+
+class TestRetrieveHunks:
+
+    def test_commits_without_hunks_stay_reachable(self, monkeypatch):
+        hunk_hits = [_hunk("a", 0, "x.py", "+a0")]
+        hunks = SearchResults(*map(list, zip(*hunk_hits)))
+        commits = SearchResults(["m", "a"], ["Merge branch 'dev'", "Commit: a, whole"])
+        monkeypatch.setattr(qa, "get_collection", lambda name: commits)
+        monkeypatch.setattr(qa, "get_hunk_collection", lambda name: hunks)
+
+        docs, _ = qa._retrieve("why", "repo")
+        assert "Merge branch 'dev'" in docs
+        # The matched hunks stand in for the whole commit
+        assert hunk_hits[0][1].split("--- CODE CHANGES ---")[0] in docs[0]
+        assert "Commit: a, whole" not in docs
+
+
+class StubLLM(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible /chat/completions endpoint."""
+
+    rewrite = QUERY
+    streamed = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+        if body.get("stream"):
+            StubLLM.streamed.append(body)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for text in ["The ", "answer."]:
+                chunk = {
+                    "id": "c", "object": "chat.completion.chunk", "created": 0, "model": "stub",
+                    "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+
+        time.sleep(LLM_DELAY)
+        payload = json.dumps({
+            "id": "c", "object": "chat.completion", "created": 0, "model": "stub",
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": StubLLM.rewrite},
+                "finish_reason": "stop",
+            }],
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class FakeCollection:
+
+    def __init__(self):
+        self.queries = []
+
+    def query(self, query_texts, n_results, where=None):
+        time.sleep(RETRIEVE_DELAY)
+        self.queries.append(query_texts[0])
+        return {"ids": [["a" * 40]], "documents": [[f"doc for {query_texts[0]}"]]}
+
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubLLM)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    collection = FakeCollection()
+    StubLLM.rewrite = QUERY
+    StubLLM.streamed = []
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.setattr(llm, "LLM_BASE_URL", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setattr(qa, "get_collection", lambda name: collection)
+    monkeypatch.setattr(qa, "get_lexical_index", lambda name: None)
+    collection.reranked = []
+
+    def rerank(query, docs):
+        collection.reranked.append(query)
+        return docs, [0.0] * len(docs)
+
+    monkeypatch.setattr(qa, "_rerank", rerank)
+
+    yield collection
+    server.shutdown()
+
+
+HISTORY = [
+    {"role": "user", "content": "What does the uploader do?"},
+    {"role": "assistant", "content": "It retries failed uploads."},
+]
+
+
+class TestAsk:
+
+    def test_rewrite_and_retrieval_overlap(self, stub_llm):
+        start = time.perf_counter()
+        stream = qa.ask(QUERY, HISTORY, collection_name="repo")
+        answer = "".join(chunk.choices[0].delta.content or "" for chunk in stream)
+        elapsed = time.perf_counter() - start
+
+        assert answer == "The answer."
+        # Sequential would take LLM_DELAY + RETRIEVE_DELAY
+        assert elapsed < LLM_DELAY + RETRIEVE_DELAY
+        assert stub_llm.queries == [QUERY]
+        assert stub_llm.reranked == [QUERY]
+        assert stream.timings["speculation"] == "hit"
+        assert 0 < stream.ttft <= elapsed
+
+    def test_listing_skips_the_rerank(self, stub_llm, monkeypatch):
+        monkeypatch.setattr(qa, "_get_ordered_commits", lambda *args: "--- ordered commits ---")
+        list(qa.ask("What are the last 3 commits?", [], collection_name="repo"))
+
+        assert stub_llm.reranked == []
+        assert "--- ordered commits ---" in StubLLM.streamed[-1]["messages"][-1]["content"]
+
+    def test_material_rewrite_discards_speculation(self, stub_llm):
+        StubLLM.rewrite = "Which commit dropped exponential backoff in uploader.py?"
+
+        stream = qa.ask(QUERY, HISTORY, collection_name="repo")
+        list(stream)
+
+        assert StubLLM.rewrite in stub_llm.queries
+        assert stream.timings["speculation"] == "miss"
+        prompt = StubLLM.streamed[-1]["messages"][-1]["content"]
+        assert f"doc for {StubLLM.rewrite}" in prompt
+
+    def test_no_history_skips_the_rewrite_call(self, stub_llm):
+        stream = qa.ask(QUERY, [], collection_name="repo")
+        list(stream)
+
+        assert stub_llm.queries == [QUERY]
+        assert stream.timings["speculation"] == "hit"
+
+
+class TestAnswerCache:
+
+    @pytest.fixture
+    def cached(self, stub_llm, tmp_path, monkeypatch):
+        head = {"sha": "a" * 40}
+        cache = AnswerCache(str(tmp_path / "answers.sqlite"))
+        monkeypatch.setattr(qa, "indexed_head", lambda name: head["sha"])
+        monkeypatch.setattr(qa, "_get_answer_cache", lambda: cache)
+        # Bag-of-words vectors: identical token sets are identical queries
+        vocabulary = sorted({"why", "was", "the", "retry", "logic", "removed", "dropped"})
+        monkeypatch.setattr(
+            qa, "_embed_query",
+            lambda text: [float(word in qa.tokenize(text)) for word in vocabulary],
+        )
+        return head, cache, stub_llm
+
+    @staticmethod
+    def _answer(stream) -> str:
+        return "".join(chunk.choices[0].delta.content or "" for chunk in stream)
+
+    def test_repeat_question_is_replayed_without_the_llm(self, cached):
+        _, cache, collection = cached
+        first = self._answer(qa.ask(QUERY, [], collection_name="repo"))
+
+        stream = qa.ask(QUERY.upper(), [], collection_name="repo")
+        assert self._answer(stream) == first == "The answer."
+        assert len(StubLLM.streamed) == 1
+        assert stream.timings["answer_cache"] == "hit"
+        assert (cache.hits, cache.misses) == (1, 1)
+        # Only the first, uncached question paid for a rerank
+        assert len(collection.reranked) == 1
+
+    def test_new_head_invalidates(self, cached):
+        head, _, _ = cached
+        list(qa.ask(QUERY, [], collection_name="repo"))
+
+        head["sha"] = "b" * 40
+        stream = qa.ask(QUERY, [], collection_name="repo")
+        list(stream)
+        assert stream.timings["answer_cache"] == "miss"
+        assert len(StubLLM.streamed) == 2
+
+    def test_filters_are_part_of_the_key(self, cached):
+        list(qa.ask(QUERY, [], collection_name="repo"))
+        stream = qa.ask(QUERY, [], collection_name="repo", author="bob")
+        list(stream)
+        assert stream.timings["answer_cache"] == "miss"
+
+    def test_identifiers_must_match(self, cached):
+        list(qa.ask("Why was MAX_RETRIES removed?", [], collection_name="repo"))
+        stream = qa.ask("Why was MIN_RETRIES removed?", [], collection_name="repo")
+        list(stream)
+        assert stream.timings["answer_cache"] == "miss"
+
+        stream = qa.ask("why was max_retries removed", [], collection_name="repo")
+        list(stream)
+        assert stream.timings["answer_cache"] == "hit"
+
+    def test_listing_lookup_does_not_wait_for_the_rewrite(self, cached, monkeypatch):
+        monkeypatch.setattr(qa, "_get_ordered_commits", lambda *args: "--- ordered commits ---")
+        list(qa.ask("Show the last 5 commits", HISTORY, collection_name="repo"))
+
+        start = time.perf_counter()
+        stream = qa.ask("Show the last 5 commits", HISTORY, collection_name="repo")
+        assert stream.timings["answer_cache"] == "hit"
+        assert time.perf_counter() - start < LLM_DELAY
+        assert "embed" not in stream.timings
+
+    def test_listing_count_is_part_of_the_key(self, cached, monkeypatch):
+        monkeypatch.setattr(qa, "_get_ordered_commits", lambda query, name, n, *filters: f"--- {n} commits ---")
+        list(qa.ask("Show the last 10 commits", [], collection_name="repo"))
+
+        stream = qa.ask("Show the last 5 commits", [], collection_name="repo")
+        list(stream)
+        assert stream.timings["answer_cache"] == "miss"
+        assert "--- 5 commits ---" in StubLLM.streamed[-1]["messages"][-1]["content"]
+
+        stream = qa.ask("show the last 5 commits!", [], collection_name="repo")
+        list(stream)
+        assert stream.timings["answer_cache"] == "hit"
+
+    def test_aggregate_needs_the_same_question(self, cached, monkeypatch):
+        monkeypatch.setattr(qa, "_get_aggregate", lambda query, *args: f"--- table for {query} ---")
+        list(qa.ask("Who made the most commits in 2023?", [], collection_name="repo"))
+
+        stream = qa.ask("Who made the most commits in 2024?", [], collection_name="repo")
+        list(stream)
+        assert stream.timings["answer_cache"] == "miss"
+        assert len(StubLLM.streamed) == 2
@@ -0,0 +1,72 @@
+"""
+Tests for registry.py
+
+Covers:
+- one build per key, even under concurrent first use
+- load counts and timings
+- discarding an object so it is built again
+"""
+
+import threading
+import time
+
+from registry import Registry
+
+
+class TestRegistry:
+
+    def test_builds_once_per_key(self):
+        registry = Registry()
+        builds = []
+        factory = lambda: builds.append(1) or object()
+
+        first = registry.get(("model", "a"), factory)
+        assert registry.get(("model", "a"), factory) is first
+        assert registry.get(("model", "b"), factory) is not first
+        assert len(builds) == 2
+
+    def test_concurrent_first_use_builds_once(self):
+        registry = Registry()
+        builds = []
+
+        def slow_factory():
+            builds.append(1)
+            time.sleep(0.05)
+            return object()
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(registry.get(("model", "a"), slow_factory)))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(builds) == 1
+        assert len({id(r) for r in results}) == 1
+
+    def test_stats_record_loads_and_time(self):
+        registry = Registry()
+        registry.get(("client", "x"), lambda: time.sleep(0.02) or "client")
+        registry.get(("client", "x"), lambda: "other")
+
+        stats = registry.stats()[("client", "x")]
+        assert stats["loads"] == 1
+        assert stats["seconds"] >= 0.02
+        assert "client 1×" in registry.summary()
+
+    def test_clear_rebuilds_and_counts_again(self):
+        registry = Registry()
+        registry.get(("model", "a"), object)
+        registry.clear()
+        registry.get(("model", "a"), object)
+        assert registry.stats()[("model", "a")]["loads"] == 2
+
+    def test_discard_rebuilds_on_next_get(self):
+        registry = Registry()
+        first = registry.get(("client", "a"), object)
+        registry.discard(("client", "a"))
+        assert registry.get(("client", "a"), object) is not first
+        assert registry.stats()[("client", "a")]["loads"] == 2
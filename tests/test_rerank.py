@@ -0,0 +1,157 @@
+"""
+Tests for rerank.py
+
+Covers:
+- focus_document() budget, header preservation and hunk selection
+- cpu_threads() never reporting less than one CPU
+- score() caching per (normalized query, document): only misses reach the model
+- ScoreCache LRU and TTL expiry
+"""
+
+import numpy as np
+import pytest
+
+import rerank
+from embeddings import CHARS_PER_TOKEN
+from rerank import ScoreCache, cpu_threads, focus_document
+
+
+def _doc(hunks: dict) -> str:
+    changes = "".join(
+        f"\nFile: {path}\n" + "\n".join(body) + "\n"
+        for path, body in hunks.items()
+    )
+    return (
+        "Commit: abc123\nAuthor: Alice\nDate: 2024-01-01 00:00:00\n"
+        "Message: Tune upload retries\n\n--- CODE CHANGES ---\n" + changes
+    )
+
+
+FILLER = "\n".join(f"+ filler_line_{i} = {i}  # padding padding padding" for i in range(40))
+
+DOC = _doc({
+    "docs/guide.md": [f"@@ -1,40 +1,40 @@\n{FILLER}"],
+    "src/upload.py": [
+        f"@@ -1,40 +1,40 @@\n{FILLER}",
+        "@@ -80,2 +80,2 @@\n-MAX_RETRIES = 3\n+MAX_RETRIES = 5",
+    ],
+})
+
+
+class TestFocusDocument:
+
+    def test_short_document_is_unchanged(self):
+        doc = _doc({"a.py": ["@@ -1 +1 @@\n-x = 1\n+x = 2"]})
+        assert focus_document("x", doc) == doc
+
+    def test_respects_budget(self):
+        focused = focus_document("MAX_RETRIES", DOC, token_budget=128)
+        assert len(focused) <= 128 * CHARS_PER_TOKEN
+
+    def test_keeps_header_and_message(self):
+        focused = focus_document("MAX_RETRIES", DOC, token_budget=128)
+        assert focused.startswith("Commit: abc123\nAuthor: Alice")
+        assert "Message: Tune upload retries" in focused
+
+    def test_prefers_hunks_matching_the_query(self):
+        focused = focus_document("why did MAX_RETRIES change?", DOC, token_budget=128)
+        assert "+MAX_RETRIES = 5" in focused
+        assert "File: src/upload.py" in focused
+        assert "docs/guide.md" not in focused
+
+    def test_keeps_original_hunk_order(self):
+        doc = _doc({
+            "a.py": ["@@ -1 +1 @@\n+alpha = 1"],
+            "b.py": [f"@@ -1,40 +1,40 @@\n{FILLER}"],
+            "c.py": ["@@ -1 +1 @@\n+gamma = gamma_two"],
+        })
+        # c.py matches more query tokens, so it is picked first
+        focused = focus_document("alpha gamma gamma_two", doc, token_budget=128)
+        assert "b.py" not in focused
+        assert focused.index("alpha = 1") < focused.index("gamma = gamma_two")
+
+    def test_document_without_changes_is_truncated(self):
+        doc = "Message: " + "x" * 5000
+        assert focus_document("q", doc, token_budget=64) == doc[:63 * CHARS_PER_TOKEN]
+
+
+class TestCpuThreads:
+
+    def test_at_least_one(self):
+        assert cpu_threads() >= 1
+
+
+class CountingModel:
+    """Scores a pair by document length; records every batch it is given."""
+
+    def __init__(self):
+        self.batches = []
+
+    def predict(self, pairs):
+        self.batches.append(pairs)
+        return np.array([float(len(doc)) for _, doc in pairs], dtype=np.float32)
+
+
+def _commit_doc(sha: str, size: int) -> str:
+    return f"Commit: {sha}\nAuthor: A\nMessage: {'m' * size}\n"
+
+
+class TestScoreCaching:
+
+    @pytest.fixture
+    def model(self, monkeypatch):
+        model = CountingModel()
+        monkeypatch.setattr(rerank, "load_reranker", lambda backend=None: model)
+        return model
+
+    def test_repeated_query_skips_the_model(self, model):
+        cache = ScoreCache()
+        docs = [_commit_doc("a", 1), _commit_doc("b", 2)]
+
+        first = rerank.score("Why was X removed?", docs, cache=cache)
+        second = rerank.score("  why was x REMOVED ", docs, cache=cache)
+
+        assert np.array_equal(first, second)
+        assert len(model.batches) == 1
+        assert cache.hits == 2 and cache.misses == 2
+
+    def test_only_uncached_pairs_are_scored_in_one_batch(self, model):
+        cache = ScoreCache()
+        rerank.score("q", [_commit_doc("a", 1), _commit_doc("b", 2)], cache=cache)
+        scores = rerank.score("q", [_commit_doc("b", 2), _commit_doc("c", 3), _commit_doc("d", 4)], cache=cache)
+
+        assert [len(batch) for batch in model.batches] == [2, 2]
+        assert [doc.split("\n")[0] for _, doc in model.batches[1]] == ["Commit: c", "Commit: d"]
+        assert list(scores) == [float(len(_commit_doc(s, n))) for s, n in [("b", 2), ("c", 3), ("d", 4)]]
+
+    def test_same_commit_with_other_text_misses(self, model):
+        cache = ScoreCache()
+        rerank.score("q", [_commit_doc("a", 1)], cache=cache)
+        scores = rerank.score("q", [_commit_doc("a", 5)], cache=cache)
+        assert len(model.batches) == 2
+        assert list(scores) == [float(len(_commit_doc("a", 5)))]
+
+    def test_different_query_misses(self, model):
+        cache = ScoreCache()
+        rerank.score("q one", [_commit_doc("a", 1)], cache=cache)
+        rerank.score("q two", [_commit_doc("a", 1)], cache=cache)
+        assert len(model.batches) == 2
+
+
+class TestScoreCache:
+
+    def test_lru_eviction(self):
+        cache = ScoreCache(maxsize=2)
+        cache.put_many({"a": 1.0, "b": 2.0})
+        cache.get_many(["a"])
+        cache.put_many({"c": 3.0})
+        assert cache.get_many(["a", "b", "c"]) == {"a": 1.0, "c": 3.0}
+
+    def test_ttl_expiry(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(rerank.time, "monotonic", lambda: now[0])
+        cache = ScoreCache(ttl=10)
+        cache.put_many({"a": 1.0})
+        now[0] += 11
+        assert cache.get_many(["a"]) == {}
+        assert cache.hit_rate == 0.0
@@ -0,0 +1,57 @@
+"""
+Tests for timeline.py
+
+Covers:
+- Timeline.ordered() newest/oldest first, limits and filters
+- re-adding a commit (incremental upserts) doesn't duplicate it
+"""
+
+import pytest
+
+from timeline import Timeline
+
+
+def _commit(sha: str, timestamp: int, author: str = "alice") -> dict:
+    return {"hash": sha, "timestamp": timestamp, "author": author}
+
+
+@pytest.fixture
+def timeline(tmp_path):
+    tl = Timeline(str(tmp_path / "timeline.sqlite"))
+    # Inserted out of order, as parallel mining may deliver them
+    tl.add([
+        _commit("c3", 300, "bob"),
+        _commit("c1", 100),
+        _commit("c4", 400),
+        _commit("c2", 200, "bob"),
+    ])
+    yield tl
+    tl.close()
+
+
+class TestOrdered:
+
+    def test_latest_n(self, timeline):
+        assert timeline.ordered(2) == ["c4", "c3"]
+
+    def test_first_n(self, timeline):
+        assert timeline.ordered(2, newest_first=False) == ["c1", "c2"]
+
+    def test_between_dates(self, timeline):
+        assert timeline.ordered(10, start_ts=150, end_ts=350) == ["c3", "c2"]
+
+    def test_author_filter(self, timeline):
+        assert timeline.ordered(10, newest_first=False, author="bob") == ["c2", "c3"]
+
+    def test_latest_is_correct_beyond_500_commits(self, tmp_path):
+        tl = Timeline(str(tmp_path / "big.sqlite"))
+        tl.add([_commit(f"s{i}", i) for i in range(2000)])
+        assert tl.ordered(3) == ["s1999", "s1998", "s1997"]
+        tl.close()
+
+
+class TestAdd:
+
+    def test_re_adding_does_not_duplicate(self, timeline):
+        timeline.add([_commit("c4", 400)])
+        assert len(timeline) == 4
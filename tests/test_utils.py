@@ -5,13 +5,23 @@ Covers:
 - inject_github_token() URL injection logic
 - cleanup_temp_data() removes paths correctly
 - create_pdf() returns valid bytes
+- ReportBuilder lays out only new messages and caches by conversation hash
 """
 
 import os
 import pytest
 import tempfile
 
-from utils import inject_github_token, cleanup_temp_data, create_pdf, TEMP_REPO_PATH, CHROMA_PATH
+from utils import (
+    inject_github_token,
+    strip_credentials,
+    normalize_repo_url,
+    cleanup_temp_data,
+    create_pdf,
+    ReportBuilder,
+    TEMP_REPO_PATH,
+    CHROMA_PATH,
+)
 
 
 # ── inject_github_token ────────────────────────────────────────────────────────
@@ -57,6 +67,38 @@ class TestInjectGithubToken:
         assert "ghp_abc123XYZ@github.com" in result
 
 
+# ── strip_credentials ──────────────────────────────────────────────────────────
+
+class TestStripCredentials:
+
+    def test_removes_token(self):
+        url = "https://secret@github.com/owner/repo.git"
+        assert strip_credentials(url) == "https://github.com/owner/repo.git"
+
+    def test_round_trips_with_inject(self):
+        url = "https://github.com/owner/repo.git"
+        assert strip_credentials(inject_github_token(url, "tok")) == url
+
+    def test_plain_url_unchanged(self):
+        url = "https://github.com/owner/repo.git"
+        assert strip_credentials(url) == url
+
+
+# ── normalize_repo_url ─────────────────────────────────────────────────────────
+
+class TestNormalizeRepoUrl:
+
+    def test_drops_dot_git_and_trailing_slash(self):
+        assert normalize_repo_url("https://github.com/owner/repo.git") == "https://github.com/owner/repo"
+        assert normalize_repo_url("https://github.com/owner/repo/") == "https://github.com/owner/repo"
+
+    def test_lowercases_host_but_not_path(self):
+        assert normalize_repo_url("HTTPS://GitHub.com/Owner/Repo") == "https://github.com/Owner/Repo"
+
+    def test_drops_credentials(self):
+        assert normalize_repo_url("https://tok@github.com/owner/repo") == "https://github.com/owner/repo"
+
+
 # ── cleanup_temp_data ──────────────────────────────────────────────────────────
 
 class TestCleanupTempData:
@@ -121,4 +163,61 @@ class TestCreatePdf:
         ]
         # Should not raise even with non-latin chars (they get replaced)
         result = create_pdf("https://github.com/owner/repo", messages)
-        assert isinstance(result, bytes)
\ No newline at end of file
+        assert isinstance(result, bytes)
+
+
+# ── ReportBuilder ──────────────────────────────────────────────────────────────
+
+class TestReportBuilder:
+
+    REPO = "https://github.com/owner/repo"
+
+    @pytest.fixture
+    def rendered(self, monkeypatch):
+        import utils
+
+        calls = []
+        render = utils._report_message
+
+        def counting(pdf, msg):
+            calls.append(msg["content"])
+            render(pdf, msg)
+
+        monkeypatch.setattr(utils, "_report_message", counting)
+        return calls
+
+    def _messages(self, n):
+        return [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"}
+            for i in range(n)
+        ]
+
+    def test_nothing_cached_before_build(self):
+        assert ReportBuilder(self.REPO).cached(self._messages(2)) is None
+
+    def test_same_conversation_is_cached(self, rendered):
+        builder = ReportBuilder(self.REPO)
+        messages = self._messages(2)
+        first = builder.build(messages)
+        assert first[:4] == b"%PDF"
+        assert builder.build([dict(m) for m in messages]) is first
+        assert builder.cached(messages) is first
+        assert len(rendered) == 2
+
+    def test_appends_only_new_messages(self, rendered):
+        builder = ReportBuilder(self.REPO)
+        first = builder.build(self._messages(2))
+        second = builder.build(self._messages(4))
+        assert rendered == ["message 0", "message 1", "message 2", "message 3"]
+        assert second[:4] == b"%PDF" and len(second) > len(first)
+        assert builder.cached(self._messages(2)) is None
+
+    def test_restarts_when_conversation_changes(self, rendered):
+        builder = ReportBuilder(self.REPO)
+        builder.build(self._messages(3))
+        edited = self._messages(3)
+        edited[1]["content"] = "edited"
+        builder.build(edited)
+        builder.build(self._messages(1))
+        assert rendered == ["message 0", "message 1", "message 2", "message 0", "edited", "message 2", "message 0"]
+
@@ -0,0 +1,65 @@
+import sqlite3
+
+
+class Timeline:
+    """
+    (timestamp, sha) side index for one collection, so listing queries
+    ("latest N", "first N", "between two dates") are answered by an index
+    range scan instead of fetching and sorting documents.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS commits (
+                sha TEXT PRIMARY KEY,
+                timestamp INTEGER NOT NULL,
+                author TEXT
+            );
+            CREATE INDEX IF NOT EXISTS commits_by_time ON commits (timestamp);
+            CREATE INDEX IF NOT EXISTS commits_by_author ON commits (author, timestamp);
+            """
+        )
+
+    def add(self, commits: list[dict]) -> None:
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO commits (sha, timestamp, author) VALUES (?, ?, ?)",
+                [(c["hash"], int(c["timestamp"]), c["author"]) for c in commits],
+            )
+
+    def ordered(
+        self,
+        n: int,
+        newest_first: bool = True,
+        author: str = None,
+        start_ts: int = None,
+        end_ts: int = None,
+    ) -> list[str]:
+        """Shas of the `n` newest (or oldest) commits matching the filters."""
+        clauses, params = [], []
+        if author:
+            clauses.append("author = ?")
+            params.append(author)
+        if start_ts is not None:
+            clauses.append("timestamp >= ?")
+            params.append(start_ts)
+        if end_ts is not None:
+            clauses.append("timestamp <= ?")
+            params.append(end_ts)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        order = "DESC" if newest_first else "ASC"
+        rows = self._conn.execute(
+            f"SELECT sha FROM commits {where} ORDER BY timestamp {order} LIMIT ?",
+            [*params, n],
+        ).fetchall()
+        return [sha for (sha,) in rows]
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM commits").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
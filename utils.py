@@ -1,11 +1,16 @@
 import os
+import copy
 import shutil
+import hashlib
 import time
 from urllib.parse import urlparse
-from fpdf import FPDF
 
 CHROMA_PATH = "/tmp/chroma_db"
 TEMP_REPO_PATH = "/tmp/temp_repo_clone"
+MIRROR_PATH = "/tmp/git_mirrors"
+EMBEDDING_CACHE_PATH = "/tmp/embedding_cache.sqlite"
+ANSWER_CACHE_PATH = "/tmp/answer_cache.sqlite"
+JOBS_PATH = "/tmp/indexing_jobs"
 
 
 def remove_readonly(func, path, excinfo):
@@ -26,6 +31,11 @@ def cleanup_temp_data(*args, **kwargs) -> None:
                 f"{TEMP_REPO_PATH}: {e}"
             )
 
+    # Public mirrors are a shared cache; anything fetched with a token goes
+    # on reset/exit, so private code never outlives the session
+    from mirrors import remove_private_mirrors
+    remove_private_mirrors()
+
 
 def inject_github_token(repo_url: str, token: str) -> str:
     if not token:
@@ -44,8 +54,26 @@ def inject_github_token(repo_url: str, token: str) -> str:
     return parsed._replace(netloc=authenticated_netloc).geturl()
 
 
-def create_pdf(repo_url: str, messages: list) -> bytes:
-    pdf = FPDF()
+def strip_credentials(repo_url: str) -> str:
+    parsed = urlparse(repo_url)
+    netloc = parsed.netloc.split("@")[-1]
+    return parsed._replace(netloc=netloc).geturl()
+
+
+def normalize_repo_url(repo_url: str) -> str:
+    """Canonical form of a remote URL, so equivalent spellings share one index."""
+    parsed = urlparse(strip_credentials(repo_url.strip()))
+    path = parsed.path.rstrip("/")
+    if path.endswith(".git"):
+        path = path[:-4]
+    return parsed._replace(
+        scheme=parsed.scheme.lower(),
+        netloc=parsed.netloc.lower(),
+        path=path,
+    ).geturl()
+
+
+def _report_header(pdf, repo_url: str) -> None:
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
 
@@ -70,31 +98,83 @@ def create_pdf(repo_url: str, messages: list) -> bytes:
 
     pdf.ln(10)
 
-    for msg in messages:
-        role = "User" if msg["role"] == "user" else "Archaeologist"
 
-        pdf.set_font("Arial", "B", 12)
-        pdf.set_text_color(0, 51, 102)
-        pdf.cell(0, 10, f"{role}:", ln=True)
+def _report_message(pdf, msg: dict) -> None:
+    role = "User" if msg["role"] == "user" else "Archaeologist"
 
-        pdf.set_font("Arial", "", 11)
-        pdf.set_text_color(0, 0, 0)
+    pdf.set_font("Arial", "B", 12)
+    pdf.set_text_color(0, 51, 102)
+    pdf.cell(0, 10, f"{role}:", ln=True)
+
+    pdf.set_font("Arial", "", 11)
+    pdf.set_text_color(0, 0, 0)
+
+    clean_content = (
+        msg["content"]
+        .encode("latin-1", "replace")
+        .decode("latin-1")
+    )
+
+    pdf.multi_cell(0, 7, clean_content)
+    pdf.ln(5)
+
+    pdf.set_draw_color(200, 200, 200)
+    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
+    pdf.ln(5)
 
-        clean_content = (
-            msg["content"]
-            .encode("latin-1", "replace")
-            .decode("latin-1")
-        )
 
-        pdf.multi_cell(0, 7, clean_content)
-        pdf.ln(5)
+def _message_digest(msg: dict) -> str:
+    return hashlib.sha256(f"{msg['role']}\0{msg['content']}".encode()).hexdigest()
 
-        pdf.set_draw_color(200, 200, 200)
-        pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-        pdf.ln(5)
 
-    output = pdf.output(dest="S")
+class ReportBuilder:
+    """
+    Audit report for one repository, laid out incrementally: messages
+    already on the page are kept and only new ones are added, and the PDF
+    bytes are cached by a hash of the conversation. Laying out text is the
+    expensive part; serializing a copy of the document is cheap. A
+    conversation that no longer extends the laid-out one (cleared, edited)
+    starts a fresh document.
+    """
 
+    def __init__(self, repo_url: str):
+        self.repo_url = repo_url
+        self._pdf = None
+        self._digests = []
+        self._cached = (None, None)
+
+    def _key(self, digests: list[str]) -> str:
+        return hashlib.sha256("\n".join([self.repo_url, *digests]).encode()).hexdigest()
+
+    def cached(self, messages: list) -> bytes | None:
+        """The PDF for `messages` if it has already been built, else None."""
+        key, output = self._cached
+        return output if key == self._key([_message_digest(m) for m in messages]) else None
+
+    def build(self, messages: list) -> bytes:
+        digests = [_message_digest(m) for m in messages]
+        key = self._key(digests)
+        if self._cached[0] == key:
+            return self._cached[1]
+
+        if self._pdf is None or digests[:len(self._digests)] != self._digests:
+            from fpdf import FPDF
+
+            self._pdf = FPDF()
+            self._digests = []
+            _report_header(self._pdf, self.repo_url)
+
+        for msg in messages[len(self._digests):]:
+            _report_message(self._pdf, msg)
+        self._digests = digests
+
+        # output() closes the document, so serialize a copy and keep appending to the original
+        output = _pdf_bytes(copy.deepcopy(self._pdf).output(dest="S"))
+        self._cached = (key, output)
+        return output
+
+
+def _pdf_bytes(output) -> bytes:
     if isinstance(output, bytearray):
         return bytes(output)
     elif isinstance(output, bytes):
@@ -102,4 +182,8 @@ def create_pdf(repo_url: str, messages: list) -> bytes:
     elif output:
         return output.encode("latin-1")
     else:
-        return b""
\ No newline at end of file
+        return b""
+
+
+def create_pdf(repo_url: str, messages: list) -> bytes:
+    return ReportBuilder(repo_url).build(messages)